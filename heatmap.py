@@ -1,106 +1,217 @@
 import maya.cmds as cmds
 import maya.OpenMaya as api
-import maya.OpenMayaUI as OpenMayaUI
+import maya.api.OpenMaya as om2
 import maya.mel as mel
 import pymel.core as pm
-import operator
+import ctypes
+import multiprocessing
+import os
+import time
+import numpy as np
 
+import heatmapBatch
+import heatmapCache
+import heatmapEngine
+import heatmapExport
+import heatmapProfile
+import heatmapVisibility
 
-#STORE VISIBLE VERTICES
-def selectFromScreenApi(selectedObject, vertexMargin):
-    
-	#set selection mode to camera based
-	mel.eval('selectPref -useDepth true;')
+
+# result of the last paint run, for the export button
+lastPaint = None
+
+### MESH SHAPE DAG PATH OF AN OBJECT
+def meshDagPath(selectedObject):
 	
-	# switch to face selection mode
-	cmds.selectMode(component=True)
-	cmds.selectType( fc=True )
+	selectionList = om2.MSelectionList()
+	selectionList.add(selectedObject)
 	
-	#select from screen
-	activeView = OpenMayaUI.M3dView.active3dView()
-	api.MGlobal.selectFromScreen(0,0,activeView.portWidth(),activeView.portHeight(),api.MGlobal.kReplaceList)
+	return selectionList.getDagPath(0).extendToShape()
+
+
+
 
-	for i in range(vertexMargin):
-		cmds.GrowPolygonSelectionRegion()
+# STORE POSITION OF ALL VERTICES
+def vertexPositions(selectedObject):
 	
-	fromScreen = cmds.ls(cmds.polyListComponentConversion( ff=True, tv=True ), flatten=True)
+	# looked up by name, the active selection is left alone
+	selectionList = api.MSelectionList()
+	selectionList.add(selectedObject)
+	dagPath = api.MDagPath()
+	selectionList.getDagPath(0, dagPath)
 	
-	#set selection mode back to normal
-	mel.eval('selectPref -useDepth false;')
+	# create function set
+	currentInMeshMFnMesh = api.MFnMesh(dagPath)
+	pointCount = currentInMeshMFnMesh.numVertices()
 	
-	#clear selection
-	cmds.select(clear=True)
-	cmds.selectMode(object=True)
+	# wrap the raw float buffer of the object space points, no per point python objects
+	rawPoints = currentInMeshMFnMesh.getRawPoints()
+	pointBuffer = (ctypes.c_float * (pointCount * 3)).from_address(int(rawPoints))
+	objectPointArray = np.frombuffer(pointBuffer, dtype=np.float32).reshape(pointCount, 3)
 	
-	return fromScreen
+	# one bulk copy into a (N,3) world space array
+	return heatmapEngine.transformPoints(objectPointArray, mMatrixToArray(dagPath.inclusiveMatrix()))
 
 
 
 
-# STORE POSITION OF ALL VERTICES
-def vertexPositions(selectedObject):
- 
-	# get the active selection
-	cmds.select(selectedObject)
+### TRIANGLES OF THE MESH FOR THE HEADLESS VISIBILITY ENGINE, WITH THE POLYGON EACH ONE COMES FROM
+def meshTriangles(selectedObject):
 	
-	# api selection stuff
-	selectedObject = api.MSelectionList()
-	api.MGlobal.getActiveSelectionList( selectedObject )
-	iterSel = api.MItSelectionList(selectedObject, api.MFn.kMesh)
- 
-	# go through selection
-	while not iterSel.isDone():
- 
-		# get dagPath
-		dagPath = api.MDagPath()
-		iterSel.getDagPath( dagPath )
-		
-		# create empty point array
-		inMeshMPointArray = api.MPointArray()
-		
-		# create function set and get points in world space
-		currentInMeshMFnMesh = api.MFnMesh(dagPath)
-		currentInMeshMFnMesh.getPoints(inMeshMPointArray, api.MSpace.kWorld)
-		
-		# put each point to a list
-		pointList = []
-		
-		for i in range( inMeshMPointArray.length() ) :
-			pointList.append( [inMeshMPointArray[i][0], inMeshMPointArray[i][1], inMeshMPointArray[i][2]] )
-		
-		return pointList
-		
-		
+	selectionList = om2.MSelectionList()
+	selectionList.add(selectedObject)
+	meshFn = om2.MFnMesh(selectionList.getDagPath(0))
+	
+	# (T,3) vertex ids, same ordering as the vertex positions
+	triangleCounts, triangleVertices = meshFn.getTriangles()
+	
+	triangleCounts = np.array(triangleCounts, dtype=np.int64)
+	
+	return np.array(triangleVertices, dtype=np.int64).reshape(-1, 3), np.repeat(np.arange(len(triangleCounts)), triangleCounts)
+
+
 
 
-### STORE DISTANCE TO CAMERA
-def distanceToCamera(cameraName, selectedObject, visibleVertices, vertexPositionList, distanceDict, distanceNode):
+### POLYGONS OF THE MESH: VERTEX COUNT PER FACE AND THE FLAT VERTEX LIST
+def meshFaces(selectedObject):
 	
-	visibleVerticesIntegers = []
+	faceVertexCounts, faceVertexIndices = om2.MFnMesh(meshDagPath(selectedObject)).getVertices()
 	
-	# extract the vertex numbers from the names
-	for i in visibleVertices:
-		visibleVerticesIntegers.append(int(i.split("[")[-1].split("]")[0]))
-		
-	counter = 0
+	return np.array(faceVertexCounts, dtype=np.int64), np.array(faceVertexIndices, dtype=np.int64)
+
+
+
+
+### SEVERAL MESHES AS ONE: WORLD POINTS, POLYGON ADJACENCY AND WHERE THE VERTICES OF EACH ONE START
+def combinedMeshes(selectedObjects):
+	
+	pointArrays = [vertexPositions(i) for i in selectedObjects]
+	vertexOffsets = np.cumsum([0] + [len(pointArray) for pointArray in pointArrays])
+	
+	# faces never span two meshes, so neither does the adjacency
+	faceVertexCounts, faceVertexIndices = heatmapEngine.combineFaces([meshFaces(i) for i in selectedObjects], vertexOffsets)
+	adjacency = heatmapVisibility.vertexAdjacency(vertexOffsets[-1], faceVertexCounts, faceVertexIndices)
+	
+	return np.concatenate(pointArrays), adjacency, vertexOffsets
+
+
+
+
+### TRIANGLES OF SEVERAL MESHES WITH THE VERTEX AND POLYGON IDS OF THE COMBINED MESH
+def combinedTriangles(selectedObjects, vertexOffsets):
 	
-	#for all vertices, write distance in dictionary
-	for i in vertexPositionList:
+	triangleArrays = []
+	triangleFaces = []
+	faceOffset = 0
+	
+	for i in range(len(selectedObjects)):
+		meshTriangleArray, meshTriangleFaces = meshTriangles(selectedObjects[i])
+		triangleArrays.append(meshTriangleArray + vertexOffsets[i])
+		triangleFaces.append(meshTriangleFaces + faceOffset)
+		faceOffset += om2.MFnMesh(meshDagPath(selectedObjects[i])).numPolygons
+	
+	return np.concatenate(triangleArrays), np.concatenate(triangleFaces)
+
+
+
+
+### LENS ATTRIBUTES OF A CAMERA, READ FROM ITS SHAPE THROUGH THE API
+def cameraLens(cameraName):
+	
+	selectionList = api.MSelectionList()
+	selectionList.add(cameraName)
+	dagPath = api.MDagPath()
+	selectionList.getDagPath(0, dagPath)
+	
+	if dagPath.apiType() == api.MFn.kTransform:
+		dagPath.extendToShape()
+	
+	# clip planes and the orthographic width in internal units, the same as the world matrices and the
+	# vertex positions. filmFit is an enum and orthographic a bool, kept as numbers like the rest
+	cameraFn = api.MFnDependencyNode(dagPath.node())
+	lens = {}
+	
+	for attribute in heatmapVisibility.defaultLens():
+		plug = cameraFn.findPlug(attribute)
+		lens[attribute] = plug.asInt() if attribute in ('filmFit', 'orthographic') else plug.asDouble()
+	
+	return lens
+
+
+
+
+### MMATRIX TO NUMPY
+def mMatrixToArray(matrix):
+	
+	return np.array([[matrix(i, j) for j in range(4)] for i in range(4)], dtype=np.float64)
+
+
+
+
+### WORLD MATRIX OF A CAMERA FOR A LIST OF FRAMES, WITHOUT CHANGING THE CURRENT TIME
+def evaluateCameraMatrices(cameraName, frames):
+	
+	# worldMatrix[0] plug of the camera
+	cameraFn = api.MFnDependencyNode(get_mobject(cameraName))
+	worldMatrixPlug = cameraFn.findPlug('worldMatrix').elementByLogicalIndex(0)
+	
+	matrices = np.empty((len(frames), 4, 4), dtype=np.float64)
+	
+	for i, frame in enumerate(frames):
 		
-		if counter in visibleVerticesIntegers:
-			
-			# set vertex coordinates in distance node
-			cmds.setAttr((distanceNode + '.point1'), (vertexPositionList[counter][0]), (vertexPositionList[counter][1]), (vertexPositionList[counter][2]))
-			
-			#query distance between camera and vtx
-			distance = cmds.getAttr(distanceNode + '.distance')
-			
-			if distanceDict.get(counter) > distance or distanceDict.get(counter) == None:
-				distanceDict[counter] = distance
+		# evaluate the plug at that frame in its own context, the timeline never moves
+		context = api.MDGContext(api.MTime(frame, api.MTime.uiUnit()))
+		matrices[i] = mMatrixToArray(api.MFnMatrixData(worldMatrixPlug.asMObject(context)).matrix())
 	
-		counter = counter + 1
-			
-	return distanceDict
+	return matrices
+
+
+
+
+### HASH OF THE SCENE FILE THE CAMERA CACHE IS KEYED ON, None WHILE THE SCENE DIFFERS FROM THE FILE
+def sceneHash():
+	
+	sceneName = cmds.file(query=True, sceneName=True)
+	
+	# unsaved scenes have nothing stable to key on, and unsaved edits (a tweaked camera) aren't in the file
+	if not sceneName or cmds.file(query=True, modified=True):
+		return None
+	
+	return heatmapCache.fileHash(sceneName)
+
+
+
+
+### CACHED CAMERA MATRICES, KEYED ON THE SCENE FILE HASH (FROM sceneHash, ONCE PER RUN) AND CAMERA NAME
+def cameraMatrices(cameraName, frames, sceneHash=None):
+	
+	if sceneHash is None:
+		return evaluateCameraMatrices(cameraName, frames)
+	
+	cachePath = heatmapCache.cameraCachePath(sceneHash, cameraName)
+	matrices = heatmapCache.loadCameraMatrices(cachePath, frames)
+	
+	if matrices is None:
+		heatmapProfile.count('cameraCacheMisses')
+		matrices = evaluateCameraMatrices(cameraName, frames)
+		heatmapCache.updateCameraMatrices(cachePath, frames, matrices)
+	else:
+		heatmapProfile.count('cameraCacheHits')
+	
+	return matrices
+
+
+
+
+### WRITE COLOURS TO A SET OF VERTICES IN ONE CALL
+def writeVertexColours(selectedObject, vertexIndexArray, colourArray):
+	
+	selectionList = om2.MSelectionList()
+	selectionList.add(selectedObject)
+	meshFn = om2.MFnMesh(selectionList.getDagPath(0))
+	
+	meshFn.setVertexColors(om2.MColorArray(colourArray.tolist()), om2.MIntArray(vertexIndexArray.tolist()))
+
 
 
 
@@ -114,143 +225,162 @@ def get_mobject(node):
 
 
 
-### ASSIGN COLOURS TO VERTICES
-def assignVertexColours(distanceDict, selectedObject):
-	
-	# initialize progress bar
-	paintProgressBar = maya.mel.eval('$tmp = $gMainProgressBar');
-	cmds.progressBar( paintProgressBar,edit=True, beginProgress=True, isInterruptable=True, status='"Painting vertices"', maxValue=len(distanceDict) )
+### ASSIGN COLOURS TO VERTICES, distanceRange SHARES ONE (MIN, MAX) OVER SEVERAL MESHES
+def assignVertexColours(distanceArray, selectedObject, rampEntries=None, interpolation='linear', distanceRange=None):
 	
 	#enable vertex color display
 	cmds.polyOptions(selectedObject, colorShadedDisplay = True)
 	
-	# select object for API stuff
-	selectedObjectShape = cmds.listRelatives(selectedObject,s=True,ni=True)[0]
-	selectedObjectShapeApi_Obj = get_mobject(selectedObjectShape)
+	# sample the ramp once, then look every colour up in one go
+	if rampEntries is None:
+		rampEntries, interpolation = sampleRampNode("colourRamp")
 	
-	# make colorArray
-	vertexColorList = api.MColorArray()
+	# min/max and normalize in one vectorized pass, vertices never seen are left alone
+	colourArray, seenMask = heatmapEngine.distanceColours(distanceArray, rampEntries, interpolation, distanceRange)
 	
-	# access and play with mesh data with MFnMesh
-	meshFn = api.MFnMesh(selectedObjectShapeApi_Obj)
-	
-	# initialize api int array for vertices
-	vertexIndexList = api.MIntArray()
-	
-	# append keys to api list
-	for i in range(0, len(distanceDict)):
-		vertexIndexList.append(distanceDict.keys()[i])
+	# write all vertexColor in one operation
+	writeVertexColours(selectedObject, np.flatnonzero(seenMask), colourArray[seenMask])
+
+
+
+
+### READ THE COLOUR ENTRIES OF A RAMP NODE
+def sampleRampNode(rampNode):
 	
-	#calculate max and min distance
-	maxDistanceKey = max(distanceDict.iteritems(), key=operator.itemgetter(1))[0]
-	minDistanceKey = min(distanceDict.iteritems(), key=operator.itemgetter(1))[0]
-	maxDistance = distanceDict.get(maxDistanceKey)
-	minDistance = distanceDict.get(minDistanceKey)
+	rampEntries = []
 	
-	#normalize variables
-	normalizedDistanceDict = {}
-	OldRange = (maxDistance - minDistance)  
-	NewRange = (1 - 0)
+	for i in cmds.getAttr(rampNode + '.colorEntryList', multiIndices=True) or []:
+		position = cmds.getAttr(rampNode + '.colorEntryList[' + str(i) + '].position')
+		colour = cmds.getAttr(rampNode + '.colorEntryList[' + str(i) + '].color')[0]
+		rampEntries.append((position, colour))
 	
-	for i in range(0,len(distanceDict)):
+	# bump and spike have no lookup table equivalent, they fall back to smooth
+	interpolationIndex = cmds.getAttr(rampNode + '.interpolation')
+	interpolation = heatmapEngine.RAMP_INTERPOLATIONS[min(interpolationIndex, len(heatmapEngine.RAMP_INTERPOLATIONS) - 1)]
 	
-		# normalize values
-		newValue = (((distanceDict.values()[i] - minDistance) * NewRange) / OldRange)
-		
-		# sample colour at point in ramp
-		colourAtPoint = cmds.colorAtPoint("colourRamp", o="RGB",u = newValue, v = 0.5)
-		
-		# append colour values to api colour list
-		vertexColorList.append(colourAtPoint[0], colourAtPoint[1], colourAtPoint[2])
-		
-		# enable the progress to be cancelled
-		if cmds.progressBar(paintProgressBar, query=True, isCancelled=True) == True:
-			break
-		
-		# progress bar step forward	
-		cmds.progressBar(paintProgressBar, edit=True, step=100)
-				
-	# write all vertexColor in one operation
-	meshFn.setVertexColors(vertexColorList, vertexIndexList, None )
-	
-	# end progress bar
-	cmds.progressBar(paintProgressBar, edit=True, endProgress=True)
+	return rampEntries, interpolation
 
 
 
 
 ## FOR EVERY FRAME 
-def cameraPainter(selectedObject, selectedCameras, frameRanges, vertexMargin, byFrameList):
+def cameraPainter(selectedObject, selectedCameras, frameRanges, vertexMargin, byFrameList, adaptiveTolerance=0, profile=False, aggregation='min', exportStatistics=False):
+	
+	# fails before any frame is painted when the mode is unknown
+	aggregationNames = heatmapEngine.aggregationStatistics(aggregation)
+	
+	if profile:
+		heatmapProfile.startRun()
+	
+	# one object or a list of them, several meshes are painted as one combined mesh so every
+	# frame is rendered once for all of them and tiles occlude each other
+	selectedObjects = list(selectedObject) if isinstance(selectedObject, (list, tuple)) else [selectedObject]
+	
+	# create a list with vertex positions of all vertices, with the polygons and which vertices
+	# share one, built once for the visibility and the vertex margin
+	with heatmapProfile.stage('positions'):
+		vertexPositionList, adjacency, vertexOffsets = combinedMeshes(selectedObjects)
+		triangleArray, triangleFaces = combinedTriangles(selectedObjects, vertexOffsets)
 	
-	counter = 0
-	distanceDict = {}
+	# what the aggregation mode needs, plus the largest on-screen density and the number of frames every
+	# vertex was seen in when they are kept for the export. The smallest distance per vertex comes back
+	# from the painter, and with nothing else kept chunks that can't bring a vertex closer are pruned
+	statisticNames = list(aggregationNames)
+	if exportStatistics:
+		statisticNames += [name for name in ['density', 'count'] if name not in statisticNames]
+	statistics = heatmapEngine.newStatistics(len(vertexPositionList), statisticNames)
 	
-	#Create distance node
-	distanceNode = cmds.shadingNode('distanceBetween', name = 'distanceNode', asUtility = 1)
+	# densities are measured at the render resolution
+	resolution = (cmds.getAttr("defaultResolution.width"), cmds.getAttr("defaultResolution.height"))
 	
-	# create a list with vertex positions of all vertices
-	vertexPositionList = vertexPositions(selectedObject)
+	# the shots the way the batch painter takes them, with inclusive end frames. Nothing in the scene is
+	# changed: the world matrices of every range are evaluated in one pre-pass through the api (cached
+	# on disk per scene) and frames where the camera hardly moved are left out
+	shots = [(str(selectedCameras[i]), frameRanges[i][0], frameRanges[i][1] - 1, byFrameList[i]) for i in range(len(selectedCameras))]
+	frameReport = {}
+	
+	with heatmapProfile.stage('cameras'):
+		shotFrames = heatmapBatch.sceneShotFrames(shots, adaptiveTolerance, frameReport=frameReport)
 	
 	#initialise distance progress bar
-	distanceProgressBar = maya.mel.eval('$tmp = $gMainProgressBar');
-	cmds.progressBar(distanceProgressBar,edit=True, beginProgress=True, isInterruptable=True, status='"Calculating distances"', maxValue=frameRangeCheck(frameRanges))
+	distanceProgressBar = mel.eval('$tmp = $gMainProgressBar');
+	cmds.progressBar(distanceProgressBar,edit=True, beginProgress=True, isInterruptable=True, status='"Calculating distances"', maxValue=frameRangeCheck(frameRanges, byFrameList))
+	cmds.progressBar(distanceProgressBar, edit=True, step=frameReport.get('skipped', 0))
+	
+	# told about the finished frames on this thread, so the progress bar moves and a cancel stops the run
+	def progress(frameCount):
+		
+		# progressbar interrupt
+		if cmds.progressBar(distanceProgressBar, query=True, isCancelled=True):
+			raise heatmapBatch.PaintCancelled()
+		
+		#progressbar step forward
+		cmds.progressBar(distanceProgressBar, edit=True, step=frameCount)
+	
+	# frames are painted in chunks kept in the distance cache like batch runs, so painting again after
+	# changing one shot only renders the chunks it touched. The tiled rasterizer spreads each frame over
+	# the cores, and a polygon that owns a pixel through any of its triangles is seen whole, like a face
+	# selected on screen
+	cacheReport = {}
+	distanceArray = None
+	
+	try:
+		distanceArray = heatmapBatch.paintShotDistances(vertexPositionList, triangleArray, shotFrames, vertexMargin, resolution, 'tiles', adjacency, 1, cacheReport=cacheReport, threads=multiprocessing.cpu_count(), statistics=statistics, triangleFaces=triangleFaces, progress=progress)
+	except heatmapBatch.PaintCancelled:
+		pass
+	finally:
+		# progressbar end
+		cmds.progressBar(distanceProgressBar, edit=True, endProgress=True)
+	
+	if distanceArray is None:
+		if profile:
+			heatmapProfile.stopRun()
+		api.MGlobal.displayWarning("Painting cancelled, the frame chunks finished so far are cached for the next run")
+		return
 	
-	for i in selectedCameras:
-		
-		# change camera
-		cameraName = str(selectedCameras[counter])
-		cmds.lookThru(cameraName)
-		
-		# set time to startFrame
-		cmds.currentTime(frameRanges[counter][0], edit=True )
-		
-		print distanceNode
-		cmds.connectAttr((cameraName + '.worldMatrix'), (distanceNode + '.inMatrix2'), force=True)
-		
-		#for every frame
-		for i in range(frameRanges[counter][0], frameRanges[counter][1]):
-			
-			# query visible vertices
-			visibleVertices =  selectFromScreenApi(selectedObject, vertexMargin)
-			
-			# calculate distance
-			distanceDict = distanceToCamera(cameraName, selectedObject, visibleVertices, vertexPositionList, distanceDict, distanceNode)
-			
-			#step forward a frame
-			mel.eval('playButtonStepForward;')
-			
-			# progressbar interrupt
-			if cmds.progressBar(distanceProgressBar, query=True, isCancelled=True ):
-				break
-			
-			#progressbar step forward
-			cmds.progressBar(distanceProgressBar, edit=True, step=1)
-		
-		# flush undo history to remove ram usage of script
-		cmds.flushUndo()
-		
-		counter += 1
-		
-		#progressbar interrupt (extra one for parent loop)
-		if cmds.progressBar(distanceProgressBar, query=True, isCancelled=True ):
-			break
-			
-	# progressbar end
-	cmds.progressBar(distanceProgressBar, edit=True, endProgress=True)
+	api.MGlobal.displayInfo("Distance cache: " + str(cacheReport['computed']) + " of " + str(cacheReport['chunks']) + " frame chunks computed, the rest reused")
+	
+	if adaptiveTolerance > 0:
+		api.MGlobal.displayInfo("Adaptive stepping skipped " + str(frameReport.get('skipped', 0)) + " frames")
 	
 	# assign vertex colours
-	assignVertexColours(distanceDict, selectedObject)
+	# one distance range over all meshes so the colours of neighbouring tiles match
+	colourValues = heatmapEngine.aggregateDistances(distanceArray, statistics, aggregation)
+	distanceRange = heatmapEngine.seenDistanceRange(colourValues)
+	
+	with heatmapProfile.stage('colours'):
+		for meshObject, meshDistances in zip(selectedObjects, heatmapEngine.splitByMesh(colourValues, vertexOffsets)):
+			assignVertexColours(meshDistances, meshObject, distanceRange=distanceRange)
+	
+	# kept for the export button
+	global lastPaint
+	lastPaint = {
+		'meshes': selectedObjects,
+		'vertexOffsets': vertexOffsets,
+		'distances': distanceArray,
+		'statistics': statistics,
+		'aggregation': aggregation,
+	}
+	
+	if cmds.button("exportVtxMap", exists=True):
+		cmds.button("exportVtxMap", edit=True, en=True)
+	
+	if profile:
+		report = heatmapProfile.stopRun()
+		reportPath = os.path.join(heatmapCache.cacheDirectory(), "reports", time.strftime("%Y%m%d_%H%M%S") + ".json")
+		if not os.path.isdir(os.path.dirname(reportPath)):
+			os.makedirs(os.path.dirname(reportPath))
+		heatmapProfile.writeReport(report, reportPath)
+		print(heatmapProfile.formatReport(report))
+		api.MGlobal.displayInfo("Profile report written to " + reportPath)
 	
 
 
 
-def frameRangeCheck(frameRanges):
+def frameRangeCheck(frameRanges, byFrameList):
 	
-	if len(frameRanges) == 1:
-		frameRangeValue = [x[1] - x[0] for x in frameRanges][0]
-		
-	else:
-		frameRangeValue = [x[1] - x[0] for x in frameRanges][0] + [x[1] - x[0] for x in frameRanges][1]
+	# number of frames that get sampled over all shots
+	frameRangeValue = sum([len(range(x[0], x[1], byFrame)) for x, byFrame in zip(frameRanges, byFrameList)])
 	
 	return frameRangeValue
 		
@@ -335,11 +465,9 @@ def selectBaseObject(selectedObject):
 	if len(selectedObject) == 0:
 		cmds.textField("baseObject", e=True, tx="Please select an object")
 		api.MGlobal.displayError("Select an object")
-	elif len(selectedObject) > 1:
-		cmds.textField("baseObject", e=True, tx="Please select only one object")
-		api.MGlobal.displayError("Please select only one object")
 	else:
-		cmds.textField("baseObject", e=True, tx=selectedObject[0])
+		# several objects get painted together, their names are kept space separated
+		cmds.textField("baseObject", e=True, tx=" ".join(selectedObject))
 	
 
 	
@@ -352,16 +480,62 @@ def selectBaseObjectButton(*args):
 	
 
 def vtxMapButton(*args):
-	return
+	
+	if lastPaint is None:
+		api.MGlobal.displayError("Nothing to export, paint first")
+		return
+	
+	exportPath = cmds.fileDialog2(fileFilter="Heatmap (*.heatmap)", dialogStyle=2, fileMode=0, caption="Export vertex colour map")
+	
+	if not exportPath:
+		return
+	
+	# float16 values and zlib chunks, or full precision that other tools can memory map
+	compact = cmds.checkBox("compactExport", query=True, value=True)
+	exportPaint(exportPath[0], lastPaint, compression='zlib' if compact else 'none', float16=compact)
+	
+	api.MGlobal.displayInfo("Exported " + exportPath[0])
+
+
+
+
+### WRITE A PAINT RESULT (DISTANCES, COUNTS, DENSITIES, LOD AND COLOURS OF ALL ITS MESHES) TO A .heatmap FILE
+def exportPaint(exportPath, paintResult, rampEntries=None, interpolation='linear', lodThresholds=heatmapEngine.DEFAULT_LOD_THRESHOLDS, compression='none', float16=False):
+	
+	if rampEntries is None:
+		rampEntries, interpolation = sampleRampNode("colourRamp")
+	
+	# the meshes were painted as one, so one range over all of them like the vertex colours
+	distanceArray = paintResult['distances']
+	statistics = paintResult['statistics']
+	aggregation = paintResult.get('aggregation', 'min')
+	colourArray, seenMask = heatmapEngine.distanceColours(heatmapEngine.aggregateDistances(distanceArray, statistics, aggregation), rampEntries, interpolation)
+	lodArray = heatmapEngine.lodBuckets(statistics['density'], lodThresholds) if 'density' in statistics else None
+	
+	metadata = {
+		'scene': cmds.file(query=True, sceneName=True),
+		'ramp': rampEntries,
+		'interpolation': interpolation,
+		'aggregation': aggregation,
+		'lodThresholds': list(lodThresholds),
+	}
+	
+	return heatmapExport.exportHeatmap(exportPath, distanceArray, statistics, colourArray, lodArray, heatmapExport.meshTable(paintResult['meshes'], paintResult['vertexOffsets']), metadata, compression, float16)
 
 
 def executeButton(*args):
 	
-	selectedObject = cmds.textField("baseObject", query=True, tx=True)
+	selectedObject = cmds.textField("baseObject", query=True, tx=True).split()
 	vertexMargin = cmds.intSliderGrp("vertexMargin", query=True, v=True)
 
+	adaptiveTolerance = cmds.floatFieldGrp("adaptiveTolerance", query=True, value1=True)
+	profile = cmds.checkBox("profileRun", query=True, value=True)
+	aggregation = cmds.optionMenu("aggregation", query=True, value=True)
+	exportStatistics = cmds.checkBox("exportStatistics", query=True, value=True)
+
 	selectedCameras = []
 	frameRanges = []
+	byFrameList = []
 	
 	if len(allShots) == 0:
 		api.MGlobal.displayError("You must have a shot sequence")
@@ -372,22 +546,20 @@ def executeButton(*args):
 		if cmds.checkBox("checkBox_"+str(i), query=True, value=True) == 1:
 			selectedCameras.append(cmds.text("cameraName_"+str(i), query=True, l=True))
 			frameRanges.append([int(cmds.textField("startFrameField_" + str(i), query=True, tx=True)), int(cmds.textField("endFrameField_" + str(i), query=True, tx=True))+1])
+			byFrameList.append(max(1, int(cmds.textField("byFrameField_" + str(i), query=True, tx=True) or 1)))
 			
 	print selectedCameras
 	print frameRanges
 	
-	# FIX THIS LIST TO HAVE VALUES!!!
-	byFrameList = []
-	
 	# call function
-	cameraPainter(selectedObject, selectedCameras, frameRanges, vertexMargin, byFrameList)
+	cameraPainter(selectedObject, selectedCameras, frameRanges, vertexMargin, byFrameList, adaptiveTolerance, profile, aggregation, exportStatistics)
 	
 
 
 	
 def floodButton(*args):
 	# variables
-	selectedObject = cmds.textField("baseObject", query=True, tx=True)
+	selectedObject = cmds.textField("baseObject", query=True, tx=True).split()
 	# call selectBaseObject function
 	
 	colourValue  = invisibleColor()
@@ -515,7 +687,7 @@ def windowUI(*args):
 		endFrame_1 = cmds.text(l="End Frame:")
 		endFrameField_1 = cmds.textField("endFrameField_1", it=int(cmds.shot(allShots[0], query=True, endTime = True)))
 		byFrame_1 = cmds.text(l="By Frame:")
-		byFrameField_1 = cmds.textField("byFrameField_1", en=False)
+		byFrameField_1 = cmds.textField("byFrameField_1", it="1")
 		
 	if len(allShots) >= 2:
 		checkBox_2 = cmds.checkBox("checkBox_2", l="", value=1)
@@ -525,7 +697,7 @@ def windowUI(*args):
 		endFrame_2 = cmds.text(l="End Frame:")
 		endFrameField_2 = cmds.textField("endFrameField_2", it=int(cmds.shot(allShots[1], query=True, endTime = True)))
 		byFrame_2 = cmds.text(l="By Frame:")
-		byFrameField_2 = cmds.textField("byFrameField_2", en=False)
+		byFrameField_2 = cmds.textField("byFrameField_2", it="1")
 	
 	if len(allShots) >= 3:
 		checkBox_3 = cmds.checkBox("checkBox_3", l="", value=1)
@@ -535,7 +707,7 @@ def windowUI(*args):
 		endFrame_3 = cmds.text(l="End Frame:")
 		endFrameField_3 = cmds.textField("endFrameField_3", it=int(cmds.shot(allShots[2], query=True, endTime = True)))
 		byFrame_3 = cmds.text(l="By Frame:")
-		byFrameField_3 = cmds.textField("byFrameField_3", en=False)
+		byFrameField_3 = cmds.textField("byFrameField_3", it="1")
 		
 	if len(allShots) >= 4:
 		checkBox_4 = cmds.checkBox("checkBox_4", l="", value=1)
@@ -545,7 +717,7 @@ def windowUI(*args):
 		endFrame_4 = cmds.text(l="End Frame:")
 		endFrameField_4 = cmds.textField("endFrameField_4", it=int(cmds.shot(allShots[3], query=True, endTime = True)))
 		byFrame_4 = cmds.text(l="By Frame:")
-		byFrameField_4 = cmds.textField("byFrameField_4", en=False)
+		byFrameField_4 = cmds.textField("byFrameField_4", it="1")
 		
 	if len(allShots) >= 5:
 		checkBox_5 = cmds.checkBox("checkBox_5", l="", value=1)
@@ -555,7 +727,7 @@ def windowUI(*args):
 		endFrame_5 = cmds.text(l="End Frame:")
 		endFrameField_5 = cmds.textField("endFrameField_5", it=int(cmds.shot(allShots[4], query=True, endTime = True)))
 		byFrame_5 = cmds.text(l="By Frame:")
-		byFrameField_5 = cmds.textField("byFrameField_5", en=False)
+		byFrameField_5 = cmds.textField("byFrameField_5", it="1")
 	
 	if len(allShots) >= 6:
 		checkBox_6 = cmds.checkBox("checkBox_6", l="", value=1)
@@ -565,7 +737,7 @@ def windowUI(*args):
 		endFrame_6 = cmds.text(l="End Frame:")
 		endFrameField_6 = cmds.textField("endFrameField_6", it=int(cmds.shot(allShots[5], query=True, endTime = True)))
 		byFrame_6 = cmds.text(l="By Frame:")
-		byFrameField_6 = cmds.textField("byFrameField_6", en=False)
+		byFrameField_6 = cmds.textField("byFrameField_6", it="1")
 		
 	if len(allShots) >= 7:
 		checkBox_7 = cmds.checkBox("checkBox_7", l="", value=1)
@@ -575,7 +747,7 @@ def windowUI(*args):
 		endFrame_7 = cmds.text(l="End Frame:")
 		endFrameField_7 = cmds.textField("endFrameField_7", it=int(cmds.shot(allShots[6], query=True, endTime = True)))
 		byFrame_7 = cmds.text(l="By Frame:")
-		byFrameField_7 = cmds.textField("byFrameField_7", en=False)
+		byFrameField_7 = cmds.textField("byFrameField_7", it="1")
 	
 	if len(allShots) >= 8:
 		checkBox_8 = cmds.checkBox("checkBox_8", l="", value=1)
@@ -585,7 +757,7 @@ def windowUI(*args):
 		endFrame_8 = cmds.text(l="End Frame:")
 		endFrameField_8 = cmds.textField("endFrameField_8", it=int(cmds.shot(allShots[7], query=True, endTime = True)))
 		byFrame_8 = cmds.text(l="By Frame:")
-		byFrameField_8 = cmds.textField("byFrameField_8", en=False)
+		byFrameField_8 = cmds.textField("byFrameField_8", it="1")
 		
 	if len(allShots) >= 9:
 		checkBox_9 = cmds.checkBox("checkBox_9", l="", value=1)
@@ -595,7 +767,7 @@ def windowUI(*args):
 		endFrame_9 = cmds.text(l="End Frame:")
 		endFrameField_9 = cmds.textField("endFrameField_9", it=int(cmds.shot(allShots[8], query=True, endTime = True)))
 		byFrame_9 = cmds.text(l="By Frame:")
-		byFrameField_9 = cmds.textField("byFrameField_9", en=False)
+		byFrameField_9 = cmds.textField("byFrameField_9", it="1")
 	
 	if len(allShots) >= 10:
 		checkBox_10 = cmds.checkBox("checkBox_10", l="", value=1)
@@ -605,7 +777,7 @@ def windowUI(*args):
 		endFrame_10 = cmds.text(l="End Frame:")
 		endFrameField_10 = cmds.textField("endFrameField_10", it=int(cmds.shot(allShots[9], query=True, endTime = True)))
 		byFrame_10 = cmds.text(l="By Frame:")
-		byFrameField_10 = cmds.textField("byFrameField_10", en=False)
+		byFrameField_10 = cmds.textField("byFrameField_10", it="1")
 		
 	if len(allShots) >= 11:
 		checkBox_11 = cmds.checkBox("checkBox_11", l="", value=1)
@@ -615,7 +787,7 @@ def windowUI(*args):
 		endFrame_11 = cmds.text(l="End Frame:")
 		endFrameField_11 = cmds.textField("endFrameField_11", it=int(cmds.shot(allShots[10], query=True, endTime = True)))
 		byFrame_11 = cmds.text(l="By Frame:")
-		byFrameField_11 = cmds.textField("byFrameField_11", en=False)
+		byFrameField_11 = cmds.textField("byFrameField_11", it="1")
 		
 	if len(allShots) >= 12:
 		checkBox_12 = cmds.checkBox("checkBox_12", l="", value=1)
@@ -625,7 +797,7 @@ def windowUI(*args):
 		endFrame_12 = cmds.text(l="End Frame:")
 		endFrameField_12 = cmds.textField("endFrameField_12", it=int(cmds.shot(allShots[11], query=True, endTime = True)))
 		byFrame_12 = cmds.text(l="By Frame:")
-		byFrameField_12 = cmds.textField("byFrameField_12", en=False)
+		byFrameField_12 = cmds.textField("byFrameField_12", it="1")
 		
 	if len(allShots) >= 13:
 		checkBox_13 = cmds.checkBox("checkBox_13", l="", value=1)
@@ -635,7 +807,7 @@ def windowUI(*args):
 		endFrame_13 = cmds.text(l="End Frame:")
 		endFrameField_13 = cmds.textField("endFrameField_13", it=int(cmds.shot(allShots[12], query=True, endTime = True)))
 		byFrame_13 = cmds.text(l="By Frame:")
-		byFrameField_13 = cmds.textField("byFrameField_13", en=False)
+		byFrameField_13 = cmds.textField("byFrameField_13", it="1")
 		
 	if len(allShots) >= 14:
 		checkBox_14 = cmds.checkBox("checkBox_14", l="", value=1)
@@ -645,7 +817,7 @@ def windowUI(*args):
 		endFrame_14 = cmds.text(l="End Frame:")
 		endFrameField_14 = cmds.textField("endFrameField_14", it=int(cmds.shot(allShots[13], query=True, endTime = True)))
 		byFrame_14 = cmds.text(l="By Frame:")
-		byFrameField_14 = cmds.textField("byFrameField_14", en=False)
+		byFrameField_14 = cmds.textField("byFrameField_14", it="1")
 		
 	if len(allShots) >= 15:
 		checkBox_15 = cmds.checkBox("checkBox_15", l="", value=1)
@@ -655,7 +827,7 @@ def windowUI(*args):
 		endFrame_15 = cmds.text(l="End Frame:")
 		endFrameField_15 = cmds.textField("endFrameField_15", it=int(cmds.shot(allShots[14], query=True, endTime = True)))
 		byFrame_15 = cmds.text(l="By Frame:")
-		byFrameField_15 = cmds.textField("byFrameField_15", en=False)
+		byFrameField_15 = cmds.textField("byFrameField_15", it="1")
 		
 	if len(allShots) >= 16:
 		checkBox_16 = cmds.checkBox("checkBox_16", l="", value=1)
@@ -665,7 +837,7 @@ def windowUI(*args):
 		endFrame_16 = cmds.text(l="End Frame:")
 		endFrameField_16 = cmds.textField("endFrameField_16", it=int(cmds.shot(allShots[15], query=True, endTime = True)))
 		byFrame_16 = cmds.text(l="By Frame:")
-		byFrameField_16 = cmds.textField("byFrameField_16", en=False)
+		byFrameField_16 = cmds.textField("byFrameField_16", it="1")
 		
 	if len(allShots) >= 17:
 		checkBox_17 = cmds.checkBox("checkBox_17", l="", value=1)
@@ -675,7 +847,7 @@ def windowUI(*args):
 		endFrame_17 = cmds.text(l="End Frame:")
 		endFrameField_17 = cmds.textField("endFrameField_17", it=int(cmds.shot(allShots[16], query=True, endTime = True)))
 		byFrame_17 = cmds.text(l="By Frame:")
-		byFrameField_17 = cmds.textField("byFrameField_17", en=False)
+		byFrameField_17 = cmds.textField("byFrameField_17", it="1")
 		
 	if len(allShots) >= 18:
 		checkBox_18 = cmds.checkBox("checkBox_18", l="", value=1)
@@ -685,7 +857,7 @@ def windowUI(*args):
 		endFrame_18 = cmds.text(l="End Frame:")
 		endFrameField_18 = cmds.textField("endFrameField_18", it=int(cmds.shot(allShots[17], query=True, endTime = True)))
 		byFrame_18 = cmds.text(l="By Frame:")
-		byFrameField_18 = cmds.textField("byFrameField_18", en=False)
+		byFrameField_18 = cmds.textField("byFrameField_18", it="1")
 		
 	if len(allShots) >= 19:
 		checkBox_19 = cmds.checkBox("checkBox_19", l="", value=1)
@@ -695,7 +867,7 @@ def windowUI(*args):
 		endFrame_19 = cmds.text(l="End Frame:")
 		endFrameField_19 = cmds.textField("endFrameField_19", it=int(cmds.shot(allShots[18], query=True, endTime = True)))
 		byFrame_19 = cmds.text(l="By Frame:")
-		byFrameField_19 = cmds.textField("byFrameField_19", en=False)
+		byFrameField_19 = cmds.textField("byFrameField_19", it="1")
 	
 	if len(allShots) >= 20:
 		checkBox_20 = cmds.checkBox("checkBox_20", l="", value=1)
@@ -705,7 +877,7 @@ def windowUI(*args):
 		endFrame_20 = cmds.text(l="End Frame:")
 		endFrameField_20 = cmds.textField("endFrameField_20", it=int(cmds.shot(allShots[19], query=True, endTime = True)))
 		byFrame_20 = cmds.text(l="By Frame:")
-		byFrameField_20 = cmds.textField("byFrameField_20", en=False)
+		byFrameField_20 = cmds.textField("byFrameField_20", it="1")
 		
 	if len(allShots) >= 21:
 		checkBox_21 = cmds.checkBox("checkBox_21", l="", value=1)
@@ -715,7 +887,7 @@ def windowUI(*args):
 		endFrame_21 = cmds.text(l="End Frame:")
 		endFrameField_21 = cmds.textField("endFrameField_21", it=int(cmds.shot(allShots[20], query=True, endTime = True)))
 		byFrame_21 = cmds.text(l="By Frame:")
-		byFrameField_21 = cmds.textField("byFrameField_21", en=False)
+		byFrameField_21 = cmds.textField("byFrameField_21", it="1")
 	
 	if len(allShots) >= 22:
 		checkBox_22 = cmds.checkBox("checkBox_22", l="", value=1)
@@ -725,7 +897,7 @@ def windowUI(*args):
 		endFrame_22 = cmds.text(l="End Frame:")
 		endFrameField_22 = cmds.textField("endFrameField_22", it=int(cmds.shot(allShots[21], query=True, endTime = True)))
 		byFrame_22 = cmds.text(l="By Frame:")
-		byFrameField_22 = cmds.textField("byFrameField_22", en=False)
+		byFrameField_22 = cmds.textField("byFrameField_22", it="1")
 
 	if len(allShots) >= 23:
 		checkBox_23 = cmds.checkBox("checkBox_23", l="", value=1)
@@ -735,7 +907,7 @@ def windowUI(*args):
 		endFrame_23 = cmds.text(l="End Frame:")
 		endFrameField_23 = cmds.textField("endFrameField_23", it=int(cmds.shot(allShots[22], query=True, endTime = True)))
 		byFrame_23 = cmds.text(l="By Frame:")
-		byFrameField_23 = cmds.textField("byFrameField_23", en=False)
+		byFrameField_23 = cmds.textField("byFrameField_23", it="1")
 
 	if len(allShots) >= 24:
 		checkBox_24 = cmds.checkBox("checkBox_24", l="", value=1)
@@ -745,7 +917,7 @@ def windowUI(*args):
 		endFrame_24 = cmds.text(l="End Frame:")
 		endFrameField_24 = cmds.textField("endFrameField_24", it=int(cmds.shot(allShots[23], query=True, endTime = True)))
 		byFrame_24 = cmds.text(l="By Frame:")
-		byFrameField_24 = cmds.textField("byFrameField_24", en=False)
+		byFrameField_24 = cmds.textField("byFrameField_24", it="1")
 		
 	
 	if len(allShots) >= 25:
@@ -756,7 +928,7 @@ def windowUI(*args):
 		endFrame_25 = cmds.text(l="End Frame:")
 		endFrameField_25 = cmds.textField("endFrameField_25", it=int(cmds.shot(allShots[24], query=True, endTime = True)))
 		byFrame_25 = cmds.text(l="By Frame:")
-		byFrameField_25 = cmds.textField("byFrameField_25", en=False)
+		byFrameField_25 = cmds.textField("byFrameField_25", it="1")
 	
 	if len(allShots) >= 26:
 		checkBox_26 = cmds.checkBox("checkBox_26", l="", value=1)
@@ -766,7 +938,7 @@ def windowUI(*args):
 		endFrame_26 = cmds.text(l="End Frame:")
 		endFrameField_26 = cmds.textField("endFrameField_26", it=int(cmds.shot(allShots[25], query=True, endTime = True)))
 		byFrame_26 = cmds.text(l="By Frame:")
-		byFrameField_26 = cmds.textField("byFrameField_26", en=False)
+		byFrameField_26 = cmds.textField("byFrameField_26", it="1")
 	
 	if len(allShots) >= 27:
 		checkBox_27 = cmds.checkBox("checkBox_27", l="", value=1)
@@ -776,7 +948,7 @@ def windowUI(*args):
 		endFrame_27 = cmds.text(l="End Frame:")
 		endFrameField_27 = cmds.textField("endFrameField_27", it=int(cmds.shot(allShots[26], query=True, endTime = True)))
 		byFrame_27 = cmds.text(l="By Frame:")
-		byFrameField_27 = cmds.textField("byFrameField_27", en=False)
+		byFrameField_27 = cmds.textField("byFrameField_27", it="1")
 	
 	if len(allShots) >= 28:
 		checkBox_28 = cmds.checkBox("checkBox_28", l="", value=1)
@@ -786,7 +958,7 @@ def windowUI(*args):
 		endFrame_28 = cmds.text(l="End Frame:")
 		endFrameField_28 = cmds.textField("endFrameField_28", it=int(cmds.shot(allShots[27], query=True, endTime = True)))
 		byFrame_28 = cmds.text(l="By Frame:")
-		byFrameField_28 = cmds.textField("byFrameField_28", en=False)
+		byFrameField_28 = cmds.textField("byFrameField_28", it="1")
 	
 	if len(allShots) >= 29:
 		checkBox_29 = cmds.checkBox("checkBox_29", l="", value=1)
@@ -796,7 +968,7 @@ def windowUI(*args):
 		endFrame_29 = cmds.text(l="End Frame:")
 		endFrameField_29 = cmds.textField("endFrameField_29", it=int(cmds.shot(allShots[28], query=True, endTime = True)))
 		byFrame_29 = cmds.text(l="By Frame:")
-		byFrameField_29 = cmds.textField("byFrameField_29", en=False)
+		byFrameField_29 = cmds.textField("byFrameField_29", it="1")
 	
 	if len(allShots) >= 30:
 		checkBox_30 = cmds.checkBox("checkBox_30", l="", value=1)
@@ -806,7 +978,7 @@ def windowUI(*args):
 		endFrame_30 = cmds.text(l="End Frame:")
 		endFrameField_30 = cmds.textField("endFrameField_30", it=int(cmds.shot(allShots[29], query=True, endTime = True)))
 		byFrame_30 = cmds.text(l="By Frame:")
-		byFrameField_30 = cmds.textField("byFrameField_30", en=False)
+		byFrameField_30 = cmds.textField("byFrameField_30", it="1")
 	
 	if len(allShots) >= 31:
 		checkBox_31 = cmds.checkBox("checkBox_31", l="", value=1)
@@ -816,7 +988,7 @@ def windowUI(*args):
 		endFrame_31 = cmds.text(l="End Frame:")
 		endFrameField_31 = cmds.textField("endFrameField_31", it=int(cmds.shot(allShots[30], query=True, endTime = True)))
 		byFrame_31 = cmds.text(l="By Frame:")
-		byFrameField_31 = cmds.textField("byFrameField_31", en=False)
+		byFrameField_31 = cmds.textField("byFrameField_31", it="1")
 	
 	if len(allShots) >= 32:
 		checkBox_32 = cmds.checkBox("checkBox_32", l="", value=1)
@@ -826,7 +998,7 @@ def windowUI(*args):
 		endFrame_32 = cmds.text(l="End Frame:")
 		endFrameField_32 = cmds.textField("endFrameField_32", it=int(cmds.shot(allShots[31], query=True, endTime = True)))
 		byFrame_32 = cmds.text(l="By Frame:")
-		byFrameField_32 = cmds.textField("byFrameField_32", en=False)
+		byFrameField_32 = cmds.textField("byFrameField_32", it="1")
 	
 	if len(allShots) >= 33:
 		checkBox_33 = cmds.checkBox("checkBox_33", l="", value=1)
@@ -836,7 +1008,7 @@ def windowUI(*args):
 		endFrame_33 = cmds.text(l="End Frame:")
 		endFrameField_33 = cmds.textField("endFrameField_33", it=int(cmds.shot(allShots[32], query=True, endTime = True)))
 		byFrame_33 = cmds.text(l="By Frame:")
-		byFrameField_33 = cmds.textField("byFrameField_33", en=False)
+		byFrameField_33 = cmds.textField("byFrameField_33", it="1")
 	
 	if len(allShots) >= 34:
 		checkBox_34 = cmds.checkBox("checkBox_34", l="", value=1)
@@ -846,7 +1018,7 @@ def windowUI(*args):
 		endFrame_34 = cmds.text(l="End Frame:")
 		endFrameField_34 = cmds.textField("endFrameField_34", it=int(cmds.shot(allShots[33], query=True, endTime = True)))
 		byFrame_34 = cmds.text(l="By Frame:")
-		byFrameField_34 = cmds.textField("byFrameField_34", en=False)
+		byFrameField_34 = cmds.textField("byFrameField_34", it="1")
 	
 	if len(allShots) >= 35:
 		checkBox_35 = cmds.checkBox("checkBox_35", l="", value=1)
@@ -856,7 +1028,7 @@ def windowUI(*args):
 		endFrame_35 = cmds.text(l="End Frame:")
 		endFrameField_35 = cmds.textField("endFrameField_35", it=int(cmds.shot(allShots[34], query=True, endTime = True)))
 		byFrame_35 = cmds.text(l="By Frame:")
-		byFrameField_35 = cmds.textField("byFrameField_35", en=False)
+		byFrameField_35 = cmds.textField("byFrameField_35", it="1")
 	
 	if len(allShots) >= 36:
 		checkBox_36 = cmds.checkBox("checkBox_36", l="", value=1)
@@ -866,7 +1038,7 @@ def windowUI(*args):
 		endFrame_36 = cmds.text(l="End Frame:")
 		endFrameField_36 = cmds.textField("endFrameField_36", it=int(cmds.shot(allShots[35], query=True, endTime = True)))
 		byFrame_36 = cmds.text(l="By Frame:")
-		byFrameField_36 = cmds.textField("byFrameField_36", en=False)
+		byFrameField_36 = cmds.textField("byFrameField_36", it="1")
 	
 	if len(allShots) >= 37:
 		checkBox_37 = cmds.checkBox("checkBox_37", l="", value=1)
@@ -876,7 +1048,7 @@ def windowUI(*args):
 		endFrame_37 = cmds.text(l="End Frame:")
 		endFrameField_37 = cmds.textField("endFrameField_37", it=int(cmds.shot(allShots[36], query=True, endTime = True)))
 		byFrame_37 = cmds.text(l="By Frame:")
-		byFrameField_37 = cmds.textField("byFrameField_37", en=False)
+		byFrameField_37 = cmds.textField("byFrameField_37", it="1")
 	
 	if len(allShots) >= 38:
 		checkBox_38 = cmds.checkBox("checkBox_38", l="", value=1)
@@ -886,7 +1058,7 @@ def windowUI(*args):
 		endFrame_38 = cmds.text(l="End Frame:")
 		endFrameField_38 = cmds.textField("endFrameField_38", it=int(cmds.shot(allShots[37], query=True, endTime = True)))
 		byFrame_38 = cmds.text(l="By Frame:")
-		byFrameField_38 = cmds.textField("byFrameField_38", en=False)
+		byFrameField_38 = cmds.textField("byFrameField_38", it="1")
 	
 	if len(allShots) >= 39:
 		checkBox_39 = cmds.checkBox("checkBox_39", l="", value=1)
@@ -896,7 +1068,7 @@ def windowUI(*args):
 		endFrame_39 = cmds.text(l="End Frame:")
 		endFrameField_39 = cmds.textField("endFrameField_39", it=int(cmds.shot(allShots[38], query=True, endTime = True)))
 		byFrame_39 = cmds.text(l="By Frame:")
-		byFrameField_39 = cmds.textField("byFrameField_39", en=False)
+		byFrameField_39 = cmds.textField("byFrameField_39", it="1")
 	
 	if len(allShots) >= 40:
 		checkBox_40 = cmds.checkBox("checkBox_40", l="", value=1)
@@ -906,7 +1078,7 @@ def windowUI(*args):
 		endFrame_40 = cmds.text(l="End Frame:")
 		endFrameField_40 = cmds.textField("endFrameField_40", it=int(cmds.shot(allShots[39], query=True, endTime = True)))
 		byFrame_40 = cmds.text(l="By Frame:")
-		byFrameField_40 = cmds.textField("byFrameField_40", en=False)
+		byFrameField_40 = cmds.textField("byFrameField_40", it="1")
 		
 		
 		
@@ -918,7 +1090,7 @@ def windowUI(*args):
 		endFrame_41 = cmds.text(l="End Frame:")
 		endFrameField_41 = cmds.textField("endFrameField_41", it=int(cmds.shot(allShots[40], query=True, endTime = True)))
 		byFrame_41 = cmds.text(l="By Frame:")
-		byFrameField_41 = cmds.textField("byFrameField_41", en=False)
+		byFrameField_41 = cmds.textField("byFrameField_41", it="1")
 	
 	if len(allShots) >= 42:
 		checkBox_42 = cmds.checkBox("checkBox_42", l="", value=1)
@@ -928,7 +1100,7 @@ def windowUI(*args):
 		endFrame_42 = cmds.text(l="End Frame:")
 		endFrameField_42 = cmds.textField("endFrameField_42", it=int(cmds.shot(allShots[41], query=True, endTime = True)))
 		byFrame_42 = cmds.text(l="By Frame:")
-		byFrameField_42 = cmds.textField("byFrameField_42", en=False)
+		byFrameField_42 = cmds.textField("byFrameField_42", it="1")
 	
 	if len(allShots) >= 43:
 		checkBox_43 = cmds.checkBox("checkBox_43", l="", value=1)
@@ -938,7 +1110,7 @@ def windowUI(*args):
 		endFrame_43 = cmds.text(l="End Frame:")
 		endFrameField_43 = cmds.textField("endFrameField_43", it=int(cmds.shot(allShots[42], query=True, endTime = True)))
 		byFrame_43 = cmds.text(l="By Frame:")
-		byFrameField_43 = cmds.textField("byFrameField_43", en=False)
+		byFrameField_43 = cmds.textField("byFrameField_43", it="1")
 	
 	if len(allShots) >= 44:
 		checkBox_44 = cmds.checkBox("checkBox_44", l="", value=1)
@@ -948,7 +1120,7 @@ def windowUI(*args):
 		endFrame_44 = cmds.text(l="End Frame:")
 		endFrameField_44 = cmds.textField("endFrameField_44", it=int(cmds.shot(allShots[43], query=True, endTime = True)))
 		byFrame_44 = cmds.text(l="By Frame:")
-		byFrameField_44 = cmds.textField("byFrameField_44", en=False)
+		byFrameField_44 = cmds.textField("byFrameField_44", it="1")
 	
 	if len(allShots) >= 45:
 		checkBox_45 = cmds.checkBox("checkBox_45", l="", value=1)
@@ -958,7 +1130,7 @@ def windowUI(*args):
 		endFrame_45 = cmds.text(l="End Frame:")
 		endFrameField_45 = cmds.textField("endFrameField_45", it=int(cmds.shot(allShots[44], query=True, endTime = True)))
 		byFrame_45 = cmds.text(l="By Frame:")
-		byFrameField_45 = cmds.textField("byFrameField_45", en=False)
+		byFrameField_45 = cmds.textField("byFrameField_45", it="1")
 	
 	if len(allShots) >= 46:
 		checkBox_46 = cmds.checkBox("checkBox_46", l="", value=1)
@@ -968,7 +1140,7 @@ def windowUI(*args):
 		endFrame_46 = cmds.text(l="End Frame:")
 		endFrameField_46 = cmds.textField("endFrameField_46", it=int(cmds.shot(allShots[45], query=True, endTime = True)))
 		byFrame_46 = cmds.text(l="By Frame:")
-		byFrameField_46 = cmds.textField("byFrameField_46", en=False)
+		byFrameField_46 = cmds.textField("byFrameField_46", it="1")
 	
 	if len(allShots) >= 47:
 		checkBox_47 = cmds.checkBox("checkBox_47", l="", value=1)
@@ -978,7 +1150,7 @@ def windowUI(*args):
 		endFrame_47 = cmds.text(l="End Frame:")
 		endFrameField_47 = cmds.textField("endFrameField_47", it=int(cmds.shot(allShots[46], query=True, endTime = True)))
 		byFrame_47 = cmds.text(l="By Frame:")
-		byFrameField_47 = cmds.textField("byFrameField_47", en=False)
+		byFrameField_47 = cmds.textField("byFrameField_47", it="1")
 	
 	if len(allShots) >= 48:
 		checkBox_48 = cmds.checkBox("checkBox_48", l="", value=1)
@@ -988,7 +1160,7 @@ def windowUI(*args):
 		endFrame_48 = cmds.text(l="End Frame:")
 		endFrameField_48 = cmds.textField("endFrameField_48", it=int(cmds.shot(allShots[47], query=True, endTime = True)))
 		byFrame_48 = cmds.text(l="By Frame:")
-		byFrameField_48 = cmds.textField("byFrameField_48", en=False)
+		byFrameField_48 = cmds.textField("byFrameField_48", it="1")
 	
 	if len(allShots) >= 49:
 		checkBox_49 = cmds.checkBox("checkBox_49", l="", value=1)
@@ -998,7 +1170,7 @@ def windowUI(*args):
 		endFrame_49 = cmds.text(l="End Frame:")
 		endFrameField_49 = cmds.textField("endFrameField_49", it=int(cmds.shot(allShots[48], query=True, endTime = True)))
 		byFrame_49 = cmds.text(l="By Frame:")
-		byFrameField_49 = cmds.textField("byFrameField_49", en=False)
+		byFrameField_49 = cmds.textField("byFrameField_49", it="1")
 	
 	if len(allShots) >= 50:
 		checkBox_50 = cmds.checkBox("checkBox_50", l="", value=1)
@@ -1008,7 +1180,7 @@ def windowUI(*args):
 		endFrame_50 = cmds.text(l="End Frame:")
 		endFrameField_50 = cmds.textField("endFrameField_50", it=int(cmds.shot(allShots[49], query=True, endTime = True)))
 		byFrame_50 = cmds.text(l="By Frame:")
-		byFrameField_50 = cmds.textField("byFrameField_50", en=False)
+		byFrameField_50 = cmds.textField("byFrameField_50", it="1")
 	
 	if len(allShots) >= 51:
 		checkBox_51 = cmds.checkBox("checkBox_51", l="", value=1)
@@ -1018,7 +1190,7 @@ def windowUI(*args):
 		endFrame_51 = cmds.text(l="End Frame:")
 		endFrameField_51 = cmds.textField("endFrameField_51", it=int(cmds.shot(allShots[50], query=True, endTime = True)))
 		byFrame_51 = cmds.text(l="By Frame:")
-		byFrameField_51 = cmds.textField("byFrameField_51", en=False)
+		byFrameField_51 = cmds.textField("byFrameField_51", it="1")
 	
 	if len(allShots) >= 52:
 		checkBox_52 = cmds.checkBox("checkBox_52", l="", value=1)
@@ -1028,7 +1200,7 @@ def windowUI(*args):
 		endFrame_52 = cmds.text(l="End Frame:")
 		endFrameField_52 = cmds.textField("endFrameField_52", it=int(cmds.shot(allShots[51], query=True, endTime = True)))
 		byFrame_52 = cmds.text(l="By Frame:")
-		byFrameField_52 = cmds.textField("byFrameField_52", en=False)
+		byFrameField_52 = cmds.textField("byFrameField_52", it="1")
 	
 	if len(allShots) >= 53:
 		checkBox_53 = cmds.checkBox("checkBox_53", l="", value=1)
@@ -1038,7 +1210,7 @@ def windowUI(*args):
 		endFrame_53 = cmds.text(l="End Frame:")
 		endFrameField_53 = cmds.textField("endFrameField_53", it=int(cmds.shot(allShots[52], query=True, endTime = True)))
 		byFrame_53 = cmds.text(l="By Frame:")
-		byFrameField_53 = cmds.textField("byFrameField_53", en=False)
+		byFrameField_53 = cmds.textField("byFrameField_53", it="1")
 	
 	if len(allShots) >= 54:
 		checkBox_54 = cmds.checkBox("checkBox_54", l="", value=1)
@@ -1048,7 +1220,7 @@ def windowUI(*args):
 		endFrame_54 = cmds.text(l="End Frame:")
 		endFrameField_54 = cmds.textField("endFrameField_54", it=int(cmds.shot(allShots[53], query=True, endTime = True)))
 		byFrame_54 = cmds.text(l="By Frame:")
-		byFrameField_54 = cmds.textField("byFrameField_54", en=False)
+		byFrameField_54 = cmds.textField("byFrameField_54", it="1")
 	
 	if len(allShots) >= 55:
 		checkBox_55 = cmds.checkBox("checkBox_55", l="", value=1)
@@ -1058,7 +1230,7 @@ def windowUI(*args):
 		endFrame_55 = cmds.text(l="End Frame:")
 		endFrameField_55 = cmds.textField("endFrameField_55", it=int(cmds.shot(allShots[54], query=True, endTime = True)))
 		byFrame_55 = cmds.text(l="By Frame:")
-		byFrameField_55 = cmds.textField("byFrameField_55", en=False)
+		byFrameField_55 = cmds.textField("byFrameField_55", it="1")
 	
 	if len(allShots) >= 56:
 		checkBox_56 = cmds.checkBox("checkBox_56", l="", value=1)
@@ -1068,7 +1240,7 @@ def windowUI(*args):
 		endFrame_56 = cmds.text(l="End Frame:")
 		endFrameField_56 = cmds.textField("endFrameField_56", it=int(cmds.shot(allShots[55], query=True, endTime = True)))
 		byFrame_56 = cmds.text(l="By Frame:")
-		byFrameField_56 = cmds.textField("byFrameField_56", en=False)
+		byFrameField_56 = cmds.textField("byFrameField_56", it="1")
 	
 	if len(allShots) >= 57:
 		checkBox_57 = cmds.checkBox("checkBox_57", l="", value=1)
@@ -1078,7 +1250,7 @@ def windowUI(*args):
 		endFrame_57 = cmds.text(l="End Frame:")
 		endFrameField_57 = cmds.textField("endFrameField_57", it=int(cmds.shot(allShots[56], query=True, endTime = True)))
 		byFrame_57 = cmds.text(l="By Frame:")
-		byFrameField_57 = cmds.textField("byFrameField_57", en=False)
+		byFrameField_57 = cmds.textField("byFrameField_57", it="1")
 	
 	if len(allShots) >= 58:
 		checkBox_58 = cmds.checkBox("checkBox_58", l="", value=1)
@@ -1088,7 +1260,7 @@ def windowUI(*args):
 		endFrame_58 = cmds.text(l="End Frame:")
 		endFrameField_58 = cmds.textField("endFrameField_58", it=int(cmds.shot(allShots[57], query=True, endTime = True)))
 		byFrame_58 = cmds.text(l="By Frame:")
-		byFrameField_58 = cmds.textField("byFrameField_58", en=False)
+		byFrameField_58 = cmds.textField("byFrameField_58", it="1")
 	
 	if len(allShots) >= 59:
 		checkBox_59 = cmds.checkBox("checkBox_59", l="", value=1)
@@ -1098,7 +1270,7 @@ def windowUI(*args):
 		endFrame_59 = cmds.text(l="End Frame:")
 		endFrameField_59 = cmds.textField("endFrameField_59", it=int(cmds.shot(allShots[58], query=True, endTime = True)))
 		byFrame_59 = cmds.text(l="By Frame:")
-		byFrameField_59 = cmds.textField("byFrameField_59", en=False)
+		byFrameField_59 = cmds.textField("byFrameField_59", it="1")
 	
 	if len(allShots) >= 60:
 		checkBox_60 = cmds.checkBox("checkBox_60", l="", value=1)
@@ -1108,7 +1280,7 @@ def windowUI(*args):
 		endFrame_60 = cmds.text(l="End Frame:")
 		endFrameField_60 = cmds.textField("endFrameField_60", it=int(cmds.shot(allShots[59], query=True, endTime = True)))
 		byFrame_60 = cmds.text(l="By Frame:")
-		byFrameField_60 = cmds.textField("byFrameField_60", en=False)
+		byFrameField_60 = cmds.textField("byFrameField_60", it="1")
 		
 	cmds.setParent("..")	
 	
@@ -1123,6 +1295,13 @@ def windowUI(*args):
 	cmds.separator(h=10, st='in')
 	
 	cmds.intSliderGrp("vertexMargin", l="Vertex margin: ", v=0, cw3=[105,40,200], min=0, max=5, fmx=50, f=True)
+	cmds.floatFieldGrp("adaptiveTolerance", l="Adaptive step: ", v1=0, cw2=[105,80], ann="Skip frames where the camera moved less than this distance (and less than 1 degree) since the last sampled frame. A skipped frame changes the distance of a vertex seen from both it and the frame sampled before it by at most this value; vertices only visible from skipped frames can stay unseen. 0 samples every frame.")
+	cmds.optionMenu("aggregation", label='Colour by:      ', ann="min: closest distance, mean: average distance over the frames a vertex is visible, count: frames visible, weighted: average distance weighted by screen time, p10/p50: distance percentile")
+	for aggregation in ['min', 'mean', 'count', 'weighted', 'p10', 'p50']:
+		cmds.menuItem(label=aggregation)
+	cmds.checkBox("profileRun", l="Profile run", v=False, ann="Time every stage of the run and write a json report to the cache directory")
+	cmds.checkBox("exportStatistics", l="Keep export data", v=False, ann="Also track the on-screen density (LOD buckets) and the number of frames every vertex was seen in for the export. Off paints faster, since chunks that can't bring a vertex closer are skipped")
+	cmds.checkBox("compactExport", l="Compact export", v=False, ann="Export distances and densities as float16 in zlib compressed chunks instead of full precision files that can be memory mapped")
 	cmds.separator(h=10, st='in')
 	
 	cmds.rowColumnLayout(nc=2)
@@ -1144,7 +1323,7 @@ def windowUI(*args):
 	# paint button
 	cmds.rowColumnLayout(nc=2)
 	cmds.button("paintButton", l="Start Painting", w=315, h = 40, al="center", c=executeButton)
-	cmds.button("exportVtxMap", en=False, l="Export vertex colour map", w=315, h = 40, al="center", c=vtxMapButton)
+	cmds.button("exportVtxMap", en=lastPaint is not None, l="Export vertex colour map", w=315, h = 40, al="center", c=vtxMapButton)
 	cmds.setParent("..")
 
 	
@@ -1153,8 +1332,5 @@ def windowUI(*args):
 	
 	cmds.separator(h=10, st='in')
 	
-	cmds.text("Yet to implement: byFrame functionality",ww=True, fn="smallPlainLabelFont")
-	
 	cmds.showWindow("windowUI")
 	
-windowUI()
@@ -0,0 +1,578 @@
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+import heatmapCache
+import heatmapEngine
+import heatmapExport
+import heatmapPipeline
+import heatmapProfile
+import heatmapSpatial
+import heatmapVisibility
+
+
+
+### RAISED FROM A progress CALLBACK TO STOP A RUN, CACHE SHARDS THAT ARE DONE ARE KEPT
+class PaintCancelled(Exception):
+	pass
+
+
+
+
+### DISTANCES FOR A SEQUENCE OF CAMERA FRAMES, NO MAYA OR UI CALLS
+def paintDistances(vertexPositionArray, triangleArray, cameraFrames, vertexMargin=0, resolution=heatmapVisibility.DEFAULT_RESOLUTION, distanceArray=None, occlusion='raster', adjacency=None, threads=1, statistics=None, triangleFaces=None, cache=True, spatialDirectory=None, progress=None):
+
+	if distanceArray is None:
+		distanceArray = heatmapEngine.newDistanceArray(len(vertexPositionArray))
+
+	# occlusion by depth buffer, by a triangle id buffer rendered in screen tiles, or by tracing through
+	# a bvh that is built once per mesh. The bvh and the vertex chunks are kept in spatialDirectory (the
+	# cache directory by default), without cache they are only built in memory
+	if occlusion == 'bvh':
+		spatialIndex = heatmapSpatial.meshSpatialIndex(vertexPositionArray, triangleArray, spatialDirectory, cache)
+	elif occlusion not in ('raster', 'tiles'):
+		raise ValueError("Unknown occlusion mode: " + str(occlusion))
+
+	# the tiled rasterizer spreads one frame over the threads, so the frames themselves go one at a time
+	tileThreads = threads if occlusion == 'tiles' else 1
+	frameThreads = 1 if occlusion == 'tiles' else threads
+
+	# without polygon connectivity the margin grows over the triangles
+	if adjacency is None and vertexMargin > 0:
+		adjacency = heatmapVisibility.triangleAdjacency(len(vertexPositionArray), triangleArray)
+
+	# triangleFaces, the polygon every triangle was split from, lets the tiles mark whole polygons
+	faceTriangleLists = heatmapVisibility.faceTriangles(triangleFaces) if triangleFaces is not None and occlusion == 'tiles' else None
+
+	# the mesh in spatially coherent vertex chunks, every frame only looks at the chunks it can see
+	vertexChunks = heatmapSpatial.meshVertexChunks(vertexPositionArray, triangleArray, spatialDirectory, cache=cache)
+	chunkSizes = np.diff(vertexChunks['chunkStarts'])
+	triangleArray = np.asarray(triangleArray, dtype=np.int64)
+
+	# with nothing but the minimum to keep, a chunk whose nearest point is no closer than every distance
+	# it already holds can't change. That largest stored distance per chunk only ever goes down, it is
+	# refreshed for the chunks a frame touched. Frames still in flight may read an older, larger value,
+	# which only means pruning less
+	pruning = not statistics
+	chunkFarthest = heatmapSpatial.chunkFarthestDistances(vertexChunks, np.arange(len(chunkSizes)), distanceArray) if pruning else None
+
+	def improvableChunks(chunks, cameraPosition):
+		nearest = heatmapSpatial.boxDistances(vertexChunks['vertexMin'][chunks], vertexChunks['vertexMax'][chunks], cameraPosition)
+		return nearest * (1.0 - 1e-6) < chunkFarthest[chunks]
+
+	# visibility of one frame, the stage that runs on the thread pool. Returns the visible vertices as indices
+	def frameVisibility(cameraFrame):
+
+		worldMatrix, lens = cameraFrame[:2]
+		cameraPosition = np.asarray(worldMatrix, dtype=np.float64).reshape(4, 4)[3, :3]
+
+		with heatmapProfile.stage('culling'):
+			chunks = heatmapSpatial.frustumChunks(vertexChunks, worldMatrix, lens, resolution)
+			testedChunks = chunks
+
+			# rays are the expensive part, so chunks that can't get closer aren't traced. A vertex margin
+			# carries visibility on from vertices of any chunk, so then every chunk in the frustum is
+			if pruning and occlusion == 'bvh' and vertexMargin == 0 and len(chunks):
+				testedChunks = chunks[improvableChunks(chunks, cameraPosition)]
+
+			prunedVertices = int(chunkSizes[chunks].sum() - chunkSizes[testedChunks].sum())
+			testedVertices = heatmapSpatial.chunkVertices(vertexChunks, testedChunks)
+
+		with heatmapProfile.stage('visibility'):
+			if len(testedVertices) == 0:
+				visibleIndices = testedVertices
+
+			elif occlusion == 'bvh':
+				# the same per vertex, only the vertices this frame brings closer get a ray
+				if pruning and vertexMargin == 0:
+					closer = heatmapEngine.vertexDistances(cameraPosition, vertexPositionArray[testedVertices]) < distanceArray[testedVertices]
+					prunedVertices += len(testedVertices) - int(np.count_nonzero(closer))
+					testedVertices = testedVertices[closer]
+
+				visibleIndices = testedVertices[heatmapSpatial.visibleVertexMask(vertexPositionArray, triangleArray, spatialIndex, worldMatrix, lens, resolution, testedVertices)]
+
+			else:
+				# every triangle that can cover a pixel touches one of the chunks in the frustum, their
+				# corners outside those chunks come along so the triangles stay whole
+				frameTriangleIds = heatmapSpatial.chunkTriangleIds(vertexChunks, chunks)
+				frameTriangles = triangleArray[frameTriangleIds]
+				frameVertices = heatmapVisibility.sortedUnique(np.concatenate([heatmapSpatial.chunkVertices(vertexChunks, chunks), frameTriangles.ravel()]))
+				frameTriangles = np.searchsorted(frameVertices, frameTriangles)
+
+				if occlusion == 'raster':
+					visibleIndices = frameVertices[heatmapVisibility.visibleVertexMask(vertexPositionArray[frameVertices], frameTriangles, worldMatrix, lens, resolution)]
+
+				elif faceTriangleLists is None:
+					visibleIndices = frameVertices[heatmapVisibility.tiledVisibleVertexMask(vertexPositionArray[frameVertices], frameTriangles, worldMatrix, lens, resolution, tileThreads)]
+
+				else:
+					triangleMask = heatmapVisibility.tiledVisibleTriangleMask(vertexPositionArray[frameVertices], frameTriangles, worldMatrix, lens, resolution, tileThreads)
+					visibleIndices = heatmapVisibility.polygonVertices(frameTriangleIds[triangleMask], triangleArray, triangleFaces, faceTriangleLists)
+
+		# growing the margin needs one flag per vertex, a byte pass that is cheap next to the float work
+		if vertexMargin > 0:
+			with heatmapProfile.stage('margin'):
+				visibleMask = np.zeros(len(vertexPositionArray), dtype=bool)
+				visibleMask[visibleIndices] = True
+				visibleIndices = np.flatnonzero(heatmapVisibility.growVisibleMask(visibleMask, adjacency, vertexMargin))
+
+		# once the visible set is whole, the vertices of chunks that can't get closer leave the minimum
+		# as it is and skip the reduce
+		if pruning and len(visibleIndices):
+			with heatmapProfile.stage('culling'):
+				visibleChunks = vertexChunks['vertexChunk'][visibleIndices]
+				touchedChunks = heatmapVisibility.sortedUnique(visibleChunks)
+				improvableMask = np.zeros(len(chunkSizes), dtype=bool)
+				improvableMask[touchedChunks[improvableChunks(touchedChunks, cameraPosition)]] = True
+				kept = improvableMask[visibleChunks]
+				prunedVertices += len(visibleIndices) - int(np.count_nonzero(kept))
+				visibleIndices = visibleIndices[kept]
+
+		frameDensities = None
+
+		if statistics and 'density' in statistics:
+			with heatmapProfile.stage('density'):
+				frameDensities = heatmapVisibility.screenDensity(vertexPositionArray[visibleIndices], worldMatrix, lens, resolution)
+
+		if heatmapProfile.activeRun is not None:
+			heatmapProfile.count('chunksTested', len(testedChunks))
+			heatmapProfile.count('verticesTested', len(testedVertices))
+
+		return cameraFrame, visibleIndices, frameDensities, prunedVertices
+
+	# cameraFrames yields (worldMatrix, lens) or (worldMatrix, lens, weight) for every frame to sample, the
+	# weight being the screen time the frame stands for. The frames stream through the visibility stage
+	# with a bounded number of frames in flight, the reduce stays on this thread
+	for cameraFrame, visibleIndices, frameDensities, prunedVertices in heatmapPipeline.boundedMap(frameVisibility, cameraFrames, frameThreads):
+
+		with heatmapProfile.stage('reduce'):
+			cameraPosition = np.asarray(cameraFrame[0]).reshape(4, 4)[3, :3]
+			frameDistances = heatmapEngine.vertexDistances(cameraPosition, vertexPositionArray[visibleIndices])
+
+			# statistics, when given, holds more per vertex arrays to update, e.g. density and count
+			heatmapEngine.reduceVertices(distanceArray, statistics, visibleIndices, frameDistances, frameDensities, cameraFrame[2] if len(cameraFrame) > 2 else 1.0)
+
+			if pruning and len(visibleIndices):
+				touchedChunks = heatmapVisibility.sortedUnique(vertexChunks['vertexChunk'][visibleIndices])
+				chunkFarthest[touchedChunks] = heatmapSpatial.chunkFarthestDistances(vertexChunks, touchedChunks, distanceArray)
+
+		if heatmapProfile.activeRun is not None:
+			heatmapProfile.count('frames')
+			heatmapProfile.count('verticesVisible', len(visibleIndices))
+			heatmapProfile.count('verticesPruned', prunedVertices)
+			heatmapProfile.sample('verticesPruned', prunedVertices)
+
+		# progress(frameCount) is told about every reduced frame on this thread, it may raise to stop the run
+		if progress is not None:
+			progress(1)
+
+	return distanceArray
+
+
+
+
+### REDUCE A LIST OF FRAMES INTO A MEMORY MAPPED .npy FILE
+def paintDistancesToFile(vertexPositionArray, triangleArray, cameraFrames, distancePath, vertexMargin=0, resolution=heatmapVisibility.DEFAULT_RESOLUTION, occlusion='raster', adjacency=None, threads=1, statisticNames=(), triangleFaces=None, cache=True, spatialDirectory=None, progress=None):
+
+	# written next to the target and renamed, so an interrupted job never leaves a partial file behind.
+	# Statistics get their own file next to the distances
+	temporaryPaths = {'distance': distancePath + ".%d.tmp.npy" % os.getpid()}
+	finalPaths = {'distance': distancePath}
+
+	for name in statisticNames:
+		finalPaths[name] = heatmapCache.statisticPath(distancePath, name)
+		temporaryPaths[name] = finalPaths[name] + ".%d.tmp.npy" % os.getpid()
+
+	distanceArray = np.lib.format.open_memmap(temporaryPaths['distance'], mode='w+', dtype=heatmapEngine.DISTANCE_DTYPE, shape=(len(vertexPositionArray),))
+	distanceArray[:] = np.inf
+
+	statistics = heatmapEngine.newStatistics(len(vertexPositionArray), statisticNames, lambda name, dtype, shape: np.lib.format.open_memmap(temporaryPaths[name], mode='w+', dtype=dtype, shape=shape))
+
+	try:
+		paintDistances(vertexPositionArray, triangleArray, cameraFrames, vertexMargin, resolution, distanceArray, occlusion, adjacency, threads, statistics, triangleFaces, cache, spatialDirectory, progress)
+
+	except BaseException:
+		# a failed or stopped run leaves no partial files, the frames are painted from scratch next time
+		del distanceArray, statistics
+		for path in temporaryPaths.values():
+			if os.path.isfile(path):
+				os.remove(path)
+		raise
+
+	for array in [distanceArray] + list(statistics.values()):
+		array.flush()
+	del distanceArray, statistics
+
+	# the distances go last, a distance file on disk means its statistics are there too
+	for name in statisticNames:
+		heatmapCache.replaceFile(temporaryPaths[name], finalPaths[name])
+
+	heatmapCache.replaceFile(temporaryPaths['distance'], distancePath)
+
+	return distancePath
+
+
+
+
+### ONE WORKER OF THE PROCESS POOL, REDUCES ITS FRAMES INTO ITS OWN MEMORY MAPPED BUFFER
+def paintDistancesWorker(job):
+
+	workDirectory, cameraFrames, distancePath, statisticNames, vertexMargin, resolution, occlusion, spatialDirectory = job
+
+	vertexPositionArray = heatmapEngine.loadVertexPositions(os.path.join(workDirectory, "points.npy"))
+	triangleArray = np.load(os.path.join(workDirectory, "triangles.npy"), mmap_mode='r')
+	adjacency = (np.load(os.path.join(workDirectory, "adjacencyIndptr.npy"), mmap_mode='r'), np.load(os.path.join(workDirectory, "adjacencyIndices.npy"), mmap_mode='r'))
+	triangleFacesPath = os.path.join(workDirectory, "triangleFaces.npy")
+	triangleFaces = np.load(triangleFacesPath, mmap_mode='r') if os.path.isfile(triangleFacesPath) else None
+
+	return paintDistancesToFile(vertexPositionArray, triangleArray, cameraFrames, distancePath, vertexMargin, resolution, occlusion, adjacency, 1, statisticNames, triangleFaces, True, spatialDirectory)
+
+
+
+
+### REDUCE EACH FRAME LIST INTO ITS OWN FILE (PLUS STATISTIC FILES), ON A PROCESS POOL WHEN processes > 1
+def paintDistanceFiles(vertexPositionArray, triangleArray, frameLists, distancePaths, vertexMargin=0, resolution=heatmapVisibility.DEFAULT_RESOLUTION, occlusion='raster', adjacency=None, processes=1, threads=1, statisticNames=(), triangleFaces=None, cache=True, progress=None):
+
+	if adjacency is None:
+		adjacency = heatmapVisibility.triangleAdjacency(len(vertexPositionArray), triangleArray)
+
+	if processes == 1:
+		for cameraFrames, distancePath in zip(frameLists, distancePaths):
+			paintDistancesToFile(vertexPositionArray, triangleArray, cameraFrames, distancePath, vertexMargin, resolution, occlusion, adjacency, threads, statisticNames, triangleFaces, cache, progress=progress)
+		return distancePaths
+
+	# with a process pool every worker streams its frames on a single thread
+	workDirectory = tempfile.mkdtemp(prefix="heatmap_")
+
+	try:
+		# the mesh is shared through memory mapped files instead of being pickled for every worker
+		heatmapEngine.saveVertexPositions(os.path.join(workDirectory, "points.npy"), vertexPositionArray)
+		np.save(os.path.join(workDirectory, "triangles.npy"), np.ascontiguousarray(triangleArray, dtype=np.int64))
+		np.save(os.path.join(workDirectory, "adjacencyIndptr.npy"), adjacency[0])
+		np.save(os.path.join(workDirectory, "adjacencyIndices.npy"), adjacency[1])
+		if triangleFaces is not None:
+			np.save(os.path.join(workDirectory, "triangleFaces.npy"), np.asarray(triangleFaces, dtype=np.int64))
+
+		# build the bvh and the culling chunks here once, the workers then load them from the cache
+		# instead of each building them. Without cache they only live in the work directory
+		spatialDirectory = None if cache else workDirectory
+		if occlusion == 'bvh':
+			heatmapSpatial.meshSpatialIndex(vertexPositionArray, triangleArray, spatialDirectory)
+		heatmapSpatial.meshVertexChunks(vertexPositionArray, triangleArray, spatialDirectory)
+
+		jobs = [(workDirectory, cameraFrames, distancePath, tuple(statisticNames), vertexMargin, resolution, occlusion, spatialDirectory) for cameraFrames, distancePath in zip(frameLists, distancePaths)]
+
+		pool = multiprocessing.Pool(processes)
+
+		# the workers can't reach progress, it hears about the frames of each job as the job finishes
+		try:
+			for distancePath in pool.imap_unordered(paintDistancesWorker, jobs, chunksize=1):
+				if progress is not None:
+					progress(len(frameLists[distancePaths.index(distancePath)]))
+			pool.close()
+		except BaseException:
+			pool.terminate()
+			raise
+		finally:
+			pool.join()
+
+	finally:
+		shutil.rmtree(workDirectory, ignore_errors=True)
+
+	return distancePaths
+
+
+
+
+### SAME AS paintDistances, WITH THE FRAMES SPLIT OVER A PROCESS POOL
+def paintDistancesParallel(vertexPositionArray, triangleArray, cameraFrames, vertexMargin=0, resolution=heatmapVisibility.DEFAULT_RESOLUTION, processes=None, occlusion='raster', adjacency=None, statistics=None, triangleFaces=None, cache=True):
+
+	# camera frames get evaluated up front, the workers only see plain arrays
+	cameraFrames = [(np.asarray(cameraFrame[0], dtype=np.float64).reshape(4, 4), dict(cameraFrame[1])) + tuple(cameraFrame[2:]) for cameraFrame in cameraFrames]
+	processes = max(1, min(processes or multiprocessing.cpu_count(), len(cameraFrames)))
+
+	distanceArray = heatmapEngine.newDistanceArray(len(vertexPositionArray))
+
+	if len(cameraFrames) == 0:
+		return distanceArray
+
+	outputDirectory = tempfile.mkdtemp(prefix="heatmap_")
+
+	try:
+		# interleave the frames so neighbouring (similar cost) frames end up on different workers
+		frameLists = [cameraFrames[i::processes] for i in range(processes)]
+		distancePaths = [os.path.join(outputDirectory, "distances_%d.npy" % i) for i in range(processes)]
+		statisticNames = sorted(statistics or {})
+
+		paintDistanceFiles(vertexPositionArray, triangleArray, frameLists, distancePaths, vertexMargin, resolution, occlusion, adjacency, processes, 1, statisticNames, triangleFaces, cache)
+
+		# min is exact and order independent, so the merge matches the serial result bit for bit
+		for distancePath in distancePaths:
+			np.minimum(distanceArray, np.load(distancePath, mmap_mode='r'), out=distanceArray)
+			heatmapEngine.mergeStatistics(statistics, dict((name, np.load(heatmapCache.statisticPath(distancePath, name), mmap_mode='r')) for name in statisticNames))
+
+	finally:
+		shutil.rmtree(outputDirectory, ignore_errors=True)
+
+	return distanceArray
+
+
+
+
+### DISTANCES OF A LIST OF SHOTS, REUSING EVERY CHUNK OF FRAMES THAT IS ALREADY IN THE CACHE
+def paintShotDistances(vertexPositionArray, triangleArray, shotFrames, vertexMargin=0, resolution=heatmapVisibility.DEFAULT_RESOLUTION, occlusion='raster', adjacency=None, processes=1, chunkSize=heatmapCache.DISTANCE_CHUNK_SIZE, cacheReport=None, threads=1, statistics=None, triangleFaces=None, progress=None):
+
+	# shotFrames holds (cameraName, lens, frames, matrices) per shot. Frames are grouped in chunks
+	# aligned on the frame number, so changing a shot's range only invalidates the chunks at its ends.
+	# A chunk key covers the mesh, the settings and the camera matrices of its frames
+	meshHash = heatmapCache.arrayHash(vertexPositionArray, triangleArray, *([] if triangleFaces is None else [triangleFaces]))
+	statisticNames = sorted(statistics or {})
+	settings = np.array([vertexMargin, resolution[0], resolution[1]], dtype=np.float64)
+
+	distancePaths = []
+	missingFrameLists = []
+	missingPaths = []
+	cachedFrames = 0
+
+	for cameraName, lens, frames, matrices in shotFrames:
+
+		frames = np.asarray(frames, dtype=np.float64)
+		matrices = np.asarray(matrices, dtype=np.float64).reshape(-1, 4, 4)
+		lensValues = np.array([lens[key] for key in sorted(lens)], dtype=np.float64)
+		weights = heatmapEngine.frameWeights(frames)
+		chunkIds = np.floor(frames / chunkSize)
+
+		for chunkId in np.unique(chunkIds):
+
+			inChunk = chunkIds == chunkId
+			chunkKey = heatmapCache.arrayHash(settings, lensValues, frames[inChunk], matrices[inChunk], weights[inChunk], np.frombuffer(occlusion.encode("ascii"), dtype=np.uint8))
+			distancePath = heatmapCache.distanceChunkPath(meshHash, cameraName, chunkKey)
+			distancePaths.append(distancePath)
+
+			# a chunk painted without some of the statistics is painted again when they are asked for
+			if not all(os.path.isfile(path) for path in [distancePath] + [heatmapCache.statisticPath(distancePath, name) for name in statisticNames]):
+				missingFrameLists.append([(matrix, lens, weight) for matrix, weight in zip(matrices[inChunk], weights[inChunk])])
+				missingPaths.append(distancePath)
+			else:
+				cachedFrames += int(np.count_nonzero(inChunk))
+
+	if cacheReport is not None:
+		cacheReport['chunks'] = len(distancePaths)
+		cacheReport['computed'] = len(missingPaths)
+
+	heatmapProfile.count('distanceCacheHits', len(distancePaths) - len(missingPaths))
+	heatmapProfile.count('distanceCacheMisses', len(missingPaths))
+
+	# frames of reused chunks count as done straight away. A stop keeps every chunk finished so far
+	if progress is not None:
+		progress(cachedFrames)
+
+	# only new or invalidated chunks get computed
+	for distancePath in missingPaths:
+		if not os.path.isdir(os.path.dirname(distancePath)):
+			os.makedirs(os.path.dirname(distancePath))
+
+	processes = max(1, min(processes or multiprocessing.cpu_count(), max(1, len(missingPaths))))
+	paintDistanceFiles(vertexPositionArray, triangleArray, missingFrameLists, missingPaths, vertexMargin, resolution, occlusion, adjacency, processes, threads, statisticNames, triangleFaces, progress=progress)
+
+	# min-merge the cached and the new chunks
+	distanceArray = heatmapEngine.newDistanceArray(len(vertexPositionArray))
+
+	with heatmapProfile.stage('merge'):
+		for distancePath in distancePaths:
+			np.minimum(distanceArray, heatmapCache.loadDistanceChunk(distancePath), out=distanceArray)
+			heatmapEngine.mergeStatistics(statistics, dict((name, heatmapCache.loadDistanceChunk(heatmapCache.statisticPath(distancePath, name))) for name in statisticNames))
+
+	return distanceArray
+
+
+
+
+### CAMERA FRAMES OF A LIST OF SHOTS IN A MAYA SCENE
+def sceneShotFrames(shots, adaptiveTolerance=0, rotationTolerance=1.0, frameReport=None):
+
+	import heatmap
+
+	shotFrames = []
+
+	# the scene is hashed once for every shot, None when the cache can't be trusted
+	sceneHash = heatmap.sceneHash()
+
+	# shots are (camera, startFrame, endFrame, byFrame) with an inclusive end frame
+	for cameraName, startFrame, endFrame, byFrame in shots:
+
+		lens = heatmap.cameraLens(cameraName)
+		frames = range(int(startFrame), int(endFrame) + 1, int(byFrame))
+
+		# evaluated in bulk (or read from the camera cache), the timeline is never touched
+		matrices = heatmap.cameraMatrices(cameraName, frames, sceneHash)
+
+		# leave out frames where the camera hardly moved since the last sampled one
+		sampledIndices = heatmapEngine.adaptiveFrameIndices(matrices, adaptiveTolerance, rotationTolerance)
+
+		if frameReport is not None:
+			frameReport['sampled'] = frameReport.get('sampled', 0) + len(sampledIndices)
+			frameReport['skipped'] = frameReport.get('skipped', 0) + len(frames) - len(sampledIndices)
+
+		shotFrames.append((cameraName, lens, np.asarray(frames)[sampledIndices], matrices[sampledIndices]))
+
+	return shotFrames
+
+
+
+
+### PAINT ONE MESH OR A LIST OF MESHES FROM A LIST OF SHOTS WITHOUT ANY WINDOWS
+def paintMesh(meshName, shots, vertexMargin=0, rampEntries=None, resolution=heatmapVisibility.DEFAULT_RESOLUTION, processes=1, adaptiveTolerance=0, rotationTolerance=1.0, occlusion='raster', cache=True, threads=1, aggregation='min', lodOutput=None, lodThresholds=heatmapEngine.DEFAULT_LOD_THRESHOLDS, exportPath=None, exportCompression='none', exportFloat16=False):
+
+	import heatmap
+
+	if rampEntries is None:
+		rampEntries = heatmapEngine.defaultRamp()
+
+	# several meshes are painted as one, every frame is evaluated once and the meshes occlude each other
+	meshNames = list(meshName) if isinstance(meshName, (list, tuple)) else [meshName]
+
+	with heatmapProfile.stage('positions'):
+		vertexPositionArray, adjacency, vertexOffsets = heatmap.combinedMeshes(meshNames)
+		triangleArray, triangleFaces = heatmap.combinedTriangles(meshNames, vertexOffsets)
+
+	# the largest screen density and the visible frame count of every vertex, only tracked when written out
+	statisticNames = (['density'] if lodOutput or exportPath else []) + (['count'] if exportPath else [])
+	statisticNames = sorted(set(statisticNames + heatmapEngine.aggregationStatistics(aggregation)))
+	statistics = heatmapEngine.newStatistics(len(vertexPositionArray), statisticNames)
+
+	frameReport = {}
+
+	with heatmapProfile.stage('cameras'):
+		shotFrames = sceneShotFrames(shots, adaptiveTolerance, rotationTolerance, frameReport)
+
+	if cache:
+		cacheReport = {}
+		distanceArray = paintShotDistances(vertexPositionArray, triangleArray, shotFrames, vertexMargin, resolution, occlusion, adjacency, processes, cacheReport=cacheReport, threads=threads, statistics=statistics, triangleFaces=triangleFaces)
+		print("Distance cache: %d of %d frame chunks computed, the rest reused" % (cacheReport['computed'], cacheReport['chunks']))
+
+	else:
+		cameraFrames = [(worldMatrix, lens, weight) for cameraName, lens, frames, matrices in shotFrames for worldMatrix, weight in zip(matrices, heatmapEngine.frameWeights(frames))]
+
+		if processes == 1:
+			distanceArray = paintDistances(vertexPositionArray, triangleArray, cameraFrames, vertexMargin, resolution, occlusion=occlusion, adjacency=adjacency, threads=threads, statistics=statistics, triangleFaces=triangleFaces, cache=False)
+		else:
+			distanceArray = paintDistancesParallel(vertexPositionArray, triangleArray, cameraFrames, vertexMargin, resolution, processes, occlusion, adjacency, statistics, triangleFaces, cache=False)
+
+	print("Sampled %d frames, skipped %d" % (frameReport.get('sampled', 0), frameReport.get('skipped', 0)))
+
+	# the value the colours come from: min distance, mean, visible frame count, screen time weighted or a percentile
+	colourValues = heatmapEngine.aggregateDistances(distanceArray, statistics, aggregation)
+
+	# only vertices that were seen get a colour, same as the interactive tool. One distance range
+	# over all meshes so the colours of neighbouring tiles match
+	distanceRange = heatmapEngine.seenDistanceRange(colourValues)
+
+	with heatmapProfile.stage('colours'):
+		for name, meshDistances in zip(meshNames, heatmapEngine.splitByMesh(colourValues, vertexOffsets)):
+			heatmap.assignVertexColours(meshDistances, name, rampEntries, distanceRange=distanceRange)
+
+	# one byte per vertex for the remesh tools, next to the colours
+	if lodOutput:
+		if not os.path.isdir(lodOutput):
+			os.makedirs(lodOutput)
+
+		for name, meshDensities in zip(meshNames, heatmapEngine.splitByMesh(statistics['density'], vertexOffsets)):
+			heatmapEngine.saveLodBuckets(os.path.join(lodOutput, heatmapCache.safeName(name) + ".lod.npy"), heatmapEngine.lodBuckets(meshDensities, lodThresholds))
+
+	# every mesh in one file, readable without maya
+	if exportPath:
+		colourArray, seenMask = heatmapEngine.distanceColours(colourValues, rampEntries)
+		metadata = {'shots': [list(shot) for shot in shots], 'vertexMargin': vertexMargin, 'occlusion': occlusion, 'aggregation': aggregation, 'ramp': rampEntries, 'lodThresholds': list(lodThresholds), 'histogramRange': list(heatmapEngine.HISTOGRAM_RANGE)}
+		heatmapExport.exportHeatmap(exportPath, distanceArray, statistics, colourArray, heatmapEngine.lodBuckets(statistics['density'], lodThresholds), heatmapExport.meshTable(meshNames, vertexOffsets), metadata, exportCompression, exportFloat16)
+
+	return distanceArray
+
+
+
+
+### "position:r,g,b" TO A RAMP ENTRY
+def parseRampEntry(text):
+
+	position, colour = text.split(":")
+
+	return float(position), tuple(float(i) for i in colour.split(","))
+
+
+
+
+def main(args):
+
+	parser = argparse.ArgumentParser(description="Paint vertex colours from camera distance without the UI (run with mayapy).")
+	parser.add_argument("scene", help="maya scene to open")
+	parser.add_argument("--mesh", nargs="+", action="append", required=True, help="meshes to paint, wildcards like 'tile_*' are matched in the scene, repeatable; several meshes are painted in one pass")
+	parser.add_argument("--shot", nargs=4, action="append", required=True, metavar=("CAMERA", "START", "END", "STEP"), help="camera and inclusive frame range, repeatable")
+	parser.add_argument("--margin", type=int, default=0, help="vertex margin")
+	parser.add_argument("--ramp", nargs="+", type=parseRampEntry, help="ramp entries as position:r,g,b")
+	parser.add_argument("--resolution", nargs=2, type=int, default=list(heatmapVisibility.DEFAULT_RESOLUTION), metavar=("WIDTH", "HEIGHT"))
+	parser.add_argument("--adaptive", type=float, default=0, metavar="DISTANCE", help="skip frames where the camera moved less than this since the last sampled frame; a skipped frame changes a distance by at most this tolerance only for vertices seen from both it and the sample covering it, other vertices can end up farther or unseen")
+	parser.add_argument("--adaptive-rotation", type=float, default=1.0, metavar="DEGREES", help="rotation that always forces a new sample in adaptive mode")
+	parser.add_argument("--occlusion", choices=["raster", "tiles", "bvh"], default="raster", help="depth buffer occlusion, a triangle id buffer rendered in screen tiles on --threads threads, or rays through a bvh cached per mesh")
+	parser.add_argument("--processes", type=int, default=1, help="worker processes for the frames, 0 uses every core")
+	parser.add_argument("--threads", type=int, default=1, help="threads streaming the visibility of the frames of one process")
+	parser.add_argument("--no-cache", action="store_true", help="don't read or write the per-shot distance cache, the bvh and the vertex chunks are only built in memory")
+	parser.add_argument("--aggregate", default="min", metavar="MODE", help="what the colours show per vertex: min (default), mean, count (frames visible), weighted (screen time weighted mean) or a percentile like p10")
+	parser.add_argument("--lod", metavar="DIRECTORY", help="write a uint8 lod bucket per vertex of every mesh (<mesh>.lod.npy) from the largest on-screen density")
+	parser.add_argument("--lod-thresholds", nargs="+", type=float, default=list(heatmapEngine.DEFAULT_LOD_THRESHOLDS), metavar="PIXELS", help="pixels per world unit where each next lod bucket starts")
+	parser.add_argument("--export", metavar="PATH", help="write distances, visible frame counts, densities, lod buckets and colours of every mesh to a .heatmap file")
+	parser.add_argument("--export-compression", choices=heatmapExport.COMPRESSIONS, default="none", help="zlib chunks, or none to keep the fields memory mappable")
+	parser.add_argument("--export-float16", action="store_true", help="store distances and densities as float16, other fields keep full precision")
+	parser.add_argument("--report", metavar="PATH", help="write per-stage timings and counters of the run, as csv when PATH ends in .csv, json otherwise")
+	parser.add_argument("--cprofile", metavar="PATH", help="write cProfile stats of the run here")
+	parser.add_argument("--tracemalloc", action="store_true", help="record the peak python allocation (slows the run down)")
+	parser.add_argument("--output", metavar="PATH", help="save the painted scene here, the input scene is never overwritten")
+	options = parser.parse_args(args)
+
+	if options.output and os.path.abspath(options.output) == os.path.abspath(options.scene):
+		parser.error("--output has to differ from the input scene")
+
+	import maya.standalone
+	maya.standalone.initialize()
+
+	import maya.cmds as cmds
+
+	cmds.file(options.scene, open=True, force=True)
+
+	# names can be wildcards like 'tile_*', matched in the scene rather than by the shell. A mesh
+	# shape stands for its transform, so a pattern matching both paints the mesh once
+	meshNames = []
+	for pattern in [name for names in options.mesh for name in names]:
+		matches = [transform for transform in cmds.ls(pattern, type="transform") or [] if cmds.listRelatives(transform, shapes=True, type="mesh", noIntermediate=True)]
+		matches += [cmds.listRelatives(shape, parent=True)[0] for shape in cmds.ls(pattern, type="mesh", noIntermediate=True) or []]
+		if not matches:
+			parser.error("no mesh matches " + pattern)
+		meshNames += [match for i, match in enumerate(matches) if match not in meshNames and match not in matches[:i]]
+
+	profiling = options.report or options.cprofile or options.tracemalloc
+
+	if profiling:
+		heatmapProfile.startRun(options.cprofile, options.tracemalloc)
+
+	paintMesh(meshNames, options.shot, options.margin, options.ramp, tuple(options.resolution), options.processes or None, options.adaptive, options.adaptive_rotation, options.occlusion, not options.no_cache, options.threads, options.aggregate, options.lod, options.lod_thresholds, options.export, options.export_compression, options.export_float16)
+
+	if profiling:
+		report = heatmapProfile.stopRun()
+		print(heatmapProfile.formatReport(report))
+		if options.report:
+			heatmapProfile.writeReport(report, options.report)
+
+	# the input scene stays as it was, so its hash (and the camera cache keyed on it) holds for the next run
+	if options.output:
+		cmds.file(rename=options.output)
+		cmds.file(save=True, force=True)
+
+
+
+
+if __name__ == "__main__":
+	main(sys.argv[1:])
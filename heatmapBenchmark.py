@@ -0,0 +1,310 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+
+import numpy as np
+
+try:
+	import resource
+except ImportError:
+	resource = None
+
+import heatmapBatch
+import heatmapEngine
+import heatmapProfile
+import heatmapVisibility
+
+
+# bump when the measured stages or the generated scenes change, results of different versions don't compare
+BENCHMARK_VERSION = 3
+
+DEFAULT_VERTEX_COUNTS = [10000, 100000, 1000000]
+
+TERRAIN_SIZE = 1000.0
+
+
+
+### TIME ONE FRAME OF THE DISTANCE REDUCTION
+def benchmarkFrameCost(vertexCount, repeats=5, visibleFraction=0.5, seed=0):
+
+	random = np.random.RandomState(seed)
+	vertexPositionArray = random.uniform(-1000.0, 1000.0, (vertexCount, 3))
+	visibleMask = random.uniform(size=vertexCount) < visibleFraction
+	distanceArray = heatmapEngine.newDistanceArray(vertexCount)
+
+	timings = []
+
+	for i in range(repeats):
+		cameraPosition = random.uniform(-1000.0, 1000.0, 3)
+		start = timeit.default_timer()
+		heatmapEngine.minReduceDistances(distanceArray, cameraPosition, vertexPositionArray, visibleMask)
+		timings.append(timeit.default_timer() - start)
+
+	return min(timings)
+
+
+
+
+### HEIGHT OF THE PROCEDURAL TERRAIN, A FEW OCTAVES OF SINE WAVES WITH FIXED RANDOM DIRECTIONS
+def terrainHeight(x, z, seed=0, octaves=5):
+
+	random = np.random.RandomState(seed)
+	height = np.zeros(np.broadcast(x, z).shape)
+	amplitude = TERRAIN_SIZE * 0.05
+	frequency = 2.0 * np.pi / TERRAIN_SIZE
+
+	for i in range(octaves):
+		angle, phase = random.uniform(0.0, 2.0 * np.pi, 2)
+		height += amplitude * np.sin(frequency * (np.cos(angle) * x + np.sin(angle) * z) + phase)
+		amplitude *= 0.45
+		frequency *= 2.1
+
+	return height
+
+
+
+
+### SQUARE HEIGHTFIELD OF ABOUT vertexCount VERTICES: OBJECT SPACE POINTS, QUADS AND TRIANGLES
+def terrainMesh(vertexCount, seed=0):
+
+	side = max(2, int(round(np.sqrt(vertexCount))))
+	coordinates = np.linspace(-TERRAIN_SIZE * 0.5, TERRAIN_SIZE * 0.5, side)
+	x, z = np.meshgrid(coordinates, coordinates)
+
+	# float32 like the raw points maya hands out
+	pointArray = np.empty((side * side, 3), dtype=np.float32)
+	pointArray[:, 0] = x.ravel()
+	pointArray[:, 1] = terrainHeight(x, z, seed).ravel()
+	pointArray[:, 2] = z.ravel()
+
+	grid = np.arange(side * side, dtype=np.int64).reshape(side, side)
+	quads = np.stack([grid[:-1, :-1], grid[:-1, 1:], grid[1:, 1:], grid[1:, :-1]], axis=-1).reshape(-1, 4)
+	triangleArray = np.concatenate([quads[:, [0, 1, 2]], quads[:, [0, 2, 3]]])
+
+	return pointArray, quads, triangleArray
+
+
+
+
+### CAMERA MATRIX AT eye LOOKING AT target, MAYA LAYOUT (ROW VECTORS, CAMERA LOOKS DOWN -z)
+def lookAtMatrix(eye, target, up=(0.0, 1.0, 0.0)):
+
+	axisZ = np.asarray(eye, dtype=np.float64) - np.asarray(target, dtype=np.float64)
+	axisZ /= np.linalg.norm(axisZ)
+	axisX = np.cross(up, axisZ)
+	axisX /= np.linalg.norm(axisX)
+	axisY = np.cross(axisZ, axisX)
+
+	matrix = np.eye(4)
+	matrix[0, :3] = axisX
+	matrix[1, :3] = axisY
+	matrix[2, :3] = axisZ
+	matrix[3, :3] = eye
+
+	return matrix
+
+
+
+
+### LOW FLYTHROUGH ACROSS THE TERRAIN, LOOKING AHEAD AND DOWN
+def flythroughMatrices(frameCount, seed=0):
+
+	matrices = np.empty((frameCount, 4, 4))
+	altitude = TERRAIN_SIZE * 0.08
+
+	for frame in range(frameCount):
+
+		# an s-curve from one edge of the terrain to the other
+		t = frame / float(max(1, frameCount - 1))
+		x = (t - 0.5) * TERRAIN_SIZE * 0.8
+		z = np.sin(t * 2.0 * np.pi) * TERRAIN_SIZE * 0.2
+		eye = (x, terrainHeight(x, z, seed) + altitude, z)
+
+		targetX = x + TERRAIN_SIZE * 0.1
+		targetZ = np.sin((t + 0.1) * 2.0 * np.pi) * TERRAIN_SIZE * 0.2
+		matrices[frame] = lookAtMatrix(eye, (targetX, terrainHeight(targetX, targetZ, seed), targetZ))
+
+	return matrices
+
+
+
+
+### PEAK RESIDENT MEMORY OF THIS PROCESS IN BYTES, None WHERE IT CAN'T BE READ
+def peakResidentBytes():
+
+	if resource is None:
+		return None
+
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+	# kilobytes on linux, bytes on macos
+	return peak if sys.platform == "darwin" else peak * 1024
+
+
+
+
+### EVERY STAGE OF A PAINT RUN ON ONE TERRAIN, NO MAYA
+def benchmarkPipeline(vertexCount, frameCount=24, vertexMargin=1, resolution=heatmapVisibility.DEFAULT_RESOLUTION, occlusion='raster', threads=1, seed=0):
+
+	objectPointArray, quads, triangleArray = terrainMesh(vertexCount, seed)
+	matrices = flythroughMatrices(frameCount, seed)
+	lens = heatmapVisibility.defaultLens()
+	lens['farClipPlane'] = TERRAIN_SIZE * 10.0
+
+	# the bvh and chunks of the synthetic terrains go to a scratch cache, not the user's, and every run
+	# builds them so results don't depend on what an earlier run left behind
+	cacheDirectory = tempfile.mkdtemp(prefix="heatmap_benchmark_")
+	previousCacheDirectory = os.environ.get("HEATMAP_CACHE_DIR")
+	os.environ["HEATMAP_CACHE_DIR"] = cacheDirectory
+
+	try:
+		return timePipeline(objectPointArray, quads, triangleArray, matrices, lens, vertexMargin, resolution, occlusion, threads)
+
+	finally:
+		if previousCacheDirectory is None:
+			del os.environ["HEATMAP_CACHE_DIR"]
+		else:
+			os.environ["HEATMAP_CACHE_DIR"] = previousCacheDirectory
+		shutil.rmtree(cacheDirectory, ignore_errors=True)
+
+
+
+
+### TIME THE STAGES OF ONE PAINT RUN OVER A FLYTHROUGH
+def timePipeline(objectPointArray, quads, triangleArray, matrices, lens, vertexMargin, resolution, occlusion, threads):
+
+	frameCount = len(matrices)
+
+	heatmapProfile.startRun()
+	start = timeit.default_timer()
+
+	# the same stage names the painter reports
+	with heatmapProfile.stage('positions'):
+		vertexPositionArray = heatmapEngine.transformPoints(objectPointArray, np.eye(4))
+
+	with heatmapProfile.stage('adjacency'):
+		adjacency = heatmapVisibility.vertexAdjacency(len(vertexPositionArray), np.full(len(quads), 4), quads.ravel())
+
+	# terrainMesh splits every quad into the triangles quad and quad + len(quads)
+	triangleFaces = np.tile(np.arange(len(quads)), 2)
+
+	distanceArray = heatmapBatch.paintDistances(vertexPositionArray, triangleArray, [(matrix, lens) for matrix in matrices], vertexMargin, resolution, occlusion=occlusion, adjacency=adjacency, threads=threads, triangleFaces=triangleFaces)
+
+	with heatmapProfile.stage('ramp'):
+		normalizedDistances, seenMask = heatmapEngine.normalizeDistances(distanceArray)
+		vertexIndexArray = np.flatnonzero(seenMask)
+		colourArray = heatmapEngine.rampColours(normalizedDistances[vertexIndexArray], heatmapEngine.defaultRamp())
+
+	# what writeVertexColours hands to maya, the api call itself needs a session
+	with heatmapProfile.stage('colourWrite'):
+		colourList = colourArray.tolist()
+		indexList = vertexIndexArray.tolist()
+
+	wallSeconds = timeit.default_timer() - start
+	report = heatmapProfile.stopRun()
+
+	stages = dict((name, stats['seconds']) for name, stats in report['stages'].items())
+
+	return {
+		'vertices': len(vertexPositionArray),
+		'triangles': len(triangleArray),
+		'frames': frameCount,
+		'seconds': wallSeconds,
+		'stages': stages,
+		'framesPerSecond': frameCount / wallSeconds,
+		'verticesPerSecond': len(vertexPositionArray) * frameCount / wallSeconds,
+		'verticesVisible': report['counters'].get('verticesVisible', 0),
+		'verticesPruned': report['counters'].get('verticesPruned', 0),
+		'verticesSeen': len(indexList),
+		'peakResidentBytes': peakResidentBytes(),
+	}
+
+
+
+
+### ONE SIZE IN A FRESH PROCESS, SO THE PEAK MEMORY OF A SMALLER RUN ISN'T HIDDEN BY A BIGGER ONE
+def benchmarkPipelineIsolated(*args):
+
+	pool = multiprocessing.Pool(1)
+
+	try:
+		return pool.apply(benchmarkPipeline, args)
+	finally:
+		pool.close()
+		pool.join()
+
+
+
+
+### VERSIONS AND HARDWARE THE RESULTS WERE TAKEN ON
+def machineInfo():
+
+	return {
+		'benchmarkVersion': BENCHMARK_VERSION,
+		'python': platform.python_version(),
+		'numpy': np.__version__,
+		'platform': platform.platform(),
+		'processor': platform.processor(),
+		'cpuCount': multiprocessing.cpu_count(),
+		'time': time.strftime("%Y-%m-%dT%H:%M:%S"),
+	}
+
+
+
+
+def main(args):
+
+	parser = argparse.ArgumentParser(description="Time every stage of a paint run on synthetic terrains and camera flythroughs.")
+	parser.add_argument("vertexCounts", nargs="*", type=int, help="terrain sizes, %s by default (10000000 for the largest)" % " ".join(str(i) for i in DEFAULT_VERTEX_COUNTS))
+	parser.add_argument("--frames", type=int, default=24, help="frames of the flythrough")
+	parser.add_argument("--margin", type=int, default=1, help="vertex margin")
+	parser.add_argument("--resolution", nargs=2, type=int, default=list(heatmapVisibility.DEFAULT_RESOLUTION), metavar=("WIDTH", "HEIGHT"))
+	parser.add_argument("--occlusion", choices=["raster", "tiles", "bvh"], default="raster")
+	parser.add_argument("--threads", type=int, default=1)
+	parser.add_argument("--kernel", action="store_true", help="only time the distance reduction of one frame")
+	parser.add_argument("--output", metavar="PATH", help="write the results as json, to compare between versions")
+	options = parser.parse_args(args)
+
+	vertexCounts = options.vertexCounts or DEFAULT_VERTEX_COUNTS
+
+	if options.kernel:
+		print("%12s %12s %14s" % ("vertices", "ms/frame", "ns/vertex"))
+
+		for vertexCount in vertexCounts:
+			frameCost = benchmarkFrameCost(vertexCount)
+			print("%12d %12.3f %14.3f" % (vertexCount, frameCost * 1e3, frameCost * 1e9 / vertexCount))
+
+		return
+
+	results = []
+	stageNames = ['positions', 'adjacency', 'chunkBuild', 'culling', 'visibility', 'margin', 'reduce', 'ramp', 'colourWrite']
+
+	print(("%10s %9s %10s" + " %11s" * len(stageNames) + " %9s") % (("vertices", "seconds", "Mvtx*fr/s") + tuple(stageNames) + ("peak MB",)))
+
+	for vertexCount in vertexCounts:
+
+		result = benchmarkPipelineIsolated(vertexCount, options.frames, options.margin, tuple(options.resolution), options.occlusion, options.threads)
+		results.append(result)
+
+		peakMegabytes = result['peakResidentBytes'] / 1048576.0 if result['peakResidentBytes'] else float('nan')
+		stageSeconds = tuple(result['stages'].get(name, 0.0) for name in stageNames)
+		print(("%10d %9.3f %10.2f" + " %11.4f" * len(stageNames) + " %9.1f") % ((result['vertices'], result['seconds'], result['verticesPerSecond'] / 1e6) + stageSeconds + (peakMegabytes,)))
+
+	if options.output:
+		settings = {'frames': options.frames, 'margin': options.margin, 'resolution': options.resolution, 'occlusion': options.occlusion, 'threads': options.threads}
+
+		with open(options.output, "w") as fileHandle:
+			json.dump({'machine': machineInfo(), 'settings': settings, 'results': results}, fileHandle, indent=2, sort_keys=True)
+
+
+
+
+if __name__ == "__main__":
+	main(sys.argv[1:])
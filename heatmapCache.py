@@ -0,0 +1,257 @@
+import argparse
+import hashlib
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+
+# override with the HEATMAP_CACHE_DIR environment variable, e.g. a shared farm location
+DEFAULT_CACHE_DIRECTORY = os.path.join(os.path.expanduser("~"), ".heatmapGenerator", "cache")
+
+# frames per distance cache shard, shards are aligned on the frame number
+DISTANCE_CHUNK_SIZE = 16
+
+
+
+### WHERE CACHE FILES GO
+def cacheDirectory():
+
+	return os.environ.get("HEATMAP_CACHE_DIR", DEFAULT_CACHE_DIRECTORY)
+
+
+
+
+### CONTENT HASH OF A FILE
+def fileHash(path, blockSize=1 << 20):
+
+	digest = hashlib.sha1()
+
+	with open(path, "rb") as fileHandle:
+		block = fileHandle.read(blockSize)
+		while block:
+			digest.update(block)
+			block = fileHandle.read(blockSize)
+
+	return digest.hexdigest()
+
+
+
+
+### MOVE A FINISHED TEMPORARY FILE ONTO ITS TARGET, windows WON'T RENAME ONTO AN EXISTING FILE
+def replaceFile(source, target):
+
+	if hasattr(os, "replace"):
+		os.replace(source, target)
+		return
+
+	if os.path.exists(target):
+		os.remove(target)
+	os.rename(source, target)
+
+
+
+
+### CONTENT HASH OF SOME ARRAYS, E.G. THE POINTS AND TRIANGLES OF A MESH
+def arrayHash(*arrays):
+
+	digest = hashlib.sha1()
+
+	for array in arrays:
+		array = np.ascontiguousarray(array)
+		digest.update(str(array.dtype).encode("ascii") + str(array.shape).encode("ascii"))
+		digest.update(array.data)
+
+	return digest.hexdigest()
+
+
+
+
+### FILE SYSTEM SAFE VERSION OF A NODE NAME
+def safeName(nodeName):
+
+	# camera names can hold dag separators and namespaces
+	return re.sub(r"[^A-Za-z0-9_.-]", "_", nodeName)
+
+
+
+
+### CACHE FILE OF ONE CAMERA IN ONE SCENE VERSION
+def cameraCachePath(sceneHash, cameraName, directory=None):
+
+	return os.path.join(directory or cacheDirectory(), "cameras", sceneHash, safeName(cameraName) + ".npz")
+
+
+
+
+### STORE (F,4,4) WORLD MATRICES OF A CAMERA
+def saveCameraMatrices(path, frames, matrices):
+
+	if not os.path.isdir(os.path.dirname(path)):
+		os.makedirs(os.path.dirname(path))
+
+	# write next to the target and rename, so a killed job never leaves half a cache file
+	temporaryPath = path + ".%d.tmp.npz" % os.getpid()
+	np.savez(temporaryPath, frames=np.asarray(frames, dtype=np.float64), matrices=np.asarray(matrices, dtype=np.float64).reshape(-1, 4, 4))
+	replaceFile(temporaryPath, path)
+
+
+
+
+### LOAD THE MATRICES OF THE REQUESTED FRAMES, None WHEN THE CACHE DOESN'T COVER THEM ALL
+def loadCameraMatrices(path, frames):
+
+	if not os.path.isfile(path):
+		return None
+
+	cache = np.load(path)
+	cachedFrames = cache["frames"]
+	cachedMatrices = cache["matrices"]
+
+	if len(cachedFrames) == 0:
+		return None
+
+	frames = np.asarray(frames, dtype=np.float64)
+	order = np.argsort(cachedFrames)
+	positions = np.clip(np.searchsorted(cachedFrames[order], frames), 0, len(cachedFrames) - 1)
+
+	if not np.array_equal(cachedFrames[order][positions], frames):
+		return None
+
+	return cachedMatrices[order][positions]
+
+
+
+
+### MERGE NEWLY EVALUATED FRAMES INTO A CAMERA CACHE
+def updateCameraMatrices(path, frames, matrices):
+
+	frames = np.asarray(frames, dtype=np.float64)
+	matrices = np.asarray(matrices, dtype=np.float64).reshape(-1, 4, 4)
+
+	if os.path.isfile(path):
+		cache = np.load(path)
+		keep = ~np.isin(cache["frames"], frames)
+		frames = np.concatenate([cache["frames"][keep], frames])
+		matrices = np.concatenate([cache["matrices"][keep], matrices])
+
+	saveCameraMatrices(path, frames, matrices)
+
+
+
+
+### SHARD OF MIN DISTANCES FOR ONE CHUNK OF FRAMES OF ONE CAMERA
+def distanceChunkPath(meshHash, cameraName, chunkKey, directory=None):
+
+	return os.path.join(directory or cacheDirectory(), "distances", meshHash, safeName(cameraName), chunkKey + ".npy")
+
+
+
+
+### FILE OF A PER VERTEX STATISTIC (density, count, ...) THAT GOES WITH A DISTANCE FILE
+def statisticPath(distancePath, statisticName):
+
+	return os.path.splitext(distancePath)[0] + "." + statisticName + ".npy"
+
+
+
+
+### MEMORY MAPPED READ OF A SHARD, MARKS IT AS RECENTLY USED FOR EVICTION
+def loadDistanceChunk(path):
+
+	# a read only (shared, farm) cache can still be read, it just can't track use
+	try:
+		os.utime(path, None)
+	except OSError:
+		pass
+
+	return np.load(path, mmap_mode='r')
+
+
+
+
+### (PATH, BYTES, LAST USE) OF EVERY FILE IN THE CACHE
+def cacheEntries(directory=None):
+
+	entries = []
+
+	for root, directories, files in os.walk(directory or cacheDirectory()):
+		for fileName in files:
+			path = os.path.join(root, fileName)
+			entries.append((path, os.path.getsize(path), os.path.getmtime(path)))
+
+	return entries
+
+
+
+
+### BYTES AND FILES PER CACHE CATEGORY (cameras, bvh, distances)
+def cacheSummary(directory=None):
+
+	directory = directory or cacheDirectory()
+	summary = {}
+
+	for path, size, lastUse in cacheEntries(directory):
+		category = os.path.relpath(path, directory).split(os.sep)[0]
+		totalSize, fileCount = summary.get(category, (0, 0))
+		summary[category] = (totalSize + size, fileCount + 1)
+
+	return summary
+
+
+
+
+### EVICT BY AGE, THEN LEAST RECENTLY USED FIRST UNTIL THE CACHE FITS maxBytes
+def purgeCache(maxBytes=None, maxAgeDays=None, everything=False, directory=None):
+
+	entries = sorted(cacheEntries(directory), key=lambda entry: entry[2])
+	totalSize = sum(entry[1] for entry in entries)
+	now = time.time()
+	removed = []
+
+	for path, size, lastUse in entries:
+
+		tooOld = maxAgeDays is not None and now - lastUse > maxAgeDays * 86400.0
+		tooBig = maxBytes is not None and totalSize > maxBytes
+
+		if everything or tooOld or tooBig:
+			os.remove(path)
+			totalSize -= size
+			removed.append(path)
+
+	# drop directories that ended up empty
+	for root, directories, files in os.walk(directory or cacheDirectory(), topdown=False):
+		if not os.listdir(root) and root != (directory or cacheDirectory()):
+			os.rmdir(root)
+
+	return removed
+
+
+
+
+def main(args):
+
+	parser = argparse.ArgumentParser(description="Inspect or purge the heatmap cache (" + cacheDirectory() + ").")
+	subparsers = parser.add_subparsers(dest="command")
+	subparsers.add_parser("info", help="size per category")
+	purgeParser = subparsers.add_parser("purge", help="evict old or least recently used files")
+	purgeParser.add_argument("--max-size", type=float, metavar="MB", help="evict least recently used files until the cache is this small")
+	purgeParser.add_argument("--max-age", type=float, metavar="DAYS", help="evict files not used for this many days")
+	purgeParser.add_argument("--all", action="store_true", help="empty the cache")
+	options = parser.parse_args(args)
+
+	if options.command == "purge":
+		maxBytes = options.max_size * 1024 * 1024 if options.max_size is not None else None
+		removed = purgeCache(maxBytes, options.max_age, options.all)
+		print("Removed %d files" % len(removed))
+
+	for category, (totalSize, fileCount) in sorted(cacheSummary().items()):
+		print("%-10s %8d files %12.1f MB" % (category, fileCount, totalSize / 1024.0 / 1024.0))
+
+
+
+
+if __name__ == "__main__":
+	main(sys.argv[1:])
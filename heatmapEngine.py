@@ -0,0 +1,638 @@
+import numpy as np
+
+
+# distances are stored as float32 (4 bytes per vertex), vertices that were never seen stay at infinity
+DISTANCE_DTYPE = np.float32
+
+
+# screen space density in pixels per world unit, the largest over all frames, 0 means never seen
+DENSITY_DTYPE = np.float32
+
+# frames a vertex was visible in
+COUNT_DTYPE = np.uint32
+
+# running sums for the mean and the screen time weighted distance
+SUM_DTYPE = np.float32
+
+# per vertex distance histogram for percentiles: log spaced bins between the two distances,
+# anything outside lands in the first or last bin. A row is 16 uint8 bins, how often they were halved
+# and how many visible frames went unrecorded since the last recorded one, 18 bytes per vertex. When a
+# bin fills up the row is halved and from then on only every 2^halvings-th visible frame is recorded,
+# so the bins stay a sample of all the frames with the proportions percentiles are read from
+HISTOGRAM_RANGE = (1.0, 100000.0)
+HISTOGRAM_BINS = 16
+HISTOGRAM_DTYPE = np.uint8
+HISTOGRAM_COLUMNS = HISTOGRAM_BINS + 2
+HISTOGRAM_HALVINGS = HISTOGRAM_BINS
+HISTOGRAM_SKIPPED = HISTOGRAM_BINS + 1
+
+# past this many halvings (over 30000 frames in one bin) full bins saturate instead
+HISTOGRAM_MAX_HALVINGS = 7
+
+# rows merged at a time, the merge works on int64 copies
+HISTOGRAM_MERGE_ROWS = 1 << 16
+
+# pixels per world unit where the next lod bucket starts, bucket 0 (coarsest) also holds unseen vertices
+DEFAULT_LOD_THRESHOLDS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0)
+
+
+
+### EMPTY DISTANCE ARRAY FOR A MESH
+def newDistanceArray(vertexCount):
+
+	return np.full(vertexCount, np.inf, dtype=DISTANCE_DTYPE)
+
+
+
+
+### OBJECT SPACE POINTS TO WORLD SPACE
+def transformPoints(pointArray, worldMatrix):
+
+	# maya matrices are row major with the translation in the last row: p' = p * M
+	worldMatrix = np.asarray(worldMatrix, dtype=np.float64).reshape(4, 4)
+
+	return np.dot(np.asarray(pointArray, dtype=np.float64), worldMatrix[:3, :3]) + worldMatrix[3, :3]
+
+
+
+
+### LOAD VERTEX POSITIONS WITHOUT MAYA
+def loadVertexPositions(path, memoryMap=True):
+
+	# .npy point files written by saveVertexPositions, memory mapped so farm nodes only page in what they touch
+	pointArray = np.load(path, mmap_mode='r' if memoryMap else None)
+
+	if pointArray.ndim != 2 or pointArray.shape[1] != 3:
+		raise ValueError("Expected an (N,3) point array in " + str(path) + ", got " + str(pointArray.shape))
+
+	return pointArray
+
+
+
+
+### SAVE VERTEX POSITIONS FOR MAYA-FREE RUNS
+def saveVertexPositions(path, pointArray):
+
+	np.save(path, np.ascontiguousarray(pointArray))
+
+
+
+
+### DISTANCE FROM ONE CAMERA POSITION TO ALL VERTICES
+def vertexDistances(cameraPosition, vertexPositionArray):
+
+	# (N,3) - (3,) in one go, no python level loop
+	delta = np.asarray(vertexPositionArray, dtype=np.float64) - np.asarray(cameraPosition, dtype=np.float64)
+
+	# sqrt(dx*dx + dy*dy + dz*dz) without building a temporary for every axis
+	distances = np.sqrt(np.einsum('ij,ij->i', delta, delta))
+
+	return distances.astype(DISTANCE_DTYPE)
+
+
+
+
+### ROTATION ANGLE BETWEEN TWO CAMERA MATRICES, IN DEGREES
+def rotationAngle(matrixA, matrixB):
+
+	# strip the scale from the rotation rows
+	rotationA = matrixA[:3, :3] / np.linalg.norm(matrixA[:3, :3], axis=1)[:, np.newaxis]
+	rotationB = matrixB[:3, :3] / np.linalg.norm(matrixB[:3, :3], axis=1)[:, np.newaxis]
+
+	cosine = (np.trace(np.dot(rotationA, rotationB.T)) - 1.0) * 0.5
+
+	return np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+
+
+
+
+### FRAMES WORTH SAMPLING WHEN THE CAMERA BARELY MOVES
+def adaptiveFrameIndices(matrices, distanceTolerance, rotationTolerance=1.0):
+
+	# a frame is skipped while the camera stays within distanceTolerance (world units) and
+	# rotationTolerance (degrees) of the last sampled frame. Moving the camera by t changes
+	# the distance to any point by at most t, so for vertices seen from both frames the
+	# stored minimum is off by no more than distanceTolerance. A vertex only seen from skipped
+	# frames isn't covered, it stays unseen
+	matrices = np.asarray(matrices, dtype=np.float64).reshape(-1, 4, 4)
+
+	if len(matrices) == 0 or distanceTolerance <= 0:
+		return np.arange(len(matrices))
+
+	sampledIndices = [0]
+
+	for i in range(1, len(matrices)):
+
+		lastSampled = matrices[sampledIndices[-1]]
+		translation = np.linalg.norm(matrices[i][3, :3] - lastSampled[3, :3])
+
+		if translation >= distanceTolerance or rotationAngle(matrices[i], lastSampled) >= rotationTolerance:
+			sampledIndices.append(i)
+
+	# the end of the shot is always sampled
+	if sampledIndices[-1] != len(matrices) - 1:
+		sampledIndices.append(len(matrices) - 1)
+
+	return np.array(sampledIndices, dtype=np.int64)
+
+
+
+
+### POLYGONS OF SEVERAL MESHES AS ONE (COUNTS, INDICES) PAIR
+def combineFaces(faceLists, vertexOffsets):
+
+	faceVertexCounts = np.concatenate([np.asarray(counts, dtype=np.int64) for counts, indices in faceLists])
+	faceVertexIndices = np.concatenate([np.asarray(indices, dtype=np.int64) + offset for (counts, indices), offset in zip(faceLists, vertexOffsets)])
+
+	return faceVertexCounts, faceVertexIndices
+
+
+
+
+### SPLIT A PER VERTEX (OR PER FACE) ARRAY OF COMBINED MESHES BACK INTO ONE VIEW PER MESH
+def splitByMesh(array, offsets):
+
+	return [array[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+
+
+### KEEP THE SMALLEST DISTANCE PER VERTEX, frameDistances SKIPS THE DISTANCE PASS WHEN ALREADY KNOWN
+def minReduceDistances(distanceArray, cameraPosition, vertexPositionArray, visibleMask=None, frameDistances=None):
+
+	if frameDistances is None:
+		frameDistances = vertexDistances(cameraPosition, vertexPositionArray)
+
+	# one masked minimum over the whole array, vertices outside the mask keep their value
+	if visibleMask is not None:
+		np.minimum(distanceArray, frameDistances, out=distanceArray, where=visibleMask)
+
+	else:
+		np.minimum(distanceArray, frameDistances, out=distanceArray)
+
+	return distanceArray
+
+
+
+
+### KEEP THE LARGEST SCREEN DENSITY PER VERTEX
+def maxReduceDensities(densityArray, frameDensities, visibleMask=None):
+
+	if visibleMask is not None:
+		np.maximum(densityArray, frameDensities, out=densityArray, where=visibleMask)
+
+	else:
+		np.maximum(densityArray, frameDensities, out=densityArray)
+
+	return densityArray
+
+
+
+
+### ADD ONE TO THE FRAME COUNT OF EVERY VISIBLE VERTEX
+def countVisible(countArray, visibleMask):
+
+	np.add(countArray, 1, out=countArray, where=visibleMask)
+
+	return countArray
+
+
+
+
+### ADD weight TIMES THE DISTANCE OF EVERY VISIBLE VERTEX TO A RUNNING SUM
+def sumVisible(sumArray, frameValues, visibleMask, weight=1.0):
+
+	if weight != 1.0:
+		frameValues = frameValues * SUM_DTYPE(weight)
+
+	np.add(sumArray, frameValues, out=sumArray, where=visibleMask)
+
+	return sumArray
+
+
+
+
+### BINS DIVIDED BY 2^shifts PER ROW, ROUNDED UP OR DOWN AT RANDOM SO EVERY BIN KEEPS ITS EXPECTED COUNT
+def shiftHistogramBins(bins, shifts, seed=0):
+
+	bins = np.array(bins, dtype=np.int64)
+	shifts = np.minimum(np.asarray(shifts, dtype=np.int64), 62)
+	rows = np.flatnonzero(shifts > 0)
+
+	if len(rows) == 0:
+		return bins
+
+	# seeded from the counts, the same histograms always round the same way. Callers mix in more of
+	# the state (seed), rounding the same counts the same way on every merge would bias them
+	random = np.random.RandomState(int(seed + bins[rows].sum() * 7919 + shifts[rows].sum()) % (1 << 32))
+	rowShifts = shifts[rows, np.newaxis]
+	shifted = bins[rows] >> rowShifts
+	remainders = bins[rows] - (shifted << rowShifts)
+	bins[rows] = shifted + (random.uniform(size=shifted.shape) * (1 << rowShifts) < remainders)
+
+	return bins
+
+
+
+
+### ADD HISTOGRAMS b TO a: BOTH ARE BROUGHT TO THE LARGER SCALE, THEN ROWS THAT OVERFLOW ARE HALVED
+def rescalingAdd(a, b, out):
+
+	limit = np.iinfo(out.dtype).max
+
+	for start in range(0, len(out), HISTOGRAM_MERGE_ROWS):
+
+		rowsA = np.asarray(a[start:start + HISTOGRAM_MERGE_ROWS], dtype=np.int64)
+		rowsB = np.asarray(b[start:start + HISTOGRAM_MERGE_ROWS], dtype=np.int64)
+
+		seed = int(rowsA.sum()) * 31 + int(rowsB.sum()) + start
+		halvings = np.maximum(rowsA[:, HISTOGRAM_HALVINGS], rowsB[:, HISTOGRAM_HALVINGS])
+		bins = shiftHistogramBins(rowsA[:, :HISTOGRAM_BINS], halvings - rowsA[:, HISTOGRAM_HALVINGS], seed) + shiftHistogramBins(rowsB[:, :HISTOGRAM_BINS], halvings - rowsB[:, HISTOGRAM_HALVINGS], seed + 1)
+
+		# two full bins add up to twice the limit at most, one halving brings the row back in range
+		overflow = (bins.max(axis=1) > limit) & (halvings < HISTOGRAM_MAX_HALVINGS)
+		bins[overflow] = shiftHistogramBins(bins[overflow], np.ones(np.count_nonzero(overflow)), seed + 2)
+		halvings[overflow] += 1
+
+		# frames neither side recorded yet stay pending, up to one short of a recorded frame
+		skipped = np.minimum(rowsA[:, HISTOGRAM_SKIPPED] + rowsB[:, HISTOGRAM_SKIPPED], (1 << halvings) - 1)
+
+		out[start:start + HISTOGRAM_MERGE_ROWS, :HISTOGRAM_BINS] = np.minimum(bins, limit)
+		out[start:start + HISTOGRAM_MERGE_ROWS, HISTOGRAM_HALVINGS] = halvings
+		out[start:start + HISTOGRAM_MERGE_ROWS, HISTOGRAM_SKIPPED] = skipped
+
+	return out
+
+
+
+
+### HISTOGRAM BIN OF EVERY DISTANCE
+def histogramBins(distances, distanceRange=HISTOGRAM_RANGE, binCount=HISTOGRAM_BINS):
+
+	near, far = distanceRange
+	position = np.log(np.maximum(distances, near) / near) / np.log(far / near) * binCount
+
+	return np.clip(position, 0, binCount - 1).astype(np.intp)
+
+
+
+
+### COUNT THE DISTANCE OF EVERY VISIBLE VERTEX IN ITS HISTOGRAM BIN
+def histogramVisible(histogramArray, frameDistances, visibleMask):
+
+	visibleIndices = np.flatnonzero(visibleMask)
+	limit = np.iinfo(histogramArray.dtype).max
+
+	# a row halved h times records one of every 2^h of its visible frames
+	skipped = histogramArray[visibleIndices, HISTOGRAM_SKIPPED].astype(np.int64) + 1
+	recorded = skipped >= 1 << histogramArray[visibleIndices, HISTOGRAM_HALVINGS].astype(np.int64)
+	histogramArray[visibleIndices, HISTOGRAM_SKIPPED] = np.where(recorded, 0, skipped)
+
+	visibleIndices = visibleIndices[recorded]
+	bins = histogramBins(frameDistances[visibleIndices])
+
+	# rows whose bin is full are halved first, the count then fits unless the row can't halve any more
+	full = histogramArray[visibleIndices, bins] == limit
+	halving = full & (histogramArray[visibleIndices, HISTOGRAM_HALVINGS] < HISTOGRAM_MAX_HALVINGS)
+	halvingRows = visibleIndices[halving]
+	histogramArray[halvingRows, :HISTOGRAM_BINS] = shiftHistogramBins(histogramArray[halvingRows, :HISTOGRAM_BINS], np.ones(len(halvingRows)))
+	histogramArray[halvingRows, HISTOGRAM_HALVINGS] += 1
+
+	# one increment per vertex and frame, so plain fancy indexing can't collide
+	counting = ~full | halving
+	histogramArray[visibleIndices[counting], bins[counting]] += 1
+
+	return histogramArray
+
+
+
+
+### DISTANCE BELOW WHICH percentile PERCENT OF THE VISIBLE FRAMES FALL, inf FOR VERTICES NEVER SEEN
+def histogramPercentile(histogramArray, percentile, distanceRange=HISTOGRAM_RANGE):
+
+	near, far = distanceRange
+	histogramArray = histogramArray[:, :HISTOGRAM_BINS]
+	binCount = histogramArray.shape[1]
+
+	# halving scales every bin of a row alike, proportions are all a percentile needs
+	cumulative = np.cumsum(histogramArray, axis=1, dtype=np.float64)
+	total = cumulative[:, -1]
+	target = total * (percentile / 100.0)
+
+	# first non-empty bin that reaches the target, then interpolate inside it on the log scale. Empty
+	# leading bins are skipped so p0 is the lower edge of the nearest bin with data, not the histogram floor
+	binIndex = np.minimum(((cumulative < target[:, np.newaxis]) | (cumulative == 0)).sum(axis=1), binCount - 1)
+	rows = np.arange(len(histogramArray))
+	binCounts = histogramArray[rows, binIndex].astype(np.float64)
+	before = cumulative[rows, binIndex] - binCounts
+	fraction = np.clip(np.where(binCounts > 0, (target - before) / np.where(binCounts > 0, binCounts, 1.0), 0.0), 0.0, 1.0)
+
+	result = (near * (far / near) ** ((binIndex + fraction) / binCount)).astype(DISTANCE_DTYPE)
+	result[total == 0] = np.inf
+
+	return result
+
+
+
+
+# per vertex statistics that can be kept next to the min distance: dtype, columns (None for one
+# value per vertex), start value and the function that merges two partial results (workers, cache
+# shards) as merge(a, b, out=a)
+STATISTICS = {
+	'density': (DENSITY_DTYPE, None, 0, np.maximum),
+	'count': (COUNT_DTYPE, None, 0, np.add),
+	'distanceSum': (SUM_DTYPE, None, 0, np.add),
+	'weight': (SUM_DTYPE, None, 0, np.add),
+	'weightedDistanceSum': (SUM_DTYPE, None, 0, np.add),
+	'histogram': (HISTOGRAM_DTYPE, HISTOGRAM_COLUMNS, 0, rescalingAdd),
+}
+
+# statistics each way of turning the frames of a vertex into one distance needs,
+# percentiles are written pNN (p10, p50, ...) and use the histogram
+AGGREGATIONS = {
+	'min': [],
+	'mean': ['count', 'distanceSum'],
+	'count': ['count'],
+	'weighted': ['weight', 'weightedDistanceSum'],
+	'percentile': ['histogram'],
+}
+
+# statistics that need the distances of every frame, not only the minimum
+DISTANCE_STATISTICS = ('distanceSum', 'weightedDistanceSum', 'histogram')
+
+
+
+### ARRAYS FOR A SET OF STATISTICS, allocate(name, dtype, shape) CAN HAND OUT E.G. MEMORY MAPPED ONES
+def newStatistics(vertexCount, statisticNames, allocate=None):
+
+	statistics = {}
+
+	for name in statisticNames:
+
+		if name not in STATISTICS:
+			raise ValueError("Unknown statistic: " + str(name))
+
+		dtype, columns, startValue, mergeFunction = STATISTICS[name]
+		shape = (vertexCount,) if columns is None else (vertexCount, columns)
+		statistics[name] = allocate(name, dtype, shape) if allocate else np.empty(shape, dtype=dtype)
+		statistics[name][:] = startValue
+
+	return statistics
+
+
+
+
+### UPDATE THE STATISTICS WITH ONE FRAME, weight IS THE SCREEN TIME THE FRAME STANDS FOR
+def reduceStatistics(statistics, visibleMask, frameDensities=None, frameDistances=None, weight=1.0):
+
+	if 'count' in statistics:
+		countVisible(statistics['count'], visibleMask)
+
+	if 'density' in statistics:
+		maxReduceDensities(statistics['density'], frameDensities, visibleMask)
+
+	if 'distanceSum' in statistics:
+		sumVisible(statistics['distanceSum'], frameDistances, visibleMask)
+
+	if 'weight' in statistics:
+		np.add(statistics['weight'], SUM_DTYPE(weight), out=statistics['weight'], where=visibleMask)
+
+	if 'weightedDistanceSum' in statistics:
+		sumVisible(statistics['weightedDistanceSum'], frameDistances, visibleMask, weight)
+
+	if 'histogram' in statistics:
+		histogramVisible(statistics['histogram'], frameDistances, visibleMask)
+
+	return statistics
+
+
+
+
+### REDUCE ONE FRAME INTO THE VERTICES AT vertexIndices ONLY, THE FRAME VALUES HOLD ONE ENTRY PER INDEX
+def reduceVertices(distanceArray, statistics, vertexIndices, frameDistances, frameDensities=None, weight=1.0):
+
+	# gather, reduce and scatter back, the work follows the visible vertices instead of the whole mesh
+	distanceArray[vertexIndices] = np.minimum(distanceArray[vertexIndices], frameDistances)
+
+	if statistics:
+		partialStatistics = dict((name, array[vertexIndices]) for name, array in statistics.items())
+		reduceStatistics(partialStatistics, np.ones(len(vertexIndices), dtype=bool), frameDensities, frameDistances, weight)
+
+		for name, array in partialStatistics.items():
+			statistics[name][vertexIndices] = array
+
+	return distanceArray
+
+
+
+
+### MERGE PARTIAL STATISTICS OF THE SAME VERTICES INTO statistics
+def mergeStatistics(statistics, partialStatistics):
+
+	for name, array in (statistics or {}).items():
+		STATISTICS[name][3](array, partialStatistics[name], out=array)
+
+	return statistics
+
+
+
+
+### STATISTICS AN AGGREGATION NEEDS, E.G. ['histogram'] FOR p10
+def aggregationStatistics(aggregation):
+
+	if aggregation.startswith('p') and aggregation[1:].replace('.', '', 1).isdigit():
+		if not 0.0 <= float(aggregation[1:]) <= 100.0:
+			raise ValueError("Percentile out of range: " + str(aggregation))
+		return AGGREGATIONS['percentile']
+
+	if aggregation not in AGGREGATIONS:
+		raise ValueError("Unknown aggregation: " + str(aggregation))
+
+	return AGGREGATIONS[aggregation]
+
+
+
+
+### ONE VALUE PER VERTEX TO COLOUR BY, inf FOR VERTICES THAT WERE NEVER SEEN
+def aggregateDistances(distanceArray, statistics, aggregation='min'):
+
+	aggregationStatistics(aggregation)
+
+	if aggregation == 'min':
+		return distanceArray
+
+	# every other mode is only defined where the vertex was seen
+	seenMask = distanceArray != np.inf
+	result = np.full(len(distanceArray), np.inf, dtype=DISTANCE_DTYPE)
+
+	if aggregation == 'mean':
+		result[seenMask] = statistics['distanceSum'][seenMask] / statistics['count'][seenMask]
+	elif aggregation == 'count':
+		result[seenMask] = statistics['count'][seenMask]
+	elif aggregation == 'weighted':
+		result[seenMask] = statistics['weightedDistanceSum'][seenMask] / statistics['weight'][seenMask]
+	else:
+		result[seenMask] = histogramPercentile(statistics['histogram'][seenMask], float(aggregation[1:]))
+
+	return result
+
+
+
+
+### SCREEN TIME OF EVERY SAMPLED FRAME: THE TIMELINE FRAMES UNTIL THE NEXT SAMPLE
+def frameWeights(frames):
+
+	frames = np.asarray(frames, dtype=np.float64)
+
+	if len(frames) == 0:
+		return frames
+
+	# the last sample stands for one step, the smallest one of the shot
+	steps = np.diff(frames)
+	lastStep = steps.min() if len(steps) else 1.0
+
+	return np.append(steps, lastStep)
+
+
+
+
+### SCREEN DENSITY TO A uint8 LOD BUCKET, THE NUMBER OF THRESHOLDS IT REACHES
+def lodBuckets(densityArray, thresholds=DEFAULT_LOD_THRESHOLDS):
+
+	thresholds = np.sort(np.asarray(thresholds, dtype=DENSITY_DTYPE))
+
+	if len(thresholds) > 255:
+		raise ValueError("At most 255 lod thresholds fit in a uint8 bucket, got " + str(len(thresholds)))
+
+	return np.searchsorted(thresholds, densityArray, side='right').astype(np.uint8)
+
+
+
+
+### SAVE PER VERTEX LOD BUCKETS, ONE BYTE PER VERTEX
+def saveLodBuckets(path, bucketArray):
+
+	np.save(path, np.ascontiguousarray(bucketArray, dtype=np.uint8))
+
+
+
+
+### SMALLEST AND LARGEST SEEN DISTANCE, None WHEN NOTHING WAS SEEN
+def seenDistanceRange(distanceArray):
+
+	seenDistances = distanceArray[distanceArray != np.inf]
+
+	if len(seenDistances) == 0:
+		return None
+
+	return seenDistances.min(), seenDistances.max()
+
+
+
+
+### SCALE THE SEEN DISTANCES TO 0-1, OVER THEIR OWN RANGE OR A GIVEN (MIN, MAX) SHARED BY SEVERAL MESHES
+def normalizeDistances(distanceArray, distanceRange=None):
+
+	seenMask = distanceArray != np.inf
+	normalizedDistances = np.zeros(len(distanceArray), dtype=DISTANCE_DTYPE)
+
+	seenDistances = distanceArray[seenMask]
+
+	if len(seenDistances) == 0:
+		return normalizedDistances, seenMask
+
+	minDistance, maxDistance = distanceRange or (seenDistances.min(), seenDistances.max())
+	distanceSpan = maxDistance - minDistance
+
+	# a single distance (or a single vertex) maps to the start of the ramp
+	if distanceSpan > 0:
+		seenDistances -= minDistance
+		seenDistances /= distanceSpan
+		normalizedDistances[seenMask] = seenDistances
+
+	return normalizedDistances, seenMask
+
+
+
+
+### DEFAULT RAMP, SAME AS THE ONE THE UI CREATES
+def defaultRamp():
+
+	# (position, (r, g, b)) entries
+	return [(0.0, (1.0, 1.0, 1.0)), (1.0, (0.0, 0.0, 0.0))]
+
+
+
+
+# interpolation modes of the maya ramp node, in the order of its enum
+RAMP_INTERPOLATIONS = ['none', 'linear', 'exponentialUp', 'exponentialDown', 'smooth']
+
+RAMP_LOOKUP_SIZE = 4096
+
+
+
+### SAMPLE THE RAMP ONCE INTO A LOOKUP TABLE
+def rampLookupTable(rampEntries, interpolation='linear', size=RAMP_LOOKUP_SIZE):
+
+	if interpolation not in RAMP_INTERPOLATIONS:
+		raise ValueError("Unknown ramp interpolation: " + str(interpolation))
+
+	rampEntries = sorted(rampEntries, key=lambda entry: entry[0])
+	positions = np.array([entry[0] for entry in rampEntries], dtype=np.float64)
+	colours = np.array([entry[1] for entry in rampEntries], dtype=np.float64)
+
+	samples = np.linspace(0.0, 1.0, size)
+
+	# entry each sample starts from, and how far it is towards the next one
+	lower = np.clip(np.searchsorted(positions, samples, side='right') - 1, 0, len(positions) - 1)
+	upper = np.minimum(lower + 1, len(positions) - 1)
+	span = positions[upper] - positions[lower]
+	blend = np.where(span > 0, (samples - positions[lower]) / np.where(span > 0, span, 1.0), 0.0)
+	blend = np.clip(blend, 0.0, 1.0)
+
+	if interpolation == 'none':
+		blend = np.zeros_like(blend)
+	elif interpolation == 'exponentialUp':
+		blend = blend * blend
+	elif interpolation == 'exponentialDown':
+		blend = 1.0 - (1.0 - blend) * (1.0 - blend)
+	elif interpolation == 'smooth':
+		blend = blend * blend * (3.0 - 2.0 * blend)
+
+	# before the first entry the first colour holds
+	blend[samples < positions[0]] = 0.0
+
+	lookupTable = colours[lower] + (colours[upper] - colours[lower]) * blend[:, np.newaxis]
+
+	return lookupTable.astype(np.float32)
+
+
+
+
+### MAP 0-1 VALUES TO COLOURS WITH ONE GATHER
+def lookupColours(normalizedDistances, lookupTable):
+
+	lookupIndices = np.clip(np.rint(np.asarray(normalizedDistances) * (len(lookupTable) - 1)), 0, len(lookupTable) - 1).astype(np.intp)
+
+	return lookupTable[lookupIndices]
+
+
+
+
+### SAMPLE A RAMP FOR ALL VALUES AT ONCE
+def rampColours(normalizedDistances, rampEntries, interpolation='linear'):
+
+	return lookupColours(normalizedDistances, rampLookupTable(rampEntries, interpolation))
+
+
+
+
+### COLOUR OF EVERY VERTEX FROM ITS DISTANCE, BLACK WHERE IT WAS NEVER SEEN
+def distanceColours(distanceArray, rampEntries, interpolation='linear', distanceRange=None):
+
+	normalizedDistances, seenMask = normalizeDistances(distanceArray, distanceRange)
+
+	colourArray = np.zeros((len(distanceArray), 3), dtype=np.float32)
+	colourArray[seenMask] = rampColours(normalizedDistances[seenMask], rampEntries, interpolation)
+
+	return colourArray, seenMask
@@ -0,0 +1,258 @@
+import json
+import os
+import struct
+import sys
+import zlib
+
+import numpy as np
+
+import heatmapCache
+import heatmapPipeline
+
+
+# file layout, all little endian:
+#   preamble    magic, format version, flags, header offset and header length (PREAMBLE_FORMAT)
+#   fields      one block per field, each starting on an ALIGNMENT boundary. Uncompressed blocks are the
+#               raw (rows, columns) array so readers can memory map them, compressed blocks are a run of
+#               zlib streams of up to chunkRows rows each
+#   header      utf-8 json: vertex count, meshes, and per field its dtype, shape, offset and chunks
+MAGIC = b"HEATMAP\0"
+FORMAT_VERSION = 1
+PREAMBLE_FORMAT = "<8sIIQQ"
+ALIGNMENT = 64
+
+# rows per compressed chunk, a reader can stream a field one chunk at a time
+DEFAULT_CHUNK_ROWS = 1 << 20
+
+COMPRESSIONS = ['none', 'zlib']
+
+# largest finite float16, bigger distances are clamped so they don't turn into "never seen"
+FLOAT16_MAX = float(np.finfo(np.float16).max)
+
+# fields that may be stored as float16, sums and weights would saturate at FLOAT16_MAX and stay float32
+FLOAT16_FIELDS = ('distance', 'density')
+
+
+
+### WRITE ZERO BYTES UP TO THE NEXT ALIGNMENT BOUNDARY
+def padToAlignment(fileHandle):
+
+	position = fileHandle.tell()
+	padding = -position % ALIGNMENT
+	fileHandle.write(b"\0" * padding)
+
+	return position + padding
+
+
+
+
+### FLOAT FIELD TO FLOAT16, CLAMPING FINITE VALUES TO THE FLOAT16 RANGE
+def toFloat16(array):
+
+	array = np.asarray(array)
+	finite = np.isfinite(array)
+
+	return np.where(finite, np.clip(array, -FLOAT16_MAX, FLOAT16_MAX), array).astype(np.float16)
+
+
+
+
+### WRITE PER VERTEX FIELDS (name: (N,) or (N,k) array) TO A HEATMAP FILE
+def writeHeatmapFile(path, fields, meshes=None, metadata=None, compression='none', float16=False, chunkRows=DEFAULT_CHUNK_ROWS):
+
+	if compression not in COMPRESSIONS:
+		raise ValueError("Unknown compression: " + str(compression))
+
+	vertexCounts = set(len(array) for array in fields.values())
+
+	if len(vertexCounts) > 1:
+		raise ValueError("Every field needs one row per vertex, got lengths " + str(sorted(vertexCounts)))
+
+	vertexCount = vertexCounts.pop() if vertexCounts else 0
+
+	header = {
+		'vertexCount': vertexCount,
+		'meshes': meshes or [{'name': '', 'vertexOffset': 0, 'vertexCount': vertexCount}],
+		'fields': {},
+		'metadata': metadata or {},
+	}
+
+	# written next to the target and renamed, so an interrupted export never leaves a broken file
+	temporaryPath = path + ".%d.tmp" % os.getpid()
+
+	with open(temporaryPath, "wb") as fileHandle:
+
+		fileHandle.write(struct.pack(PREAMBLE_FORMAT, MAGIC, FORMAT_VERSION, 0, 0, 0))
+
+		for name in sorted(fields):
+
+			array = np.asarray(fields[name])
+
+			if float16 and name in FLOAT16_FIELDS and array.dtype.kind == 'f':
+				array = toFloat16(array)
+
+			array = np.ascontiguousarray(array.astype(array.dtype.newbyteorder('<'), copy=False))
+			offset = padToAlignment(fileHandle)
+			field = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset, 'compression': compression}
+
+			if compression == 'none':
+				array.tofile(fileHandle)
+
+			else:
+				chunks = []
+				for start in range(0, len(array), chunkRows):
+					block = zlib.compress(array[start:start + chunkRows].tobytes(), 1)
+					chunks.append([fileHandle.tell(), len(block), min(chunkRows, len(array) - start)])
+					fileHandle.write(block)
+				field['chunks'] = chunks
+
+			header['fields'][name] = field
+
+		headerOffset = padToAlignment(fileHandle)
+		headerBytes = json.dumps(header, sort_keys=True).encode("utf-8")
+		fileHandle.write(headerBytes)
+
+		fileHandle.seek(0)
+		fileHandle.write(struct.pack(PREAMBLE_FORMAT, MAGIC, FORMAT_VERSION, 0, headerOffset, len(headerBytes)))
+
+	heatmapCache.replaceFile(temporaryPath, path)
+
+	return path
+
+
+
+
+### HEADER OF A HEATMAP FILE
+def readHeader(path):
+
+	with open(path, "rb") as fileHandle:
+
+		preamble = fileHandle.read(struct.calcsize(PREAMBLE_FORMAT))
+
+		if len(preamble) < struct.calcsize(PREAMBLE_FORMAT):
+			raise ValueError(str(path) + " is not a heatmap file")
+
+		magic, version, flags, headerOffset, headerLength = struct.unpack(PREAMBLE_FORMAT, preamble)
+
+		if magic != MAGIC:
+			raise ValueError(str(path) + " is not a heatmap file")
+		if version > FORMAT_VERSION:
+			raise ValueError(str(path) + " is format version " + str(version) + ", this reader handles up to " + str(FORMAT_VERSION))
+
+		fileHandle.seek(headerOffset)
+		header = json.loads(fileHandle.read(headerLength).decode("utf-8"))
+
+	header['version'] = version
+
+	return header
+
+
+
+
+### ONE FIELD: A READ ONLY MEMORY MAP WHEN STORED UNCOMPRESSED, DECOMPRESSED INTO MEMORY OTHERWISE
+def readField(path, name, header=None, threads=1):
+
+	header = header or readHeader(path)
+	field = header['fields'][name]
+	shape = tuple(field['shape'])
+
+	if field['compression'] == 'none':
+		if shape[0] == 0:
+			return np.zeros(shape, dtype=field['dtype'])
+		return np.memmap(path, dtype=field['dtype'], mode='r', offset=field['offset'], shape=shape)
+
+	array = np.empty(shape, dtype=field['dtype'])
+
+	for start, block in iterField(path, name, header, threads=threads):
+		array[start:start + len(block)] = block
+
+	return array
+
+
+
+
+### STREAM A FIELD AS (FIRST ROW, ROWS) BLOCKS WITHOUT HOLDING ALL OF IT, threads DECOMPRESS CHUNKS SIDE BY SIDE
+def iterField(path, name, header=None, chunkRows=DEFAULT_CHUNK_ROWS, threads=1):
+
+	header = header or readHeader(path)
+	field = header['fields'][name]
+	dtype = np.dtype(field['dtype'])
+	shape = tuple(field['shape'])
+
+	if field['compression'] == 'none':
+		array = readField(path, name, header)
+		for start in range(0, shape[0], chunkRows):
+			yield start, array[start:start + chunkRows]
+		return
+
+	# zlib releases the gil, so chunks decompress in parallel while the file is read in order
+	def decompressChunk(chunk):
+		start, rows, data = chunk
+		return start, np.frombuffer(zlib.decompress(data), dtype=dtype).reshape((rows,) + shape[1:])
+
+	def readChunks():
+		with open(path, "rb") as fileHandle:
+			start = 0
+			for offset, size, rows in field['chunks']:
+				fileHandle.seek(offset)
+				yield start, rows, fileHandle.read(size)
+				start += rows
+
+	for start, block in heatmapPipeline.boundedMap(decompressChunk, readChunks(), threads):
+		yield start, block
+
+
+
+
+### COLOURS AS 8 BIT RGB
+def quantizeColours(colourArray):
+
+	return np.clip(np.rint(np.asarray(colourArray) * 255.0), 0, 255).astype(np.uint8)
+
+
+
+
+### EXPORT THE RESULT OF A PAINT RUN: MIN DISTANCE, STATISTICS (count, density, ...) AND COLOURS
+def exportHeatmap(path, distanceArray, statistics=None, colourArray=None, lodArray=None, meshes=None, metadata=None, compression='none', float16=False):
+
+	# never seen vertices keep an infinite distance and a count of 0
+	fields = {'distance': distanceArray}
+	fields.update(statistics or {})
+
+	if colourArray is not None:
+		fields['colour'] = quantizeColours(colourArray)
+	if lodArray is not None:
+		fields['lod'] = np.asarray(lodArray, dtype=np.uint8)
+
+	return writeHeatmapFile(path, fields, meshes, metadata, compression, float16)
+
+
+
+
+### MESH TABLE FOR THE HEADER FROM NAMES AND VERTEX OFFSETS OF COMBINED MESHES
+def meshTable(meshNames, vertexOffsets):
+
+	return [{'name': str(meshNames[i]), 'vertexOffset': int(vertexOffsets[i]), 'vertexCount': int(vertexOffsets[i + 1] - vertexOffsets[i])} for i in range(len(meshNames))]
+
+
+
+
+### PRINT THE CONTENTS OF A HEATMAP FILE
+def main(args):
+
+	for path in args:
+
+		header = readHeader(path)
+		print("%s: version %d, %d vertices" % (path, header['version'], header['vertexCount']))
+
+		for mesh in header['meshes']:
+			print("  mesh %-30s vertices %d-%d" % (mesh['name'], mesh['vertexOffset'], mesh['vertexOffset'] + mesh['vertexCount'] - 1))
+
+		for name, field in sorted(header['fields'].items()):
+			print("  field %-10s %-6s %-16s %s" % (name, field['dtype'], tuple(field['shape']), field['compression']))
+
+
+
+
+if __name__ == "__main__":
+	main(sys.argv[1:])
@@ -0,0 +1,38 @@
+import collections
+from multiprocessing.pool import ThreadPool
+
+
+# results kept in flight per thread, enough to hide the latency of one slow frame
+DEFAULT_QUEUE_DEPTH = 2
+
+
+
+### LAZY, ORDERED map OVER A THREAD POOL WITH A BOUNDED NUMBER OF RESULTS IN FLIGHT
+def boundedMap(function, items, threads=1, queueSize=None):
+
+	# items is pulled only as results are consumed, so a long shot never sits in memory as a whole.
+	# numpy releases the gil in its inner loops, which is where the threads overlap
+	if threads <= 1:
+		for item in items:
+			yield function(item)
+		return
+
+	queueSize = max(1, queueSize or threads * DEFAULT_QUEUE_DEPTH)
+	pool = ThreadPool(threads)
+	pending = collections.deque()
+
+	try:
+		for item in items:
+
+			pending.append(pool.apply_async(function, (item,)))
+
+			if len(pending) >= queueSize:
+				yield pending.popleft().get()
+
+		while pending:
+			yield pending.popleft().get()
+
+	finally:
+		pool.terminate()
+		pool.join()
+
@@ -0,0 +1,205 @@
+import cProfile
+import csv
+import json
+import threading
+import time
+
+try:
+	import tracemalloc
+except ImportError:
+	tracemalloc = None
+
+
+# stats of the run being recorded, None while instrumentation is off
+activeRun = None
+
+runLock = threading.Lock()
+
+
+
+### TIMES ONE STAGE INTO THE ACTIVE RUN, TIMES OF STAGES RUNNING ON SEVERAL THREADS ADD UP
+class StageTimer(object):
+
+	def __init__(self, run, name):
+
+		self.run = run
+		self.name = name
+
+	def __enter__(self):
+
+		self.start = time.time()
+
+		return self
+
+	def __exit__(self, *exceptionInfo):
+
+		elapsed = time.time() - self.start
+
+		with runLock:
+			seconds, calls = self.run['stages'].get(self.name, (0.0, 0))
+			self.run['stages'][self.name] = (seconds + elapsed, calls + 1)
+
+
+
+
+### STAND-IN WHEN INSTRUMENTATION IS OFF, ENTERING IT COSTS ONE ATTRIBUTE LOOKUP
+class NullTimer(object):
+
+	def __enter__(self):
+
+		return self
+
+	def __exit__(self, *exceptionInfo):
+
+		return False
+
+
+NULL_TIMER = NullTimer()
+
+
+
+
+### START RECORDING, OPTIONALLY WITH cProfile AND tracemalloc
+def startRun(profilePath=None, traceMemory=False):
+
+	global activeRun
+
+	activeRun = {
+		'start': time.time(),
+		'stages': {},
+		'counters': {},
+		'series': {},
+		'profilePath': profilePath,
+		'profiler': None,
+		'traceMemory': traceMemory and tracemalloc is not None,
+	}
+
+	if activeRun['traceMemory']:
+		tracemalloc.start()
+
+	# cProfile only sees the thread that starts it, pipeline threads show up as time spent waiting
+	if profilePath:
+		activeRun['profiler'] = cProfile.Profile()
+		activeRun['profiler'].enable()
+
+	return activeRun
+
+
+
+
+### STOP RECORDING AND RETURN THE REPORT
+def stopRun():
+
+	global activeRun
+
+	run = activeRun
+	activeRun = None
+
+	if run is None:
+		return None
+
+	if run['profiler'] is not None:
+		run['profiler'].disable()
+		run['profiler'].dump_stats(run['profilePath'])
+
+	report = {
+		'wallSeconds': time.time() - run['start'],
+		'stages': dict((name, {'seconds': seconds, 'calls': calls}) for name, (seconds, calls) in run['stages'].items()),
+		'counters': dict(run['counters']),
+		'series': dict((name, list(values)) for name, values in run['series'].items()),
+	}
+
+	if run['traceMemory']:
+		currentBytes, peakBytes = tracemalloc.get_traced_memory()
+		tracemalloc.stop()
+		report['counters']['peakBytesAllocated'] = peakBytes
+
+	return report
+
+
+
+
+### TIMER FOR ONE STAGE: with heatmapProfile.stage('visibility'): ...
+def stage(name):
+
+	run = activeRun
+
+	if run is None:
+		return NULL_TIMER
+
+	return StageTimer(run, name)
+
+
+
+
+### ADD TO A COUNTER OF THE ACTIVE RUN
+def count(name, value=1):
+
+	run = activeRun
+
+	if run is None:
+		return
+
+	with runLock:
+		run['counters'][name] = run['counters'].get(name, 0) + value
+
+
+
+
+### APPEND TO A PER-FRAME SERIES OF THE ACTIVE RUN, CALLED IN FRAME ORDER
+def sample(name, value):
+
+	run = activeRun
+
+	if run is None:
+		return
+
+	with runLock:
+		run['series'].setdefault(name, []).append(value)
+
+
+
+
+### WRITE A REPORT AS JSON, OR AS CSV WHEN THE PATH ENDS IN .csv
+def writeReport(report, path):
+
+	if path.lower().endswith(".csv"):
+
+		with open(path, "w") as fileHandle:
+			writer = csv.writer(fileHandle)
+			writer.writerow(["kind", "name", "value", "calls"])
+			writer.writerow(["wall", "total", report['wallSeconds'], 1])
+			for name, stats in sorted(report['stages'].items()):
+				writer.writerow(["stage", name, stats['seconds'], stats['calls']])
+			for name, value in sorted(report['counters'].items()):
+				writer.writerow(["counter", name, value, ""])
+			for name, values in sorted(report.get('series', {}).items()):
+				for index, value in enumerate(values):
+					writer.writerow(["series", "%s[%d]" % (name, index), value, ""])
+
+	else:
+
+		with open(path, "w") as fileHandle:
+			json.dump(report, fileHandle, indent=2, sort_keys=True)
+
+	return path
+
+
+
+
+### ONE LINE PER STAGE AND COUNTER FOR THE SCRIPT EDITOR
+def formatReport(report):
+
+	lines = ["Total %.3f s" % report['wallSeconds']]
+
+	for name, stats in sorted(report['stages'].items(), key=lambda item: -item[1]['seconds']):
+		lines.append("  %-20s %10.3f s %8d calls" % (name, stats['seconds'], stats['calls']))
+
+	for name, value in sorted(report['counters'].items()):
+		lines.append("  %-20s %14d" % (name, value))
+
+	for name, values in sorted(report.get('series', {}).items()):
+		if values:
+			lines.append("  %-20s %14.1f per frame, %d to %d over %d frames" % (name, sum(values) / float(len(values)), min(values), max(values), len(values)))
+
+	return "\n".join(lines)
@@ -0,0 +1,465 @@
+import os
+
+import numpy as np
+
+import heatmapCache
+import heatmapProfile
+import heatmapVisibility
+
+
+# triangles per leaf of the bvh
+LEAF_SIZE = 8
+
+# rays traced together, bounds the (ray, node) pairs alive during a traversal
+RAY_BATCH_SIZE = 4096
+
+# rays stop just short of the vertex so its own neighbourhood doesn't count as a hit
+RAY_EPSILON = 1e-4
+
+# barycentric slack, a ray through a shared edge or corner hits at least one of the triangles. Same as the
+# rasterizer's edge tolerance, so neither mode sees through the seams
+EDGE_EPSILON = 1e-9
+
+# vertices per culling chunk, whole chunks are skipped per frame. Smaller chunks hug the frustum
+# closer and are less often held back by one vertex that was never seen
+VERTEX_CHUNK_SIZE = 1024
+
+
+
+### SPREAD 10 BITS SO TWO ZERO BITS SIT BETWEEN EACH OF THEM
+def spreadBits(values):
+
+	values = values.astype(np.uint32) & 0x3ff
+	values = (values | (values << 16)) & 0x030000ff
+	values = (values | (values << 8)) & 0x0300f00f
+	values = (values | (values << 4)) & 0x030c30c3
+	values = (values | (values << 2)) & 0x09249249
+
+	return values
+
+
+
+
+### 30 BIT MORTON CODES OF POINTS
+def mortonCodes(pointArray):
+
+	boundsMin = pointArray.min(axis=0)
+	extent = np.maximum(pointArray.max(axis=0) - boundsMin, 1e-12)
+	cells = np.clip((pointArray - boundsMin) / extent * 1023.0, 0, 1023)
+
+	return (spreadBits(cells[:, 0]) << 2) | (spreadBits(cells[:, 1]) << 1) | spreadBits(cells[:, 2])
+
+
+
+
+### BVH OVER THE TRIANGLES OF A MESH
+def buildSpatialIndex(vertexPositionArray, triangleArray, leafSize=LEAF_SIZE):
+
+	# an implicit complete binary tree: node i has children 2i+1 and 2i+2 and the leaves are
+	# the last leafCount nodes. Triangles are sorted along a morton curve so every leaf (and
+	# every node above it) holds a spatially coherent group
+	vertexPositionArray = np.asarray(vertexPositionArray, dtype=np.float64)
+	triangleArray = np.asarray(triangleArray, dtype=np.int64)
+
+	corners = vertexPositionArray[triangleArray]
+	triangleMin = corners.min(axis=1)
+	triangleMax = corners.max(axis=1)
+
+	depth = int(np.ceil(np.log2(max(1.0, np.ceil(len(triangleArray) / float(leafSize))))))
+	leafCount = 1 << depth
+
+	# padding slots hold -1 and get an empty box
+	triangleOrder = np.full(leafCount * leafSize, -1, dtype=np.int64)
+	triangleOrder[:len(triangleArray)] = np.argsort(mortonCodes(corners.mean(axis=1)), kind='mergesort')
+
+	slotMin = np.full((len(triangleOrder), 3), np.inf)
+	slotMax = np.full((len(triangleOrder), 3), -np.inf)
+	slotMin[:len(triangleArray)] = triangleMin[triangleOrder[:len(triangleArray)]]
+	slotMax[:len(triangleArray)] = triangleMax[triangleOrder[:len(triangleArray)]]
+
+	nodeMin = np.empty((2 * leafCount - 1, 3))
+	nodeMax = np.empty((2 * leafCount - 1, 3))
+	nodeMin[leafCount - 1:] = slotMin.reshape(leafCount, leafSize, 3).min(axis=1)
+	nodeMax[leafCount - 1:] = slotMax.reshape(leafCount, leafSize, 3).max(axis=1)
+
+	# bottom up, one vectorized step per level
+	for level in range(depth - 1, -1, -1):
+		nodes = np.arange((1 << level) - 1, (1 << (level + 1)) - 1)
+		nodeMin[nodes] = np.minimum(nodeMin[2 * nodes + 1], nodeMin[2 * nodes + 2])
+		nodeMax[nodes] = np.maximum(nodeMax[2 * nodes + 1], nodeMax[2 * nodes + 2])
+
+	return {
+		'depth': depth,
+		'leafSize': leafSize,
+		'triangleOrder': triangleOrder,
+		'nodeMin': nodeMin,
+		'nodeMax': nodeMax,
+	}
+
+
+
+
+### SAVE / LOAD A BVH
+def saveSpatialIndex(path, spatialIndex):
+
+	if not os.path.isdir(os.path.dirname(path)):
+		os.makedirs(os.path.dirname(path))
+
+	temporaryPath = path + ".%d.tmp.npz" % os.getpid()
+	np.savez(temporaryPath, **spatialIndex)
+	heatmapCache.replaceFile(temporaryPath, path)
+
+
+
+
+def loadSpatialIndex(path):
+
+	archive = np.load(path)
+	spatialIndex = dict((key, archive[key]) for key in archive.files)
+	spatialIndex['depth'] = int(spatialIndex['depth'])
+	spatialIndex['leafSize'] = int(spatialIndex['leafSize'])
+
+	return spatialIndex
+
+
+
+
+### BVH OF A MESH, BUILT ONCE AND KEPT ON DISK, ONLY BUILT IN MEMORY WITHOUT cache
+def meshSpatialIndex(vertexPositionArray, triangleArray, directory=None, cache=True):
+
+	if not cache:
+		with heatmapProfile.stage('bvhBuild'):
+			return buildSpatialIndex(vertexPositionArray, triangleArray)
+
+	meshHash = heatmapCache.arrayHash(vertexPositionArray, triangleArray)
+	path = os.path.join(directory or heatmapCache.cacheDirectory(), "bvh", meshHash + ".npz")
+
+	if os.path.isfile(path):
+		heatmapProfile.count('bvhCacheHits')
+		return loadSpatialIndex(path)
+
+	with heatmapProfile.stage('bvhBuild'):
+		spatialIndex = buildSpatialIndex(vertexPositionArray, triangleArray)
+		saveSpatialIndex(path, spatialIndex)
+
+	return spatialIndex
+
+
+
+
+### FRUSTUM PLANES OF A CAMERA IN WORLD SPACE, INSIDE IS normal . p + d >= 0
+def frustumPlanes(worldMatrix, lens, resolution=heatmapVisibility.DEFAULT_RESOLUTION):
+
+	worldMatrix = np.asarray(worldMatrix, dtype=np.float64).reshape(4, 4)
+
+	# slopes of the side planes, same film fit as heatmapVisibility.projectVertices. The sides of an
+	# orthographic view are parallel, at the half extents instead
+	extentX, extentY = heatmapVisibility.viewExtents(lens, resolution)
+	slopeX, slopeY, offsetX, offsetY = (0.0, 0.0, extentX, extentY) if lens.get('orthographic') else (extentX, extentY, 0.0, 0.0)
+
+	# camera space planes (normal, d), the camera looks down -z
+	cameraPlanes = np.array([
+		[0.0, 0.0, -1.0, -lens['nearClipPlane']],
+		[0.0, 0.0, 1.0, lens['farClipPlane']],
+		[1.0, 0.0, -slopeX, offsetX],
+		[-1.0, 0.0, -slopeX, offsetX],
+		[0.0, 1.0, -slopeY, offsetY],
+		[0.0, -1.0, -slopeY, offsetY],
+	])
+
+	# planes transform with the inverse transpose, for row vectors that is viewMatrix^T
+	viewMatrix = np.linalg.inv(worldMatrix)
+	worldPlanes = np.dot(cameraPlanes, viewMatrix.T)
+
+	return worldPlanes / np.linalg.norm(worldPlanes[:, :3], axis=1)[:, np.newaxis]
+
+
+
+
+### BOXES THAT ARE AT LEAST PARTLY INSIDE ALL PLANES
+def boxesInsidePlanes(boxMin, boxMax, planes):
+
+	# padding leaves have inverted (empty) boxes
+	inside = (boxMin <= boxMax).all(axis=1)
+
+	with np.errstate(invalid='ignore'):
+		for plane in planes:
+			# the box corner furthest along the plane normal
+			corner = np.where(plane[:3] >= 0, boxMax, boxMin)
+			inside &= np.dot(corner, plane[:3]) + plane[3] >= 0
+
+	return inside
+
+
+
+
+### DISTANCE FROM A POINT TO THE NEAREST POINT OF EVERY BOX, 0 INSIDE
+def boxDistances(boxMin, boxMax, position):
+
+	position = np.asarray(position, dtype=np.float64)
+	outside = np.maximum(boxMin - position, 0.0) + np.maximum(position - boxMax, 0.0)
+
+	return np.sqrt(np.einsum('ij,ij->i', outside, outside))
+
+
+
+
+### SPATIALLY COHERENT VERTEX CHUNKS FOR CULLING WHOLE REGIONS OF A MESH PER FRAME
+def buildVertexChunks(vertexPositionArray, triangleArray, chunkSize=VERTEX_CHUNK_SIZE):
+
+	vertexPositionArray = np.asarray(vertexPositionArray, dtype=np.float64)
+	triangleArray = np.asarray(triangleArray, dtype=np.int64)
+	vertexCount = len(vertexPositionArray)
+	triangleCount = len(triangleArray)
+
+	# runs of chunkSize vertices along a morton curve, the vertex arrays themselves keep their order
+	vertexOrder = np.argsort(mortonCodes(vertexPositionArray), kind='mergesort') if vertexCount else np.zeros(0, dtype=np.int64)
+	chunkStarts = np.append(np.arange(0, vertexCount, chunkSize), vertexCount)
+	chunkCount = len(chunkStarts) - 1
+
+	vertexChunk = np.empty(vertexCount, dtype=np.int64)
+	vertexChunk[vertexOrder] = np.arange(vertexCount) // chunkSize
+
+	# boxes are padded a little, so a vertex right on a frustum plane never gets culled by rounding
+	orderedPositions = vertexPositionArray[vertexOrder]
+	padding = 1e-6 * max(1.0, float(np.abs(orderedPositions).max())) if vertexCount else 0.0
+	vertexMin = np.minimum.reduceat(orderedPositions, chunkStarts[:-1], axis=0) - padding if chunkCount else np.zeros((0, 3))
+	vertexMax = np.maximum.reduceat(orderedPositions, chunkStarts[:-1], axis=0) + padding if chunkCount else np.zeros((0, 3))
+
+	# the triangles touching every chunk, a triangle across chunks is listed in each of them
+	pairs = heatmapVisibility.sortedUnique(vertexChunk[triangleArray].ravel() * max(1, triangleCount) + np.repeat(np.arange(triangleCount), 3))
+	chunkTriangles = pairs % max(1, triangleCount)
+	triangleStarts = np.searchsorted(pairs // max(1, triangleCount), np.arange(chunkCount + 1))
+
+	# the culling box also holds those triangles, so a chunk outside the frustum has no triangle crossing it
+	boxMin = vertexMin.copy()
+	boxMax = vertexMax.copy()
+	hasTriangles = np.flatnonzero(triangleStarts[1:] > triangleStarts[:-1])
+
+	if len(hasTriangles):
+		corners = vertexPositionArray[triangleArray]
+		triangleMin = heatmapVisibility.cornerReduce(np.minimum, corners)
+		triangleMax = heatmapVisibility.cornerReduce(np.maximum, corners)
+		boxMin[hasTriangles] = np.minimum(boxMin[hasTriangles], np.minimum.reduceat(triangleMin[chunkTriangles], triangleStarts[hasTriangles], axis=0) - padding)
+		boxMax[hasTriangles] = np.maximum(boxMax[hasTriangles], np.maximum.reduceat(triangleMax[chunkTriangles], triangleStarts[hasTriangles], axis=0) + padding)
+
+	return {
+		'vertexOrder': vertexOrder,
+		'vertexChunk': vertexChunk,
+		'chunkStarts': chunkStarts,
+		'vertexMin': vertexMin,
+		'vertexMax': vertexMax,
+		'boxMin': boxMin,
+		'boxMax': boxMax,
+		'triangleStarts': triangleStarts,
+		'chunkTriangles': chunkTriangles,
+	}
+
+
+
+
+### VERTEX CHUNKS OF A MESH, BUILT ONCE AND KEPT ON DISK NEXT TO THE BVH, ONLY BUILT IN MEMORY WITHOUT cache
+def meshVertexChunks(vertexPositionArray, triangleArray, directory=None, chunkSize=VERTEX_CHUNK_SIZE, cache=True):
+
+	if not cache:
+		with heatmapProfile.stage('chunkBuild'):
+			return buildVertexChunks(vertexPositionArray, triangleArray, chunkSize)
+
+	meshHash = heatmapCache.arrayHash(vertexPositionArray, triangleArray, np.array([chunkSize]))
+	path = os.path.join(directory or heatmapCache.cacheDirectory(), "chunks", meshHash + ".npz")
+
+	if os.path.isfile(path):
+		heatmapProfile.count('chunkCacheHits')
+		archive = np.load(path)
+		return dict((key, archive[key]) for key in archive.files)
+
+	with heatmapProfile.stage('chunkBuild'):
+		vertexChunks = buildVertexChunks(vertexPositionArray, triangleArray, chunkSize)
+		saveSpatialIndex(path, vertexChunks)
+
+	return vertexChunks
+
+
+
+
+### CHUNKS WHOSE BOX REACHES INTO THE FRUSTUM OF A CAMERA FRAME
+def frustumChunks(vertexChunks, worldMatrix, lens, resolution=heatmapVisibility.DEFAULT_RESOLUTION):
+
+	planes = frustumPlanes(worldMatrix, lens, resolution)
+
+	return np.flatnonzero(boxesInsidePlanes(vertexChunks['boxMin'], vertexChunks['boxMax'], planes))
+
+
+
+
+### CONCATENATED ROWS [starts[i], ends[i]) OF values FOR A SET OF RANGES
+def gatherRanges(values, starts, ends):
+
+	owner, local = heatmapVisibility.repeatRanges(ends - starts)
+
+	return values[starts[owner] + local]
+
+
+
+
+### SORTED VERTICES OF A SET OF CHUNKS
+def chunkVertices(vertexChunks, chunks):
+
+	chunkStarts = vertexChunks['chunkStarts']
+
+	return np.sort(gatherRanges(vertexChunks['vertexOrder'], chunkStarts[chunks], chunkStarts[chunks + 1]))
+
+
+
+
+### LARGEST STORED DISTANCE OF EVERY CHUNK IN A SET, A FRAME CAN ONLY LOWER A CHUNK WHOSE BOX IS NEARER
+def chunkFarthestDistances(vertexChunks, chunks, distanceArray):
+
+	chunkStarts = vertexChunks['chunkStarts']
+	starts = chunkStarts[chunks]
+	ends = chunkStarts[chunks + 1]
+
+	distances = np.asarray(distanceArray)[gatherRanges(vertexChunks['vertexOrder'], starts, ends)]
+
+	return np.maximum.reduceat(distances, np.cumsum(ends - starts) - (ends - starts)) if len(chunks) else distances
+
+
+
+
+### SORTED TRIANGLES TOUCHING A SET OF CHUNKS
+def chunkTriangleIds(vertexChunks, chunks):
+
+	triangleStarts = vertexChunks['triangleStarts']
+
+	return heatmapVisibility.sortedUnique(gatherRanges(vertexChunks['chunkTriangles'], triangleStarts[chunks], triangleStarts[chunks + 1]))
+
+
+
+
+### SEGMENT / BOX OVERLAP FOR MANY PAIRS, SEGMENTS RUN FROM t=0 TO t=1
+def segmentsHitBoxes(origins, inverseDirections, boxMin, boxMax):
+
+	with np.errstate(invalid='ignore'):
+		lowerT = (boxMin - origins) * inverseDirections
+		upperT = (boxMax - origins) * inverseDirections
+
+		nearT = np.minimum(lowerT, upperT).max(axis=1)
+		farT = np.maximum(lowerT, upperT).min(axis=1)
+
+	# padding leaves have inverted (empty) boxes
+	return (boxMin <= boxMax).all(axis=1) & (nearT <= farT) & (farT >= 0.0) & (nearT <= 1.0)
+
+
+
+
+### SEGMENT / TRIANGLE INTERSECTION FOR MANY PAIRS (MOLLER-TRUMBORE), WATERTIGHT ACROSS SHARED EDGES
+def segmentsHitTriangles(origins, directions, corner0, corner1, corner2):
+
+	edge1 = corner1 - corner0
+	edge2 = corner2 - corner0
+	pVector = np.cross(directions, edge2)
+	determinant = np.einsum('ij,ij->i', edge1, pVector)
+
+	valid = np.abs(determinant) > 1e-12
+	inverseDeterminant = 1.0 / np.where(valid, determinant, 1.0)
+
+	tVector = origins - corner0
+	u = np.einsum('ij,ij->i', tVector, pVector) * inverseDeterminant
+
+	qVector = np.cross(tVector, edge1)
+	v = np.einsum('ij,ij->i', directions, qVector) * inverseDeterminant
+	t = np.einsum('ij,ij->i', edge2, qVector) * inverseDeterminant
+
+	return valid & (u >= -EDGE_EPSILON) & (v >= -EDGE_EPSILON) & (u + v <= 1.0 + EDGE_EPSILON) & (t > RAY_EPSILON) & (t < 1.0 - RAY_EPSILON)
+
+
+
+
+### IS ANYTHING BETWEEN THE CAMERA AND EACH VERTEX, cameraPosition IS ONE POINT OR ONE RAY ORIGIN PER VERTEX
+def occludedVertices(spatialIndex, vertexPositionArray, triangleArray, cameraPosition, vertexIndices):
+
+	vertexPositionArray = np.asarray(vertexPositionArray, dtype=np.float64)
+	triangleArray = np.asarray(triangleArray, dtype=np.int64)
+	vertexIndices = np.asarray(vertexIndices, dtype=np.int64)
+
+	nodeMin = spatialIndex['nodeMin']
+	nodeMax = spatialIndex['nodeMax']
+	depth = spatialIndex['depth']
+	leafCount = 1 << depth
+	leafSize = spatialIndex['leafSize']
+	leafTriangles = spatialIndex['triangleOrder'].reshape(leafCount, leafSize)
+
+	occluded = np.zeros(len(vertexIndices), dtype=bool)
+	origins = np.asarray(cameraPosition, dtype=np.float64).reshape(-1, 3)
+
+	for batchStart in range(0, len(vertexIndices), RAY_BATCH_SIZE):
+
+		batchVertices = vertexIndices[batchStart:batchStart + RAY_BATCH_SIZE]
+		# a shared origin broadcasts, per vertex origins follow their rays
+		sharedOrigin = len(origins) == 1
+		origin = origins if sharedOrigin else origins[batchStart:batchStart + RAY_BATCH_SIZE]
+		directions = vertexPositionArray[batchVertices] - origin
+
+		# zero components would give 0 * inf, a tiny direction keeps the slab test finite
+		safeDirections = np.where(np.abs(directions) > 1e-30, directions, 1e-30)
+		inverseDirections = 1.0 / safeDirections
+
+		# walk all (ray, node) pairs down one level at a time
+		rays = np.arange(len(batchVertices))
+		nodes = np.zeros(len(batchVertices), dtype=np.int64)
+
+		for level in range(depth + 1):
+			hit = segmentsHitBoxes(origin if sharedOrigin else origin[rays], inverseDirections[rays], nodeMin[nodes], nodeMax[nodes])
+			rays = rays[hit]
+			nodes = nodes[hit]
+
+			if level < depth:
+				rays = np.repeat(rays, 2)
+				nodes = np.column_stack([2 * nodes + 1, 2 * nodes + 2]).ravel()
+
+		# every triangle of every leaf that was reached
+		rays = np.repeat(rays, leafSize)
+		triangles = leafTriangles[nodes - (leafCount - 1)].ravel()
+
+		keep = triangles >= 0
+		rays = rays[keep]
+		triangles = triangles[keep]
+
+		# triangles using the vertex itself can't hide it
+		keep = ~(triangleArray[triangles] == batchVertices[rays][:, np.newaxis]).any(axis=1)
+		rays = rays[keep]
+		triangles = triangles[keep]
+
+		corners = vertexPositionArray[triangleArray[triangles]]
+		hit = segmentsHitTriangles(np.broadcast_to(origin, (len(rays), 3)) if sharedOrigin else origin[rays], directions[rays], corners[:, 0], corners[:, 1], corners[:, 2])
+
+		occluded[batchStart + np.unique(rays[hit])] = True
+
+	return occluded
+
+
+
+
+### VISIBLE VERTICES FOR ONE CAMERA FRAME, OCCLUSION BY TRACING THROUGH THE BVH
+def visibleVertexMask(vertexPositionArray, triangleArray, spatialIndex, worldMatrix, lens, resolution=heatmapVisibility.DEFAULT_RESOLUTION, vertexIndices=None):
+
+	# only the vertices at vertexIndices are tested when given, the mask then has one entry per index
+	testedPositions = vertexPositionArray if vertexIndices is None else np.asarray(vertexPositionArray)[vertexIndices]
+
+	screenX, screenY, depth = heatmapVisibility.projectVertices(testedPositions, worldMatrix, lens, resolution)
+	visibleMask = heatmapVisibility.frustumMask(screenX, screenY, depth, lens, resolution)
+
+	candidates = np.flatnonzero(visibleMask)
+	worldMatrix = np.asarray(worldMatrix, dtype=np.float64).reshape(4, 4)
+	rayOrigins = worldMatrix[3, :3]
+	rayVertices = candidates if vertexIndices is None else np.asarray(vertexIndices)[candidates]
+
+	# an orthographic camera looks along parallel rays, each starts where its vertex meets the camera plane
+	if lens.get('orthographic'):
+		viewAxis = -worldMatrix[2, :3] / np.linalg.norm(worldMatrix[2, :3])
+		candidatePositions = np.asarray(testedPositions, dtype=np.float64)[candidates]
+		rayOrigins = candidatePositions - np.outer(np.dot(candidatePositions - worldMatrix[3, :3], viewAxis), viewAxis)
+
+	visibleMask[candidates[occludedVertices(spatialIndex, vertexPositionArray, triangleArray, rayOrigins, rayVertices)]] = False
+
+	return visibleMask
@@ -0,0 +1,622 @@
+import numpy as np
+
+import heatmapEngine
+import heatmapPipeline
+
+
+# maya film apertures are in inches, focal length in millimeters
+INCH_TO_MM = 25.4
+
+# values of the filmFit attribute of a maya camera
+FILM_FIT_FILL = 0
+FILM_FIT_HORIZONTAL = 1
+FILM_FIT_VERTICAL = 2
+FILM_FIT_OVERSCAN = 3
+
+# upper bound of pixel fragments handled by one rasterizer batch
+MAX_FRAGMENTS = 1 << 22
+
+DEFAULT_RESOLUTION = (960, 540)
+
+# pixels per side of a screen tile of the tiled rasterizer, tiles are the unit of work of its threads
+TILE_SIZE = 128
+
+# triangles per run when the triangle setup is split over threads
+TRIANGLE_CHUNK_SIZE = 1 << 16
+
+
+
+### DEFAULT LENS VALUES OF A NEW MAYA CAMERA
+def defaultLens():
+
+	return {
+		'focalLength': 35.0,
+		'horizontalFilmAperture': 1.417,
+		'verticalFilmAperture': 0.945,
+		'nearClipPlane': 0.1,
+		'farClipPlane': 10000.0,
+		'filmFit': FILM_FIT_FILL,
+		'orthographic': 0,
+		'orthographicWidth': 30.0,
+	}
+
+
+
+
+### HALF WIDTH AND HEIGHT OF THE VIEW AFTER THE FILM FIT: AT DEPTH 1 FOR A PERSPECTIVE CAMERA, IN WORLD UNITS FOR AN ORTHOGRAPHIC ONE
+def viewExtents(lens, resolution=DEFAULT_RESOLUTION):
+
+	width, height = resolution
+	horizontalAperture = lens['horizontalFilmAperture']
+	verticalAperture = lens.get('verticalFilmAperture', horizontalAperture)
+	filmFit = int(lens.get('filmFit', FILM_FIT_HORIZONTAL))
+
+	# fill keeps the whole image inside the film gate, overscan the whole film gate inside the image. Lens
+	# dicts without a film fit fit horizontally
+	wider = width * verticalAperture >= height * horizontalAperture
+	if filmFit == FILM_FIT_FILL:
+		filmFit = FILM_FIT_HORIZONTAL if wider else FILM_FIT_VERTICAL
+	elif filmFit == FILM_FIT_OVERSCAN:
+		filmFit = FILM_FIT_VERTICAL if wider else FILM_FIT_HORIZONTAL
+
+	# film back extents in inches, the other axis follows the resolution aspect
+	if filmFit == FILM_FIT_VERTICAL:
+		halfHeight = verticalAperture * 0.5
+		halfWidth = halfHeight * width / float(height)
+	else:
+		halfWidth = horizontalAperture * 0.5
+		halfHeight = halfWidth * height / float(width)
+
+	# an orthographic view is orthographicWidth across the horizontal film aperture
+	if lens.get('orthographic'):
+		scale = lens['orthographicWidth'] / horizontalAperture
+	else:
+		scale = INCH_TO_MM / lens['focalLength']
+
+	return halfWidth * scale, halfHeight * scale
+
+
+
+
+### WORLD SPACE VERTICES TO PIXEL COORDINATES AND DEPTH
+def projectVertices(vertexPositionArray, worldMatrix, lens, resolution=DEFAULT_RESOLUTION):
+
+	width, height = resolution
+
+	# into camera space, the camera looks down -z
+	viewMatrix = np.linalg.inv(np.asarray(worldMatrix, dtype=np.float64).reshape(4, 4))
+	cameraPoints = heatmapEngine.transformPoints(vertexPositionArray, viewMatrix)
+	depth = -cameraPoints[:, 2]
+
+	halfWidth, halfHeight = viewExtents(lens, resolution)
+
+	# no perspective divide for an orthographic camera. Points on the camera plane would divide by zero,
+	# they get culled by the near clip anyway
+	if lens.get('orthographic'):
+		safeDepth = 1.0
+	else:
+		safeDepth = np.where(np.abs(depth) > 1e-12, depth, 1e-12)
+
+	ndcX = cameraPoints[:, 0] / safeDepth / halfWidth
+	ndcY = cameraPoints[:, 1] / safeDepth / halfHeight
+
+	screenX = (ndcX + 1.0) * 0.5 * width
+	screenY = (1.0 - ndcY) * 0.5 * height
+
+	return screenX, screenY, depth
+
+
+
+
+### FOCAL LENGTH IN PIXELS, FILM FIT LIKE projectVertices. PIXELS PER WORLD UNIT FOR AN ORTHOGRAPHIC CAMERA
+def pixelFocalLength(lens, resolution=DEFAULT_RESOLUTION):
+
+	return resolution[0] * 0.5 / viewExtents(lens, resolution)[0]
+
+
+
+
+### PIXELS ONE WORLD UNIT AT EVERY VERTEX COVERS ON SCREEN, 0 BEHIND THE CAMERA
+def screenDensity(vertexPositionArray, worldMatrix, lens, resolution=DEFAULT_RESOLUTION):
+
+	# depth along the view axis, the camera looks down its -z row
+	worldMatrix = np.asarray(worldMatrix, dtype=np.float64).reshape(4, 4)
+	viewAxis = -worldMatrix[2, :3] / np.linalg.norm(worldMatrix[2, :3])
+	depth = np.dot(np.asarray(vertexPositionArray, dtype=np.float64), viewAxis) - np.dot(worldMatrix[3, :3], viewAxis)
+
+	# an orthographic camera shows every depth at the same scale
+	density = np.zeros(len(depth), dtype=heatmapEngine.DENSITY_DTYPE)
+	inFront = depth > 0
+	density[inFront] = pixelFocalLength(lens, resolution) / (1.0 if lens.get('orthographic') else depth[inFront])
+
+	return density
+
+
+
+
+### VERTICES INSIDE THE VIEW FRUSTUM
+def frustumMask(screenX, screenY, depth, lens, resolution=DEFAULT_RESOLUTION):
+
+	width, height = resolution
+
+	return (
+		(depth >= lens['nearClipPlane']) & (depth <= lens['farClipPlane'])
+		& (screenX >= 0.0) & (screenX < width)
+		& (screenY >= 0.0) & (screenY < height)
+	)
+
+
+
+
+### ROW OWNER AND POSITION INSIDE IT WHEN EVERY ROW i EXPANDS TO counts[i] ITEMS
+def repeatRanges(counts):
+
+	owner = np.repeat(np.arange(len(counts)), counts)
+	local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+	return owner, local
+
+
+
+
+### MIN OR MAX OVER THE 3 COLUMNS OF AN (N, 3) ARRAY, TWO ELEMENTWISE CALLS ARE FASTER THAN A REDUCE OVER axis=1
+def cornerReduce(function, values):
+
+	return function(function(values[:, 0], values[:, 1]), values[:, 2])
+
+
+
+
+### SCREEN TRIANGLES, THEIR PIXEL BOUNDS AND SIGNED AREAS, AND THE ONES THAT CAN COVER A PIXEL
+def screenTriangles(screenX, screenY, depth, triangleArray, lens, resolution=DEFAULT_RESOLUTION, threads=1):
+
+	width, height = resolution
+
+	# large meshes are set up in runs of triangles on the threads, the setup would otherwise be the serial part of a frame
+	if threads > 1 and len(triangleArray) > TRIANGLE_CHUNK_SIZE:
+		starts = range(0, len(triangleArray), TRIANGLE_CHUNK_SIZE)
+		parts = list(heatmapPipeline.boundedMap(lambda start: screenTriangles(screenX, screenY, depth, triangleArray[start:start + TRIANGLE_CHUNK_SIZE], lens, resolution), starts, threads))
+		triangles = dict((key, np.concatenate([part[key] for part in parts])) for key in parts[0])
+		triangles['candidates'] = np.concatenate([part['candidates'] + start for part, start in zip(parts, starts)])
+		return triangles
+
+	triangleArray = np.asarray(triangleArray, dtype=np.int64)
+	triX = screenX[triangleArray]
+	triY = screenY[triangleArray]
+	triDepth = depth[triangleArray]
+
+	# triangles crossing the near plane are not clipped, they are left out as occluders
+	nearestDepth = cornerReduce(np.minimum, triDepth)
+	inFront = (nearestDepth > lens['nearClipPlane']) & (nearestDepth < lens['farClipPlane'])
+
+	# pixel centers sit at i + 0.5, a pixel is covered when its center is inside the triangle
+	minX = np.maximum(np.ceil(cornerReduce(np.minimum, triX) - 0.5), 0).astype(np.int64)
+	maxX = np.minimum(np.floor(cornerReduce(np.maximum, triX) - 0.5), width - 1).astype(np.int64)
+	minY = np.maximum(np.ceil(cornerReduce(np.minimum, triY) - 0.5), 0).astype(np.int64)
+	maxY = np.minimum(np.floor(cornerReduce(np.maximum, triY) - 0.5), height - 1).astype(np.int64)
+
+	# signed area, degenerate triangles can't occlude anything
+	area = (triX[:, 1] - triX[:, 0]) * (triY[:, 2] - triY[:, 0]) - (triX[:, 2] - triX[:, 0]) * (triY[:, 1] - triY[:, 0])
+
+	candidates = np.flatnonzero(inFront & (maxX >= minX) & (maxY >= minY) & (np.abs(area) > 1e-12))
+
+	return {
+		'x': triX, 'y': triY, 'depth': triDepth, 'area': area,
+		'minX': minX, 'maxX': maxX, 'minY': minY, 'maxY': maxY,
+		'candidates': candidates,
+	}
+
+
+
+
+### PIXELS COVERED BY A BATCH OF TRIANGLES INSIDE PIXEL BOUNDS: (TRIANGLE IN BATCH, X, Y, DEPTH) PER FRAGMENT
+def triangleFragments(triangles, batch, minX, maxX, minY, maxY):
+
+	boxWidth = maxX - minX + 1
+	counts = boxWidth * (maxY - minY + 1)
+
+	# one row per covered pixel candidate
+	fragmentTriangle, local = repeatRanges(counts)
+	pixelX = minX[fragmentTriangle] + local % boxWidth[fragmentTriangle]
+	pixelY = minY[fragmentTriangle] + local // boxWidth[fragmentTriangle]
+
+	# barycentric weights of the pixel center
+	x = pixelX + 0.5
+	y = pixelY + 0.5
+	fragmentX = triangles['x'][batch][fragmentTriangle]
+	fragmentY = triangles['y'][batch][fragmentTriangle]
+	x0, x1, x2 = fragmentX[:, 0], fragmentX[:, 1], fragmentX[:, 2]
+	y0, y1, y2 = fragmentY[:, 0], fragmentY[:, 1], fragmentY[:, 2]
+	fragmentArea = triangles['area'][batch][fragmentTriangle]
+
+	weight0 = ((x1 - x) * (y2 - y) - (x2 - x) * (y1 - y)) / fragmentArea
+	weight1 = ((x2 - x) * (y0 - y) - (x0 - x) * (y2 - y)) / fragmentArea
+	weight2 = 1.0 - weight0 - weight1
+
+	inside = (weight0 >= -1e-9) & (weight1 >= -1e-9) & (weight2 >= -1e-9)
+
+	# 1/z is linear in screen space
+	inverseDepth = 1.0 / triangles['depth'][batch][fragmentTriangle]
+	fragmentInverseDepth = weight0 * inverseDepth[:, 0] + weight1 * inverseDepth[:, 1] + weight2 * inverseDepth[:, 2]
+
+	return fragmentTriangle[inside], pixelX[inside], pixelY[inside], (1.0 / fragmentInverseDepth[inside]).astype(np.float32)
+
+
+
+
+### EDGE AND DEPTH PLANES OF TRIANGLES: weight0, weight1 AND 1/z AS a * x + b * y + c, ONE ROW OF 9 PER TRIANGLE
+def trianglePlanes(triangles, batch):
+
+	triX = triangles['x'][batch]
+	triY = triangles['y'][batch]
+	area = triangles['area'][batch]
+	x0, x1, x2 = triX[:, 0], triX[:, 1], triX[:, 2]
+	y0, y1, y2 = triY[:, 0], triY[:, 1], triY[:, 2]
+
+	# the barycentric weights of triangleFragments expanded, the third one is 1 - weight0 - weight1
+	planes = np.empty((len(batch), 9))
+	planes[:, 0] = (y1 - y2) / area
+	planes[:, 1] = (x2 - x1) / area
+	planes[:, 2] = (x1 * y2 - x2 * y1) / area
+	planes[:, 3] = (y2 - y0) / area
+	planes[:, 4] = (x0 - x2) / area
+	planes[:, 5] = (x2 * y0 - x0 * y2) / area
+
+	# 1/z is linear in screen space, so it is a plane of its own
+	inverseDepth = 1.0 / triangles['depth'][batch]
+	delta0 = inverseDepth[:, 0] - inverseDepth[:, 2]
+	delta1 = inverseDepth[:, 1] - inverseDepth[:, 2]
+	planes[:, 6] = planes[:, 0] * delta0 + planes[:, 3] * delta1
+	planes[:, 7] = planes[:, 1] * delta0 + planes[:, 4] * delta1
+	planes[:, 8] = planes[:, 2] * delta0 + planes[:, 5] * delta1 + inverseDepth[:, 2]
+
+	return planes
+
+
+
+
+### PIXELS COVERED BY A BATCH OF TRIANGLES, ONE SPAN PER TRIANGLE ROW SO ONLY COVERED PIXELS ARE VISITED
+def spanFragments(planes, minX, maxX, minY, maxY):
+
+	rowTriangle, rowOffset = repeatRanges(maxY - minY + 1)
+	rowY = minY[rowTriangle] + rowOffset
+	y = rowY + 0.5
+	rowPlanes = planes[rowTriangle]
+
+	# every edge weight is slope * x + offset along the row, the same -1e-9 tolerance as triangleFragments
+	slopes = np.empty((len(rowTriangle), 3))
+	offsets = np.empty((len(rowTriangle), 3))
+	slopes[:, 0] = rowPlanes[:, 0]
+	slopes[:, 1] = rowPlanes[:, 3]
+	slopes[:, 2] = -slopes[:, 0] - slopes[:, 1]
+	offsets[:, 0] = rowPlanes[:, 1] * y + rowPlanes[:, 2]
+	offsets[:, 1] = rowPlanes[:, 4] * y + rowPlanes[:, 5]
+	offsets[:, 2] = 1.0 - offsets[:, 0] - offsets[:, 1]
+
+	with np.errstate(divide='ignore', invalid='ignore'):
+		bounds = (-1e-9 - offsets) / slopes
+
+	left = cornerReduce(np.maximum, np.where(slopes > 0, bounds, -np.inf))
+	right = cornerReduce(np.minimum, np.where(slopes < 0, bounds, np.inf))
+	right[cornerReduce(np.logical_or, (slopes == 0) & (offsets < -1e-9))] = -np.inf
+
+	# pixel centers between the edges, inside the clipped bounds
+	startX = np.maximum(np.ceil(left - 0.5), minX[rowTriangle])
+	endX = np.minimum(np.floor(right - 0.5), maxX[rowTriangle])
+	spanLengths = np.maximum(endX - startX + 1, 0).astype(np.int64)
+	startX = np.where(spanLengths > 0, startX, 0).astype(np.int64)
+
+	depthSlopes = rowPlanes[:, 6]
+	depthOffsets = rowPlanes[:, 7] * y + rowPlanes[:, 8]
+
+	span, local = repeatRanges(spanLengths)
+	pixelX = startX[span] + local
+	fragmentInverseDepth = depthSlopes[span] * (pixelX + 0.5) + depthOffsets[span]
+
+	return rowTriangle[span], pixelX, rowY[span], (1.0 / fragmentInverseDepth).astype(np.float32)
+
+
+
+
+### SPLIT ROWS INTO RUNS WHOSE counts STAY UNDER MAX_FRAGMENTS, (START, END) PER RUN
+def fragmentBatches(counts):
+
+	batchIds = np.cumsum(counts) // MAX_FRAGMENTS
+	batchStarts = np.flatnonzero(np.r_[True, batchIds[1:] != batchIds[:-1]]) if len(counts) else np.zeros(0, dtype=np.int64)
+	batchEnds = np.r_[batchStarts[1:], len(counts)]
+
+	return zip(batchStarts, batchEnds)
+
+
+
+
+### RASTERIZE TRIANGLES INTO A DEPTH BUFFER
+def rasterizeDepth(screenX, screenY, depth, triangleArray, lens, resolution=DEFAULT_RESOLUTION):
+
+	width, height = resolution
+	depthBuffer = np.full(width * height, np.inf, dtype=np.float32)
+
+	triangles = screenTriangles(screenX, screenY, depth, triangleArray, lens, resolution)
+	candidates = triangles['candidates']
+
+	if len(candidates) == 0:
+		return depthBuffer.reshape(height, width)
+
+	minX, maxX, minY, maxY = [triangles[key][candidates] for key in ('minX', 'maxX', 'minY', 'maxY')]
+	fragmentCounts = (maxX - minX + 1) * (maxY - minY + 1)
+
+	for start, end in fragmentBatches(fragmentCounts):
+
+		fragmentTriangle, pixelX, pixelY, fragmentDepth = triangleFragments(triangles, candidates[start:end], minX[start:end], maxX[start:end], minY[start:end], maxY[start:end])
+		np.minimum.at(depthBuffer, pixelY * width + pixelX, fragmentDepth)
+
+	return depthBuffer.reshape(height, width)
+
+
+
+
+### SCREEN TILES EVERY CANDIDATE TRIANGLE OVERLAPS: TRIANGLES SORTED BY TILE AND THE FIRST ROW OF EACH TILE
+def binTriangles(triangles, tileSize, tileCountX, tileCount):
+
+	candidates = triangles['candidates']
+
+	tileX0 = triangles['minX'][candidates] // tileSize
+	tileY0 = triangles['minY'][candidates] // tileSize
+	spanX = triangles['maxX'][candidates] // tileSize - tileX0 + 1
+	spanY = triangles['maxY'][candidates] // tileSize - tileY0 + 1
+
+	# one (triangle, tile) pair per tile of the bounding box
+	owner, local = repeatRanges(spanX * spanY)
+	tileIndex = (tileY0[owner] + local // spanX[owner]) * tileCountX + tileX0[owner] + local % spanX[owner]
+
+	# stable, so every tile lists its triangles in mesh order and depth ties resolve the same way on any thread count
+	order = np.argsort(tileIndex, kind='stable')
+	tileStarts = np.searchsorted(tileIndex[order], np.arange(tileCount + 1))
+
+	return candidates[owner[order]], tileStarts
+
+
+
+
+### RASTERIZE TRIANGLE IDS AND DEPTH IN SCREEN TILES ON threads THREADS, -1 WHERE NO TRIANGLE COVERS A PIXEL
+def rasterizeTriangleIds(screenX, screenY, depth, triangleArray, lens, resolution=DEFAULT_RESOLUTION, tileSize=TILE_SIZE, threads=1):
+
+	width, height = resolution
+	depthBuffer = np.full((height, width), np.inf, dtype=np.float32)
+	idBuffer = np.full((height, width), -1, dtype=np.int32 if len(triangleArray) < 2 ** 31 else np.int64)
+
+	triangles = screenTriangles(screenX, screenY, depth, triangleArray, lens, resolution, threads)
+
+	if len(triangles['candidates']) == 0:
+		return idBuffer, depthBuffer
+
+	tileCountX = (width + tileSize - 1) // tileSize
+	tileCountY = (height + tileSize - 1) // tileSize
+	tileTriangles, tileStarts = binTriangles(triangles, tileSize, tileCountX, tileCountX * tileCountY)
+
+	# every tile owns its block of both buffers, so the threads never write the same pixel
+	def renderTile(tileIndex):
+
+		tris = tileTriangles[tileStarts[tileIndex]:tileStarts[tileIndex + 1]]
+
+		if len(tris) == 0:
+			return 0
+
+		left = (tileIndex % tileCountX) * tileSize
+		top = (tileIndex // tileCountX) * tileSize
+		tileWidth = min(tileSize, width - left)
+		tileHeight = min(tileSize, height - top)
+		tileDepth = depthBuffer[top:top + tileHeight, left:left + tileWidth]
+		tileIds = idBuffer[top:top + tileHeight, left:left + tileWidth]
+
+		# triangle bounds clipped to the tile
+		minX = np.maximum(triangles['minX'][tris], left)
+		maxX = np.minimum(triangles['maxX'][tris], left + tileWidth - 1)
+		minY = np.maximum(triangles['minY'][tris], top)
+		maxY = np.minimum(triangles['maxY'][tris], top + tileHeight - 1)
+		fragmentCounts = (maxX - minX + 1) * (maxY - minY + 1)
+		planes = trianglePlanes(triangles, tris)
+
+		for start, end in fragmentBatches(fragmentCounts):
+
+			fragmentTriangle, pixelX, pixelY, fragmentDepth = spanFragments(planes[start:end], minX[start:end], maxX[start:end], minY[start:end], maxY[start:end])
+			pixelIndex = (pixelY - top) * tileWidth + (pixelX - left)
+
+			# nearest fragment per pixel in one sort: pixel in the high bits, the bits of the positive
+			# float depth (which order like the floats) in the low ones
+			keys = (pixelIndex.astype(np.uint64) << np.uint64(32)) | fragmentDepth.view(np.uint32).astype(np.uint64)
+			order = np.argsort(keys, kind='stable')
+			sortedPixels = pixelIndex[order]
+			nearest = order[np.r_[True, sortedPixels[1:] != sortedPixels[:-1]]] if len(order) else order
+
+			# earlier batches of the same tile can still be closer
+			rows = pixelY[nearest] - top
+			columns = pixelX[nearest] - left
+			closer = fragmentDepth[nearest] < tileDepth[rows, columns]
+			tileDepth[rows[closer], columns[closer]] = fragmentDepth[nearest][closer]
+			tileIds[rows[closer], columns[closer]] = tris[start:end][fragmentTriangle[nearest][closer]]
+
+		return len(tris)
+
+	for trianglesDrawn in heatmapPipeline.boundedMap(renderTile, range(tileCountX * tileCountY), threads):
+		pass
+
+	return idBuffer, depthBuffer
+
+
+
+
+### TRIANGLES THAT OWN AT LEAST ONE PIXEL OF THE ID BUFFER, A FLAG PER TRIANGLE
+def triangleIdMask(idBuffer, triangleCount):
+
+	# a flag per triangle instead of a unique over the pixels, one pass over the buffer
+	triangleMask = np.zeros(triangleCount, dtype=bool)
+	triangleMask[idBuffer[idBuffer >= 0]] = True
+
+	return triangleMask
+
+
+
+
+### TRIANGLES OF EVERY POLYGON (CSR) FROM THE POLYGON EACH TRIANGLE WAS SPLIT FROM
+def faceTriangles(triangleFaces):
+
+	triangleFaces = np.asarray(triangleFaces, dtype=np.int64)
+	order = np.argsort(triangleFaces, kind='stable')
+	indptr = np.searchsorted(triangleFaces[order], np.arange(triangleFaces.max() + 2 if len(triangleFaces) else 1))
+
+	return indptr, order
+
+
+
+
+### SORTED VERTICES OF THE WHOLE POLYGONS SOME TRIANGLES BELONG TO
+def polygonVertices(triangleIds, triangleArray, triangleFaces, faceTriangleLists):
+
+	# a quad seen through one of its triangles comes with all four corners, like a face selected on screen
+	indptr, indices = faceTriangleLists
+	faces = sortedUnique(np.asarray(triangleFaces)[triangleIds])
+	owner, local = repeatRanges(indptr[faces + 1] - indptr[faces])
+
+	return sortedUnique(np.asarray(triangleArray)[indices[indptr[faces][owner] + local]].ravel())
+
+
+
+
+### DEPTH TEST OF THE VERTICES AGAINST THE DEPTH BUFFER
+def occlusionMask(screenX, screenY, depth, inFrustum, depthBuffer, depthBias=1e-3):
+
+	height, width = depthBuffer.shape
+
+	# a vertex shares its pixel with its own triangles, take the farthest surface in a 3x3 footprint
+	# so sloped neighbours don't hide it
+	padded = np.pad(depthBuffer, 1, mode='edge')
+	footprint = depthBuffer.copy()
+
+	for offsetY in range(3):
+		for offsetX in range(3):
+			np.maximum(footprint, padded[offsetY:offsetY + height, offsetX:offsetX + width], out=footprint)
+
+	visibleMask = np.zeros(len(depth), dtype=bool)
+	candidates = np.flatnonzero(inFrustum)
+
+	pixelX = np.minimum(screenX[candidates].astype(np.int64), width - 1)
+	pixelY = np.minimum(screenY[candidates].astype(np.int64), height - 1)
+
+	visibleMask[candidates] = depth[candidates] <= footprint[pixelY, pixelX] * (1.0 + depthBias)
+
+	return visibleMask
+
+
+
+
+### VISIBLE VERTICES FOR ONE CAMERA FRAME, NO VIEWPORT NEEDED
+def visibleVertexMask(vertexPositionArray, triangleArray, worldMatrix, lens, resolution=DEFAULT_RESOLUTION, depthBias=1e-3):
+
+	screenX, screenY, depth = projectVertices(vertexPositionArray, worldMatrix, lens, resolution)
+	inFrustum = frustumMask(screenX, screenY, depth, lens, resolution)
+
+	depthBuffer = rasterizeDepth(screenX, screenY, depth, triangleArray, lens, resolution)
+
+	return occlusionMask(screenX, screenY, depth, inFrustum, depthBuffer, depthBias)
+
+
+
+
+### VISIBLE TRIANGLES FOR ONE CAMERA FRAME FROM A TILED TRIANGLE ID BUFFER
+def tiledVisibleTriangleMask(vertexPositionArray, triangleArray, worldMatrix, lens, resolution=DEFAULT_RESOLUTION, threads=1, tileSize=TILE_SIZE):
+
+	screenX, screenY, depth = projectVertices(vertexPositionArray, worldMatrix, lens, resolution)
+	idBuffer, depthBuffer = rasterizeTriangleIds(screenX, screenY, depth, triangleArray, lens, resolution, tileSize, threads)
+
+	return triangleIdMask(idBuffer, len(triangleArray))
+
+
+
+
+### VISIBLE VERTICES FOR ONE CAMERA FRAME FROM A TILED TRIANGLE ID BUFFER, THE CORNERS OF EVERY VISIBLE TRIANGLE
+def tiledVisibleVertexMask(vertexPositionArray, triangleArray, worldMatrix, lens, resolution=DEFAULT_RESOLUTION, threads=1, tileSize=TILE_SIZE):
+
+	triangleMask = tiledVisibleTriangleMask(vertexPositionArray, triangleArray, worldMatrix, lens, resolution, threads, tileSize)
+
+	visibleMask = np.zeros(len(vertexPositionArray), dtype=bool)
+	visibleMask[np.asarray(triangleArray)[triangleMask].ravel()] = True
+
+	return visibleMask
+
+
+
+
+### SORTED UNIQUE VALUES OF AN INT ARRAY (PLAIN SORT, np.unique CAN BE MUCH SLOWER ON LARGE ARRAYS)
+def sortedUnique(values):
+
+	values = np.sort(values)
+
+	return values[np.r_[True, values[1:] != values[:-1]]] if len(values) else values
+
+
+
+
+### VERTEX ADJACENCY (VERTICES SHARING A FACE) AS A CSR MATRIX
+def vertexAdjacency(vertexCount, faceVertexCounts, faceVertexIndices):
+
+	# polygons as maya stores them: vertex count per face and the flat vertex list
+	faceVertexCounts = np.asarray(faceVertexCounts, dtype=np.int64)
+	faceVertexIndices = np.asarray(faceVertexIndices, dtype=np.int64)
+
+	faceStarts = np.cumsum(faceVertexCounts) - faceVertexCounts
+	cornerFace = np.repeat(np.arange(len(faceVertexCounts)), faceVertexCounts)
+
+	# pair every face corner with every corner of the same face
+	cornerDegree = faceVertexCounts[cornerFace]
+	source = np.repeat(faceVertexIndices, cornerDegree)
+	pairFace = np.repeat(cornerFace, cornerDegree)
+	local = np.arange(len(source)) - np.repeat(np.cumsum(cornerDegree) - cornerDegree, cornerDegree)
+	target = faceVertexIndices[faceStarts[pairFace] + local]
+
+	keep = source != target
+	pairs = sortedUnique(source[keep] * vertexCount + target[keep])
+
+	indices = pairs % vertexCount
+	indptr = np.zeros(vertexCount + 1, dtype=np.int64)
+	np.cumsum(np.bincount(pairs // vertexCount, minlength=vertexCount), out=indptr[1:])
+
+	return indptr, indices
+
+
+
+
+### ADJACENCY OF A TRIANGLE-ONLY MESH
+def triangleAdjacency(vertexCount, triangleArray):
+
+	triangleArray = np.asarray(triangleArray, dtype=np.int64)
+
+	return vertexAdjacency(vertexCount, np.full(len(triangleArray), 3, dtype=np.int64), triangleArray.ravel())
+
+
+
+
+### GROW THE VISIBLE VERTICES BY WHOLE FACES, LIKE GrowPolygonSelectionRegion
+def growVisibleMask(visibleMask, adjacency, vertexMargin):
+
+	# each grow selects every face touching the selection, on vertices that is one dilation
+	# over the face adjacency. Only the vertices added by the last step can add new ones
+	indptr, indices = adjacency
+	visibleMask = visibleMask.copy()
+	frontier = np.flatnonzero(visibleMask)
+
+	for i in range(vertexMargin):
+
+		if len(frontier) == 0:
+			break
+
+		# neighbours of every frontier vertex, gathered from the csr rows in one go
+		rowStarts = indptr[frontier]
+		rowLengths = indptr[frontier + 1] - rowStarts
+		neighbourPositions = np.repeat(rowStarts - np.cumsum(rowLengths) + rowLengths, rowLengths) + np.arange(rowLengths.sum())
+		neighbours = indices[neighbourPositions]
+
+		frontier = sortedUnique(neighbours[~visibleMask[neighbours]])
+		visibleMask[frontier] = True
+
+	return visibleMask
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# the modules live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+
+### EVERY TEST GETS ITS OWN CACHE DIRECTORY, NOTHING LANDS IN THE USER CACHE
+@pytest.fixture(autouse=True)
+def cacheDirectory(tmp_path, monkeypatch):
+
+	monkeypatch.setenv("HEATMAP_CACHE_DIR", str(tmp_path / "cache"))
+
+	return str(tmp_path / "cache")
@@ -0,0 +1,236 @@
+import os
+
+import numpy as np
+import pytest
+
+import heatmapBatch
+import heatmapBenchmark
+import heatmapEngine
+import heatmapSpatial
+import heatmapVisibility
+
+
+
+### FLAT SQUARE GRID OF side x side VERTICES: POINTS, QUADS AND TRIANGLES
+def gridMesh(side, size=100.0):
+
+	coordinates = np.linspace(-size * 0.5, size * 0.5, side)
+	x, z = np.meshgrid(coordinates, coordinates)
+	pointArray = np.stack([x.ravel(), np.zeros(side * side), z.ravel()], axis=-1)
+
+	grid = np.arange(side * side).reshape(side, side)
+	quads = np.stack([grid[:-1, :-1], grid[:-1, 1:], grid[1:, 1:], grid[1:, :-1]], axis=-1).reshape(-1, 4)
+	triangleArray = np.concatenate([quads[:, [0, 1, 2]], quads[:, [0, 2, 3]]])
+
+	return pointArray, quads, triangleArray
+
+
+
+
+### RANDOM CAMERAS ABOVE THE GRID LOOKING AT RANDOM POINTS ON IT
+def randomFrames(seed, frameCount=10):
+
+	random = np.random.RandomState(seed)
+	lens = heatmapVisibility.defaultLens()
+	frames = []
+
+	for i in range(frameCount):
+		eye = random.uniform(-60.0, 60.0, 3)
+		eye[1] = random.uniform(5.0, 40.0)
+		frames.append((heatmapBenchmark.lookAtMatrix(eye, random.uniform(-30.0, 30.0, 3)), lens))
+
+	return frames
+
+
+
+
+### PRUNED RUNS (ONLY THE MINIMUM KEPT) MATCH UNPRUNED RUNS (STATISTICS KEPT) BIT FOR BIT
+@pytest.mark.parametrize("occlusion", ["raster", "tiles", "bvh"])
+@pytest.mark.parametrize("vertexMargin", [0, 1, 3, 4])
+def test_pruningIsExact(monkeypatch, occlusion, vertexMargin):
+
+	# tiny chunks so pruning and chunk borders come into play on a small mesh
+	meshVertexChunks = heatmapSpatial.meshVertexChunks
+	monkeypatch.setattr(heatmapSpatial, "meshVertexChunks", lambda points, triangles, directory=None, chunkSize=4, cache=True: meshVertexChunks(points, triangles, directory, 4, cache))
+
+	pointArray, quads, triangleArray = gridMesh(48)
+	adjacency = heatmapVisibility.vertexAdjacency(len(pointArray), np.full(len(quads), 4), quads.ravel())
+
+	for seed in range(180, 300, 12):
+		frames = randomFrames(seed)
+		pruned = heatmapBatch.paintDistances(pointArray, triangleArray, frames, vertexMargin, (160, 90), occlusion=occlusion, adjacency=adjacency)
+		full = heatmapBatch.paintDistances(pointArray, triangleArray, frames, vertexMargin, (160, 90), occlusion=occlusion, adjacency=adjacency, statistics=heatmapEngine.newStatistics(len(pointArray), ['count']))
+
+		assert np.array_equal(pruned, full), "seed %d" % seed
+
+
+
+
+### GROWING OVER THE VERTEX ADJACENCY SELECTS THE SAME VERTICES AS GROWING A FACE SELECTION margin TIMES
+@pytest.mark.parametrize("vertexMargin", [0, 1, 2, 5])
+def test_growMatchesFaceGrow(vertexMargin):
+
+	pointArray, quads, triangleArray = gridMesh(24)
+
+	for seed in range(4):
+
+		# holes in the grid and a sparse start selection, so the grow has to go around missing faces
+		random = np.random.RandomState(seed)
+		faces = quads[random.uniform(size=len(quads)) > 0.2]
+		adjacency = heatmapVisibility.vertexAdjacency(len(pointArray), np.full(len(faces), 4), faces.ravel())
+		visibleMask = random.uniform(size=len(pointArray)) > 0.97
+
+		expected = visibleMask.copy()
+		for i in range(vertexMargin):
+			expected[faces[expected[faces].any(axis=1)].ravel()] = True
+
+		assert np.array_equal(heatmapVisibility.growVisibleMask(visibleMask, adjacency, vertexMargin), expected), "seed %d" % seed
+
+
+
+
+### A POLYGON SEEN THROUGH ANY OF ITS TRIANGLES IS SEEN WHOLE IN THE TILES MODE, ALSO ACROSS PROCESSES
+def test_tilesMarkWholePolygons():
+
+	pointArray, quads, triangleArray = gridMesh(48)
+	triangleFaces = np.tile(np.arange(len(quads)), 2)
+	frames = randomFrames(7, 4)
+
+	polygons = heatmapBatch.paintDistances(pointArray, triangleArray, frames, 0, (160, 90), occlusion='tiles', triangleFaces=triangleFaces)
+	triangles = heatmapBatch.paintDistances(pointArray, triangleArray, frames, 0, (160, 90), occlusion='tiles')
+
+	# the same visible quads worked out on the whole mesh, without the chunk culling
+	seenMask = np.zeros(len(pointArray), dtype=bool)
+	for worldMatrix, lens in frames:
+		triangleMask = heatmapVisibility.tiledVisibleTriangleMask(pointArray, triangleArray, worldMatrix, lens, (160, 90))
+		faceMask = np.zeros(len(quads), dtype=bool)
+		faceMask[triangleFaces[triangleMask]] = True
+		seenMask[quads[faceMask].ravel()] = True
+
+	assert np.array_equal(np.isfinite(polygons), seenMask)
+	assert np.count_nonzero(np.isfinite(polygons)) > np.count_nonzero(np.isfinite(triangles))
+	assert np.all(np.isfinite(polygons)[np.isfinite(triangles)])
+
+	parallel = heatmapBatch.paintDistancesParallel(pointArray, triangleArray, frames, 0, (160, 90), 2, 'tiles', triangleFaces=triangleFaces)
+
+	assert np.array_equal(parallel, polygons)
+
+
+
+
+### A RAY THROUGH THE SHARED EDGES OF A FRONT PLANE NEVER REACHES THE PLANE BEHIND IT, IN ANY MODE
+@pytest.mark.parametrize("occlusion", ["raster", "tiles", "bvh"])
+def test_stackedPlanesOccludeOnAxis(occlusion):
+
+	pointArray, quads, triangleArray = gridMesh(48)
+	pointArray = pointArray[:, [0, 2, 1]]
+	backArray = pointArray.copy()
+	backArray[:, 2] = -25.0
+
+	worldMatrix = np.eye(4)
+	worldMatrix[3, 2] = 75.0
+
+	distanceArray = heatmapBatch.paintDistances(np.concatenate([pointArray, backArray]), np.concatenate([triangleArray, triangleArray + len(pointArray)]), [(worldMatrix, heatmapVisibility.defaultLens())], 0, (640, 480), occlusion=occlusion)
+
+	assert np.all(np.isinf(distanceArray[len(pointArray):]))
+	assert np.any(np.isfinite(distanceArray[:len(pointArray)]))
+
+
+
+
+### AN ORTHOGRAPHIC CAMERA SEES PAST THE EDGE OF A FRONT PLANE ALONG PARALLEL RAYS, IN ANY MODE
+@pytest.mark.parametrize("occlusion", ["raster", "tiles", "bvh"])
+def test_orthographicOcclusion(occlusion):
+
+	# a 100 unit plane in front of a 200 unit one, the view is 150 units wide
+	frontArray, quads, frontTriangles = gridMesh(21, 100.0)
+	backArray, quads, backTriangles = gridMesh(41, 200.0)
+	frontArray = frontArray[:, [0, 2, 1]]
+	backArray = backArray[:, [0, 2, 1]]
+	backArray[:, 2] = -25.0
+
+	lens = heatmapVisibility.defaultLens()
+	lens.update(filmFit=heatmapVisibility.FILM_FIT_HORIZONTAL, orthographic=1, orthographicWidth=150.0)
+	worldMatrix = np.eye(4)
+	worldMatrix[3, 2] = 75.0
+
+	distanceArray = heatmapBatch.paintDistances(np.concatenate([frontArray, backArray]), np.concatenate([frontTriangles, backTriangles + len(frontArray)]), [(worldMatrix, lens)], 0, (640, 480), occlusion=occlusion)
+	backDistances = distanceArray[len(frontArray):]
+	x, y = np.abs(backArray[:, 0]), np.abs(backArray[:, 1])
+
+	# a perspective ray from the camera to x = 60 on the back plane would cross the front plane at x = 45
+	assert np.all(np.isfinite(distanceArray[:len(frontArray)]))
+	assert np.all(np.isinf(backDistances[(x <= 45.0) & (y <= 45.0)]))
+	assert np.all(np.isfinite(backDistances[(x >= 55.0) & (x <= 70.0) & (y <= 50.0)]))
+	assert np.all(np.isinf(backDistances[x >= 80.0]))
+
+
+
+
+### WITHOUT CACHE THE BVH AND THE VERTEX CHUNKS NEVER REACH THE CACHE DIRECTORY, ALSO ACROSS PROCESSES
+def test_noCacheLeavesNoFiles(cacheDirectory):
+
+	pointArray, quads, triangleArray = gridMesh(16)
+	frames = randomFrames(3, 4)
+
+	serial = heatmapBatch.paintDistances(pointArray, triangleArray, frames, 0, (160, 90), occlusion='bvh', cache=False)
+	parallel = heatmapBatch.paintDistancesParallel(pointArray, triangleArray, frames, 0, (160, 90), 2, 'bvh', cache=False)
+
+	assert not os.path.exists(cacheDirectory)
+	assert np.array_equal(serial, parallel)
+
+	cached = heatmapBatch.paintDistances(pointArray, triangleArray, frames, 0, (160, 90), occlusion='bvh')
+
+	assert sorted(os.listdir(cacheDirectory)) == ['bvh', 'chunks']
+	assert np.array_equal(cached, serial)
+
+
+
+
+### A SECOND PAINT REUSES EVERY CHUNK, A SHORTER RANGE ONLY PAINTS THE CHUNK AT ITS END AGAIN
+def test_shotChunksAreReused():
+
+	pointArray, quads, triangleArray = gridMesh(16)
+	frames = randomFrames(5, 64)
+	matrices = np.array([matrix for matrix, lens in frames])
+	lens = heatmapVisibility.defaultLens()
+
+	reports = []
+	results = []
+
+	for frameCount in [64, 64, 40]:
+		cacheReport = {}
+		results.append(heatmapBatch.paintShotDistances(pointArray, triangleArray, [("cam", lens, np.arange(frameCount), matrices[:frameCount])], 0, (160, 90), cacheReport=cacheReport))
+		reports.append((cacheReport['computed'], cacheReport['chunks']))
+
+	assert reports == [(4, 4), (0, 4), (1, 3)]
+	assert np.array_equal(results[0], results[1])
+	assert np.array_equal(results[0], heatmapBatch.paintDistances(pointArray, triangleArray, frames, 0, (160, 90)))
+	assert np.array_equal(results[2], heatmapBatch.paintDistances(pointArray, triangleArray, frames[:40], 0, (160, 90)))
+
+
+
+
+### A PROGRESS CALLBACK THAT STOPS THE RUN KEEPS THE FINISHED CHUNKS AND LEAVES NO PARTIAL FILES
+def test_cancelKeepsFinishedChunks(cacheDirectory):
+
+	pointArray, quads, triangleArray = gridMesh(16)
+	frames = randomFrames(6, 64)
+	shotFrames = [("cam", heatmapVisibility.defaultLens(), np.arange(64), np.array([matrix for matrix, lens in frames]))]
+	doneFrames = [0]
+
+	def progress(frameCount):
+		if doneFrames[0] >= 20:
+			raise heatmapBatch.PaintCancelled()
+		doneFrames[0] += frameCount
+
+	with pytest.raises(heatmapBatch.PaintCancelled):
+		heatmapBatch.paintShotDistances(pointArray, triangleArray, shotFrames, 0, (160, 90), progress=progress)
+
+	distanceFiles = [fileName for root, directories, files in os.walk(os.path.join(cacheDirectory, "distances")) for fileName in files]
+	assert len(distanceFiles) == 1 and distanceFiles[0].endswith(".npy")
+
+	cacheReport = {}
+	heatmapBatch.paintShotDistances(pointArray, triangleArray, shotFrames, 0, (160, 90), cacheReport=cacheReport)
+
+	assert (cacheReport['computed'], cacheReport['chunks']) == (3, 4)
@@ -0,0 +1,54 @@
+import os
+import time
+
+import heatmapCache
+
+
+
+### count FILES OF size BYTES IN A CACHE CATEGORY, THE FIRST ONE USED LONGEST AGO
+def cacheFiles(cacheDirectory, category, count, size=1000, age=0.0):
+
+	os.makedirs(os.path.join(cacheDirectory, category))
+	paths = []
+
+	for i in range(count):
+		path = os.path.join(cacheDirectory, category, "%d.npy" % i)
+		with open(path, "wb") as fileHandle:
+			fileHandle.write(b"\0" * size)
+		lastUse = time.time() - age - (count - i) * 60.0
+		os.utime(path, (lastUse, lastUse))
+		paths.append(path)
+
+	return paths
+
+
+
+
+### FILES NOT USED FOR maxAgeDays GO, EMPTY DIRECTORIES WITH THEM
+def test_purgeByAge(cacheDirectory):
+
+	oldPaths = cacheFiles(cacheDirectory, "bvh", 3, age=10 * 86400.0)
+	newPaths = cacheFiles(cacheDirectory, "distances", 3)
+
+	removed = heatmapCache.purgeCache(maxAgeDays=5)
+
+	assert sorted(removed) == sorted(oldPaths)
+	assert all(os.path.isfile(path) for path in newPaths)
+	assert not os.path.exists(os.path.join(cacheDirectory, "bvh"))
+	assert heatmapCache.cacheSummary() == {'distances': (3000, 3)}
+
+
+
+
+### THE LEAST RECENTLY USED FILES GO UNTIL THE CACHE FITS IN maxBytes
+def test_purgeBySize(cacheDirectory):
+
+	paths = cacheFiles(cacheDirectory, "distances", 5)
+
+	removed = heatmapCache.purgeCache(maxBytes=2500)
+
+	assert removed == paths[:3]
+	assert all(os.path.isfile(path) for path in paths[3:])
+
+	assert heatmapCache.purgeCache(everything=True) == paths[3:]
+	assert heatmapCache.cacheEntries() == []
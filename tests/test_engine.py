@@ -0,0 +1,56 @@
+import numpy as np
+
+import heatmapEngine
+
+
+
+### PERCENTILES FROM THE PER VERTEX HISTOGRAM LAND IN THE BIN OF THE DATA, p0 INCLUDED
+def test_histogramPercentileBounds():
+
+	statistics = heatmapEngine.newStatistics(2, ['histogram'])
+	visibleIndices = np.array([0])
+
+	for distance in [5.0, 40.0, 1000.0]:
+		heatmapEngine.reduceVertices(heatmapEngine.newDistanceArray(2), statistics, visibleIndices, np.array([distance], dtype=np.float32))
+
+	near, far = heatmapEngine.HISTOGRAM_RANGE
+	binRatio = (far / near) ** (1.0 / heatmapEngine.HISTOGRAM_BINS)
+
+	lowest = heatmapEngine.histogramPercentile(statistics['histogram'], 0)
+	highest = heatmapEngine.histogramPercentile(statistics['histogram'], 100)
+
+	assert 5.0 / binRatio <= lowest[0] <= 5.0
+	assert 1000.0 <= highest[0] <= 1000.0 * binRatio
+	assert np.isinf(lowest[1]) and np.isinf(highest[1])
+
+
+
+
+### A FULL HISTOGRAM BIN HALVES THE ROW, PROPORTIONS AND PERCENTILES SURVIVE, ALSO WHEN MERGED
+def test_histogramRescaling():
+
+	# 3 of 4 frames at distance 10, the rest at 1000, far more frames than a uint8 bin holds
+	frameDistances = np.where(np.random.RandomState(5).uniform(size=3000) < 0.75, 10.0, 1000.0).astype(np.float32)
+	serial = heatmapEngine.newStatistics(1, ['histogram'])
+	halves = [heatmapEngine.newStatistics(1, ['histogram']) for i in range(2)]
+	shards = heatmapEngine.newStatistics(1, ['histogram'])
+
+	for i, distance in enumerate(frameDistances):
+		heatmapEngine.reduceVertices(heatmapEngine.newDistanceArray(1), serial, np.array([0]), np.array([distance]))
+		heatmapEngine.reduceVertices(heatmapEngine.newDistanceArray(1), halves[i % 2], np.array([0]), np.array([distance]))
+
+	# cache shards of 16 frames merged one after the other into a histogram that was halved long ago
+	for start in range(0, len(frameDistances), 16):
+		shard = heatmapEngine.newStatistics(1, ['histogram'])
+		for distance in frameDistances[start:start + 16]:
+			heatmapEngine.reduceVertices(heatmapEngine.newDistanceArray(1), shard, np.array([0]), np.array([distance]))
+		heatmapEngine.mergeStatistics(shards, shard)
+
+	for statistics in [serial, heatmapEngine.mergeStatistics(halves[0], halves[1]), shards]:
+		bins = statistics['histogram'][0, :heatmapEngine.HISTOGRAM_BINS]
+		near, far = bins[bins > 0].astype(np.float64)
+
+		assert statistics['histogram'][0, heatmapEngine.HISTOGRAM_HALVINGS] > 0
+		assert abs(near / (near + far) - 0.75) < 0.05
+		assert heatmapEngine.histogramPercentile(statistics['histogram'], 50)[0] < 20.0
+		assert heatmapEngine.histogramPercentile(statistics['histogram'], 80)[0] > 500.0
@@ -0,0 +1,99 @@
+import struct
+
+import numpy as np
+import pytest
+
+import heatmapExport
+
+
+
+### EVERY FIELD READS BACK AS WRITTEN, float16 ONLY TOUCHES DISTANCES AND DENSITIES
+@pytest.mark.parametrize("compression", heatmapExport.COMPRESSIONS)
+@pytest.mark.parametrize("float16", [False, True])
+def test_exportRoundTrip(tmp_path, compression, float16):
+
+	random = np.random.RandomState(7)
+	vertexCount = 1000
+	distanceArray = random.uniform(1.0, 1000.0, vertexCount).astype(np.float32)
+	distanceArray[::10] = np.inf
+	distanceArray[5] = 1e6
+
+	# 100 frames at distance 2000, far beyond the float16 range
+	statistics = {
+		'count': random.randint(0, 100, vertexCount).astype(np.uint32),
+		'density': random.uniform(0.0, 50.0, vertexCount).astype(np.float32),
+		'distanceSum': np.full(vertexCount, 200000.0, dtype=np.float32),
+	}
+	colourArray = random.uniform(0.0, 1.0, (vertexCount, 3))
+	meshes = heatmapExport.meshTable(['a', 'b'], [0, 400, vertexCount])
+
+	path = str(tmp_path / "result.heatmap")
+	heatmapExport.exportHeatmap(path, distanceArray, statistics, colourArray, None, meshes, {'frames': 100}, compression, float16)
+	header = heatmapExport.readHeader(path)
+
+	assert header['vertexCount'] == vertexCount
+	assert header['meshes'] == meshes
+	assert header['metadata'] == {'frames': 100}
+	assert sorted(header['fields']) == ['colour', 'count', 'density', 'distance', 'distanceSum']
+
+	distance = heatmapExport.readField(path, 'distance')
+	if float16:
+		assert distance.dtype == np.float16
+		assert distance[5] == heatmapExport.FLOAT16_MAX
+		finite = np.isfinite(distanceArray) & (distanceArray < heatmapExport.FLOAT16_MAX)
+		assert np.allclose(distance[finite], distanceArray[finite], rtol=1e-3)
+		assert np.array_equal(np.isinf(distance), np.isinf(distanceArray))
+		assert np.allclose(heatmapExport.readField(path, 'density'), statistics['density'], rtol=1e-3, atol=1e-3)
+	else:
+		assert np.array_equal(distance, distanceArray)
+		assert np.array_equal(heatmapExport.readField(path, 'density'), statistics['density'])
+
+	assert np.array_equal(heatmapExport.readField(path, 'distanceSum'), statistics['distanceSum'])
+	assert np.array_equal(heatmapExport.readField(path, 'count'), statistics['count'])
+	assert np.array_equal(heatmapExport.readField(path, 'colour'), heatmapExport.quantizeColours(colourArray))
+
+	# streamed blocks cover the field in order
+	blocks = list(heatmapExport.iterField(path, 'count', chunkRows=300))
+	assert np.array_equal(np.concatenate([block for start, block in blocks]), statistics['count'])
+
+
+
+
+### ZLIB FIELDS ARE SPLIT INTO chunkRows CHUNKS THAT STREAM ONE BY ONE
+def test_exportChunks(tmp_path):
+
+	path = str(tmp_path / "result.heatmap")
+	distanceArray = np.arange(1000, dtype=np.float32)
+	heatmapExport.writeHeatmapFile(path, {'distance': distanceArray}, compression='zlib', chunkRows=300)
+
+	blocks = list(heatmapExport.iterField(path, 'distance', threads=2))
+
+	assert [start for start, block in blocks] == [0, 300, 600, 900]
+	assert np.array_equal(np.concatenate([block for start, block in blocks]), distanceArray)
+
+
+
+
+### A NEWER FORMAT VERSION AND FOREIGN FILES ARE REFUSED
+def test_exportVersionCheck(tmp_path):
+
+	path = str(tmp_path / "result.heatmap")
+	heatmapExport.writeHeatmapFile(path, {'distance': np.zeros(4, dtype=np.float32)})
+
+	with open(path, "r+b") as fileHandle:
+		preamble = struct.unpack(heatmapExport.PREAMBLE_FORMAT, fileHandle.read(struct.calcsize(heatmapExport.PREAMBLE_FORMAT)))
+		fileHandle.seek(0)
+		fileHandle.write(struct.pack(heatmapExport.PREAMBLE_FORMAT, preamble[0], heatmapExport.FORMAT_VERSION + 1, *preamble[2:]))
+
+	with pytest.raises(ValueError, match="format version"):
+		heatmapExport.readHeader(path)
+
+	with open(path, "wb") as fileHandle:
+		fileHandle.write(b"not a heatmap file at all, just text")
+
+	with pytest.raises(ValueError, match="not a heatmap file"):
+		heatmapExport.readHeader(path)
+
+	# the previous export is replaced in place
+	heatmapExport.writeHeatmapFile(path, {'distance': np.ones(4, dtype=np.float32)})
+	assert np.array_equal(heatmapExport.readField(path, 'distance'), np.ones(4))
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+import heatmapBenchmark
+import heatmapSpatial
+import heatmapVisibility
+
+
+
+### THE FILM FIT PICKS THE APERTURE THAT MEETS THE IMAGE EDGE, MAYA'S DEFAULT 1.5 FILM BACK ON A 4:3 IMAGE
+@pytest.mark.parametrize("filmFit, fittedAxis", [(heatmapVisibility.FILM_FIT_FILL, 1), (heatmapVisibility.FILM_FIT_HORIZONTAL, 0), (heatmapVisibility.FILM_FIT_VERTICAL, 1), (heatmapVisibility.FILM_FIT_OVERSCAN, 0)])
+def test_filmFit(filmFit, fittedAxis):
+
+	lens = heatmapVisibility.defaultLens()
+	lens['filmFit'] = filmFit
+	resolution = (640, 480)
+
+	extents = heatmapVisibility.viewExtents(lens, resolution)
+	apertures = (lens['horizontalFilmAperture'], lens['verticalFilmAperture'])
+
+	assert np.isclose(extents[fittedAxis], apertures[fittedAxis] * heatmapVisibility.INCH_TO_MM * 0.5 / lens['focalLength'])
+	assert np.isclose(extents[0] / extents[1], 640.0 / 480.0)
+
+	# fill crops the film gate, overscan shows all of it
+	if filmFit == heatmapVisibility.FILM_FIT_FILL:
+		assert extents[0] * lens['focalLength'] / heatmapVisibility.INCH_TO_MM < apertures[0] * 0.5
+	if filmFit == heatmapVisibility.FILM_FIT_OVERSCAN:
+		assert extents[1] * lens['focalLength'] / heatmapVisibility.INCH_TO_MM > apertures[1] * 0.5
+
+	lens['orthographic'] = 1
+	orthographicExtents = heatmapVisibility.viewExtents(lens, resolution)
+
+	assert np.isclose(orthographicExtents[0] / orthographicExtents[1], 640.0 / 480.0)
+	if fittedAxis == 0:
+		assert np.isclose(orthographicExtents[0], lens['orthographicWidth'] * 0.5)
+
+
+
+
+### THE CHUNK CULLING FRUSTUM HOLDS EXACTLY THE POINTS THAT PROJECT ONTO THE IMAGE, FOR EVERY FIT AND BOTH PROJECTIONS
+@pytest.mark.parametrize("filmFit", [heatmapVisibility.FILM_FIT_FILL, heatmapVisibility.FILM_FIT_HORIZONTAL, heatmapVisibility.FILM_FIT_VERTICAL, heatmapVisibility.FILM_FIT_OVERSCAN])
+@pytest.mark.parametrize("orthographic", [0, 1])
+def test_frustumMatchesProjection(filmFit, orthographic):
+
+	random = np.random.RandomState(filmFit + 4 * orthographic)
+	lens = heatmapVisibility.defaultLens()
+	lens.update(filmFit=filmFit, orthographic=orthographic, orthographicWidth=150.0, farClipPlane=200.0)
+	worldMatrix = heatmapBenchmark.lookAtMatrix(np.array([10.0, 20.0, 30.0]), np.array([0.0, 0.0, -20.0]))
+
+	for resolution in [(640, 480), (960, 540), (400, 800)]:
+		pointArray = random.uniform(-120.0, 120.0, (20000, 3))
+
+		screenX, screenY, depth = heatmapVisibility.projectVertices(pointArray, worldMatrix, lens, resolution)
+		projected = heatmapVisibility.frustumMask(screenX, screenY, depth, lens, resolution)
+		insidePlanes = heatmapSpatial.boxesInsidePlanes(pointArray, pointArray, heatmapSpatial.frustumPlanes(worldMatrix, lens, resolution))
+
+		# points within float noise of a side plane can land on either side
+		assert projected.sum() > 100
+		assert np.count_nonzero(projected != insidePlanes) <= 2